@@ -3,9 +3,13 @@ IndexTTS2 API Server
 基于FastAPI的自定义TTS API服务器
 """
 
+import asyncio
 import os
 import tempfile
 import shutil
+import threading
+import time
+from concurrent.futures import Future
 from typing import List, Optional, Dict, Any
 from pathlib import Path
 import uuid
@@ -23,9 +27,12 @@ warnings.filterwarnings("ignore", category=FutureWarning)
 warnings.filterwarnings("ignore", category=UserWarning)
 
 from indextts.infer_v2 import IndexTTS2
+from indextts.s2mel.modules.flow_matching import SOLVERS, T_SCHEDULES, get_cfg_schedule
 
 # 全局TTS实例
 tts_instance = None
+# 合并并发请求的参考音频编码
+prompt_batcher = None
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -55,6 +62,12 @@ class TTSRequest(BaseModel):
     emo_text: Optional[str] = Field(None, description="情感描述文本")
     use_random: bool = Field(False, description="是否启用随机情感采样")
     max_text_tokens_per_segment: int = Field(120, description="每段最大文本token数", ge=50, le=500)
+    segments_bucket_max_size: int = Field(4, description="分句分桶的最大容量，同一桶内的句子批量生成，1为逐句生成", ge=1, le=16)
+    diffusion_steps: int = Field(25, description="s2mel扩散步数，越少越快", ge=1, le=100)
+    inference_cfg_rate: float = Field(0.7, description="s2mel CFG强度，0为关闭CFG", ge=0.0, le=3.0)
+    cfm_solver: str = Field("euler", description="s2mel ODE求解器: euler, midpoint, heun, dpm_2m")
+    cfm_t_schedule: str = Field("linear", description="s2mel时间步分布: linear, cosine")
+    cfm_cfg_schedule: str = Field("all", description="s2mel CFG步调度: all, first:K, every:N, range:a-b, linear:eps")
     verbose: bool = Field(False, description="是否启用详细输出")
 
 class TTSResponse(BaseModel):
@@ -70,18 +83,101 @@ class HealthResponse(BaseModel):
     status: str = Field(..., description="服务状态")
     model_loaded: bool = Field(..., description="模型是否已加载")
     version: str = Field(..., description="API版本")
+    text_normalizer_cache: Optional[dict] = Field(None, description="文本规范化结果缓存的命中统计")
 
 # 全局变量
 UPLOAD_DIR = Path("uploads")
 OUTPUT_DIR = Path("outputs")
 STATIC_DIR = Path("static")
+# 持久化参考音频特征目录（可由 tools/pre_encode_voices.py 预先生成），未设置时不启用
+PROMPT_STORE_DIR = os.environ.get("INDEXTTS_PROMPT_STORE") or None
+# 参考音频预处理（秒）：VAD 去静音后的最长停顿、保留的语音最密集窗口长度，未设置时不启用
+PROMPT_MAX_SILENCE = float(os.environ["INDEXTTS_PROMPT_MAX_SILENCE"]) if os.environ.get("INDEXTTS_PROMPT_MAX_SILENCE") else None
+PROMPT_WINDOW_SECONDS = float(os.environ["INDEXTTS_PROMPT_WINDOW"]) if os.environ.get("INDEXTTS_PROMPT_WINDOW") else None
+# 可选组件（文本情感模型等）按需加载，空闲超过该秒数后卸载，未设置时加载后常驻
+OPTIONAL_MODELS_IDLE_TIMEOUT = float(os.environ["INDEXTTS_OPTIONAL_MODELS_IDLE_TIMEOUT"]) if os.environ.get("INDEXTTS_OPTIONAL_MODELS_IDLE_TIMEOUT") else None
+# 长文本并行规范化的进程数，未设置时在当前进程规范化
+TEXT_NORMALIZE_WORKERS = int(os.environ.get("INDEXTTS_TEXT_WORKERS") or 0)
+# 并发请求的参考音频合并编码：每批最多的音频数、收集同时到达的请求的等待毫秒数
+PROMPT_BATCH_SIZE = int(os.environ.get("INDEXTTS_PROMPT_BATCH_SIZE") or 8)
+PROMPT_BATCH_WAIT_MS = float(os.environ.get("INDEXTTS_PROMPT_BATCH_WAIT_MS") or 10)
 UPLOAD_DIR.mkdir(exist_ok=True)
 OUTPUT_DIR.mkdir(exist_ok=True)
 STATIC_DIR.mkdir(exist_ok=True)
 
+class PromptEncodeBatcher:
+    """
+    合并并发请求的参考音频编码：后台线程收集待编码的音频（等待 `wait_ms` 毫秒，
+    编码期间到达的请求进入下一批），一次 `get_prompt_features_batch` 批量编码，
+    新音色的 w2v-bert 在同一批上运行。编码结果写入特征缓存，随后的 `infer` 直接读取。
+    """
+
+    def __init__(self, tts, batch_size=8, wait_ms=10):
+        self.tts = tts
+        self.batch_size = max(1, batch_size)
+        self.wait = wait_ms / 1000
+        self._pending = []  # (音频路径, 是否说话人参考, Future)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="prompt-encode-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, audio_prompt, speaker=True) -> Future:
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("PromptEncodeBatcher is closed")
+            self._pending.append((audio_prompt, speaker, future))
+            self._cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                deadline = time.monotonic() + self.wait
+                while len(self._pending) < self.batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            try:
+                entries = self.tts.get_prompt_features_batch([prompt for prompt, _, _ in batch],
+                                                             speaker=[speaker for _, speaker, _ in batch],
+                                                             batch_size=self.batch_size)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, _, future), entry in zip(batch, entries):
+                    future.set_result(entry)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+
+async def encode_prompts(infer_kwargs):
+    """请求的参考音频与其他并发请求的一起编码，`infer` 随后从缓存读取特征"""
+    if prompt_batcher is None:
+        return
+    spk_audio_prompt = infer_kwargs["spk_audio_prompt"]
+    emo_audio_prompt = infer_kwargs.get("emo_audio_prompt")
+    futures = [prompt_batcher.submit(spk_audio_prompt, True)]
+    if emo_audio_prompt is not None and emo_audio_prompt != spk_audio_prompt:
+        futures.append(prompt_batcher.submit(emo_audio_prompt, False))
+    await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+
+
 def initialize_tts():
     """初始化TTS模型"""
-    global tts_instance
+    global tts_instance, prompt_batcher
     try:
         model_dir = "checkpoints"
         config_path = os.path.join(model_dir, "config.yaml")
@@ -100,8 +196,14 @@ def initialize_tts():
             model_dir=model_dir,
             use_fp16=True,  # 使用FP16以节省显存
             use_cuda_kernel=False,
-            use_deepspeed=False
+            use_deepspeed=False,
+            prompt_store_dir=PROMPT_STORE_DIR,
+            prompt_max_silence=PROMPT_MAX_SILENCE,
+            prompt_window_seconds=PROMPT_WINDOW_SECONDS,
+            optional_models_idle_timeout=OPTIONAL_MODELS_IDLE_TIMEOUT,
+            text_normalize_workers=TEXT_NORMALIZE_WORKERS
         )
+        prompt_batcher = PromptEncodeBatcher(tts_instance, batch_size=PROMPT_BATCH_SIZE, wait_ms=PROMPT_BATCH_WAIT_MS)
         return True
     except Exception as e:
         print(f"Failed to initialize TTS: {e}")
@@ -113,13 +215,25 @@ async def startup_event():
     if not initialize_tts():
         print("Warning: Failed to initialize TTS model on startup")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """关闭时停止参考音频编码线程和文本规范化工作进程"""
+    global tts_instance, prompt_batcher
+    if prompt_batcher is not None:
+        prompt_batcher.close()
+        prompt_batcher = None
+    if tts_instance is not None:
+        tts_instance.close()
+        tts_instance = None
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """健康检查端点"""
     return HealthResponse(
         status="healthy",
         model_loaded=tts_instance is not None,
-        version="2.0.0"
+        version="2.0.0",
+        text_normalizer_cache=tts_instance.normalizer.cache_info() if tts_instance is not None else None
     )
 
 @app.post("/tts", response_model=TTSResponse)
@@ -132,6 +246,12 @@ async def text_to_speech(
     emo_text: Optional[str] = Form(None, description="情感描述文本"),
     use_random: bool = Form(False, description="是否启用随机情感采样"),
     max_text_tokens_per_segment: int = Form(120, description="每段最大文本token数"),
+    segments_bucket_max_size: int = Form(4, description="分句分桶的最大容量，同一桶内的句子批量生成，1为逐句生成"),
+    diffusion_steps: int = Form(25, description="s2mel扩散步数，越少越快"),
+    inference_cfg_rate: float = Form(0.7, description="s2mel CFG强度，0为关闭CFG"),
+    cfm_solver: str = Form("euler", description="s2mel ODE求解器: euler, midpoint, heun, dpm_2m"),
+    cfm_t_schedule: str = Form("linear", description="s2mel时间步分布: linear, cosine"),
+    cfm_cfg_schedule: str = Form("all", description="s2mel CFG步调度: all, first:K, every:N, range:a-b, linear:eps"),
     verbose: bool = Form(False, description="是否启用详细输出"),
     speaker_audio: Optional[UploadFile] = File(None, description="说话人参考音频文件，不提供则使用默认文件 uploads/lyq_01.wav"),
     emotion_audio: Optional[UploadFile] = File(None, description="情感参考音频文件")
@@ -181,6 +301,12 @@ async def text_to_speech(
                     raise ValueError("Emotion vector must have 8 elements")
             except (json.JSONDecodeError, ValueError) as e:
                 raise HTTPException(status_code=400, detail=f"Invalid emotion vector: {e}")
+        if cfm_solver not in SOLVERS or cfm_t_schedule not in T_SCHEDULES:
+            raise HTTPException(status_code=400, detail=f"Invalid s2mel solver/schedule: {cfm_solver}/{cfm_t_schedule}")
+        try:
+            get_cfg_schedule(cfm_cfg_schedule, inference_cfg_rate)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
         # 准备推理参数
         infer_kwargs = {
@@ -189,6 +315,12 @@ async def text_to_speech(
             "emo_alpha": emo_alpha,
             "use_random": use_random,
             "max_text_tokens_per_segment": max_text_tokens_per_segment,
+            "segments_bucket_max_size": max(1, segments_bucket_max_size),
+            "diffusion_steps": max(1, diffusion_steps),
+            "inference_cfg_rate": max(0.0, inference_cfg_rate),
+            "cfm_solver": cfm_solver,
+            "cfm_t_schedule": cfm_t_schedule,
+            "cfm_cfg_schedule": cfm_cfg_schedule,
             "verbose": verbose
         }
 
@@ -205,6 +337,7 @@ async def text_to_speech(
         output_path = OUTPUT_DIR / f"{task_id}.wav"
 
         # 执行推理
+        await encode_prompts(infer_kwargs)
         tts_instance.infer(output_path=str(output_path), **infer_kwargs)
 
         # 添加清理任务（只清理临时文件，不清理默认文件）
@@ -294,6 +427,12 @@ async def text_to_speech_audio(
     emo_text: Optional[str] = Form(None, description="情感描述文本"),
     use_random: bool = Form(False, description="是否启用随机情感采样"),
     max_text_tokens_per_segment: int = Form(120, description="每段最大文本token数"),
+    segments_bucket_max_size: int = Form(4, description="分句分桶的最大容量，同一桶内的句子批量生成，1为逐句生成"),
+    diffusion_steps: int = Form(25, description="s2mel扩散步数，越少越快"),
+    inference_cfg_rate: float = Form(0.7, description="s2mel CFG强度，0为关闭CFG"),
+    cfm_solver: str = Form("euler", description="s2mel ODE求解器: euler, midpoint, heun, dpm_2m"),
+    cfm_t_schedule: str = Form("linear", description="s2mel时间步分布: linear, cosine"),
+    cfm_cfg_schedule: str = Form("all", description="s2mel CFG步调度: all, first:K, every:N, range:a-b, linear:eps"),
     verbose: bool = Form(False, description="是否启用详细输出"),
     speaker_audio: Optional[UploadFile] = File(None, description="说话人参考音频文件"),
     emotion_audio: Optional[UploadFile] = File(None, description="情感参考音频文件")
@@ -359,6 +498,12 @@ async def text_to_speech_audio(
                     raise ValueError("Emotion vector must have 8 elements")
             except (json.JSONDecodeError, ValueError) as e:
                 raise HTTPException(status_code=400, detail=f"Invalid emotion vector: {e}")
+        if cfm_solver not in SOLVERS or cfm_t_schedule not in T_SCHEDULES:
+            raise HTTPException(status_code=400, detail=f"Invalid s2mel solver/schedule: {cfm_solver}/{cfm_t_schedule}")
+        try:
+            get_cfg_schedule(cfm_cfg_schedule, inference_cfg_rate)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
         # 准备推理参数
         infer_kwargs = {
@@ -367,6 +512,12 @@ async def text_to_speech_audio(
             "emo_alpha": emo_alpha,
             "use_random": use_random,
             "max_text_tokens_per_segment": max_text_tokens_per_segment,
+            "segments_bucket_max_size": max(1, segments_bucket_max_size),
+            "diffusion_steps": max(1, diffusion_steps),
+            "inference_cfg_rate": max(0.0, inference_cfg_rate),
+            "cfm_solver": cfm_solver,
+            "cfm_t_schedule": cfm_t_schedule,
+            "cfm_cfg_schedule": cfm_cfg_schedule,
             "verbose": verbose
         }
 
@@ -383,6 +534,7 @@ async def text_to_speech_audio(
         output_path = OUTPUT_DIR / f"{task_id}.wav"
 
         # 执行推理
+        await encode_prompts(infer_kwargs)
         tts_instance.infer(output_path=str(output_path), **infer_kwargs)
 
         # 清理临时文件
@@ -820,8 +972,13 @@ if __name__ == "__main__":
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Host to bind to")
     parser.add_argument("--port", type=int, default=8000, help="Port to bind to")
     parser.add_argument("--reload", action="store_true", help="Enable auto reload")
+    parser.add_argument("--prompt_store", type=str, default=PROMPT_STORE_DIR,
+                        help="Directory of the persistent prompt feature store")
 
     args = parser.parse_args()
+    if args.prompt_store:
+        # uvicorn re-imports this module, pass the setting through the environment
+        os.environ["INDEXTTS_PROMPT_STORE"] = args.prompt_store
 
     uvicorn.run(
         "api_server:app",
@@ -165,7 +165,11 @@ class AccelInferenceEngine:
 
             pos = len(req) - 1
             if hasattr(self, "_tts_mode") and self._tts_mode:
-                pos = pos - (self._tts_prompt_len - 1)
+                if self._forward_mel_positions:
+                    # mel position: the start_mel_token (last prompt token) is at 0, as in `UnifiedVoice.forward`
+                    pos = len(req) - req.num_prompt_tokens
+                else:
+                    pos = pos - (self._tts_prompt_len - 1)
             positions.append(pos)
 
             context_lens.append(len(req))
@@ -391,7 +395,11 @@ class AccelInferenceEngine:
         tts_text_pos_embedding: Optional[
             torch.nn.Module
         ] = None,  # TTS: text_pos_embedding layer
-    ) -> torch.Tensor:
+        return_hidden_states: bool = False,
+        forward_mel_positions: bool = False,
+        hidden_states_out: Optional[List[torch.Tensor]] = None,
+        streamer=None,
+    ):
         """
         Generate tokens.
 
@@ -402,15 +410,27 @@ class AccelInferenceEngine:
             top_k: Top-k sampling
             top_p: Nucleus sampling threshold
             stop_tokens: List of token IDs that stop generation
+            return_hidden_states: Also return the last hidden state (before ``lm_head``)
+                of every generation step
+            forward_mel_positions: Embed the mel tokens at the positions of ``UnifiedVoice.forward``
+                (start_mel_token at 0, per sequence) instead of the released decoding positions,
+                so that the returned hidden states are the ``forward`` latents
+            hidden_states_out: Optional list the hidden states are appended to as soon as each step
+                has computed them (before its token is put to the streamer)
+            streamer: Optional ``transformers`` streamer, receives the prompt ids and then the
+                tokens of every generation step (stop tokens included) like ``generate(streamer=...)``
 
         Returns:
-            Generated token IDs [batch_size, total_len]
+            Generated token IDs [batch_size, total_len], and with ``return_hidden_states``
+            the hidden states [batch_size, num_steps, hidden_size], where step ``i`` is the
+            one that produced the ``i``-th generated token
         """
         batch_size = input_ids.size(0)
         device = input_ids.device
 
         self._tts_mode = tts_embeddings is not None
         self._tts_prompt_len = input_ids.size(1) if self._tts_mode else 0
+        self._forward_mel_positions = forward_mel_positions
 
         if self.use_cuda_graph and not self.graph_captured:
             print(
@@ -474,7 +494,7 @@ class AccelInferenceEngine:
             )  # [1, 1, hidden_dim]
 
             start_pos = torch.tensor(
-                [[tts_embeddings.size(1)]], device="cuda", dtype=torch.long
+                [[0 if forward_mel_positions else tts_embeddings.size(1)]], device="cuda", dtype=torch.long
             )
             pos_emb = tts_text_pos_embedding.emb(start_pos)
             start_emb = start_emb + pos_emb
@@ -530,6 +550,11 @@ class AccelInferenceEngine:
         else:
             logits = self.model.compute_logits(last_hidden)  # [batch_size, vocab_size]
 
+        step_hidden_states = None
+        if return_hidden_states:
+            step_hidden_states = hidden_states_out if hidden_states_out is not None else []
+            step_hidden_states.append(last_hidden)
+
         temperatures = self._prepare_sample(sequences, temperature)
         if temperature > 0:
             first_token = self.sampler(logits, temperatures)
@@ -537,6 +562,9 @@ class AccelInferenceEngine:
             first_token = torch.argmax(logits, dim=-1)
 
         first_token_list = first_token.tolist()
+        if streamer is not None:
+            streamer.put(input_ids.cpu())
+            streamer.put(first_token.cpu())
 
         generated_tokens = [[] for _ in range(batch_size)]
         is_finished = [False] * batch_size
@@ -560,6 +588,10 @@ class AccelInferenceEngine:
                 output_ids.append(full_sequence)
 
             output = torch.tensor(output_ids, dtype=torch.long, device=device)
+            if streamer is not None:
+                streamer.end()
+            if return_hidden_states:
+                return output, torch.stack(step_hidden_states, dim=1)
             return output
 
         remaining_tokens = max_new_tokens - 1
@@ -576,6 +608,10 @@ class AccelInferenceEngine:
                 tts_text_pos_embedding=tts_text_pos_embedding,
             )
 
+            if return_hidden_states:
+                # the CUDA graph output is a static buffer overwritten by the next replay
+                step_hidden_states.append(hidden_states.clone())
+
             # Get logits
             if self.lm_head is not None:
                 logits = self.lm_head(hidden_states)  # [batch_size, vocab_size]
@@ -592,6 +628,8 @@ class AccelInferenceEngine:
             else:
                 next_token = torch.argmax(logits, dim=-1)
             next_token_list = next_token.tolist()
+            if streamer is not None:
+                streamer.put(next_token.cpu())
 
             for i, token_id in enumerate(next_token_list):
                 if is_finished[i]:
@@ -641,7 +679,11 @@ class AccelInferenceEngine:
         assert output.size(0) == batch_size, (
             f"Output batch size mismatch: {output.size(0)} != {batch_size}"
         )
+        if streamer is not None:
+            streamer.end()
 
+        if return_hidden_states:
+            return output, torch.stack(step_hidden_states, dim=1)
         return output
 
 
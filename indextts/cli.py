@@ -6,6 +6,7 @@ warnings.filterwarnings("ignore", category=UserWarning)
 warnings.filterwarnings("ignore", category=FutureWarning)
 def main():
     import argparse
+    from indextts.s2mel.modules.flow_matching import SOLVERS, T_SCHEDULES
     parser = argparse.ArgumentParser(description="IndexTTS Command Line")
     parser.add_argument("text", type=str, help="Text to be synthesized")
     parser.add_argument("-v", "--voice", type=str, required=True, help="Path to the audio prompt file (wav format)")
@@ -15,6 +16,15 @@ def main():
     parser.add_argument("--fp16", action="store_true", default=False, help="Use FP16 for inference if available")
     parser.add_argument("-f", "--force", action="store_true", default=False, help="Force to overwrite the output file if it exists")
     parser.add_argument("-d", "--device", type=str, default=None, help="Device to run the model on (cpu, cuda, mps, xpu)." )
+    # IndexTTS2 s2mel options
+    parser.add_argument("--diffusion_steps", type=int, default=25, help="IndexTTS2: number of s2mel diffusion steps. Default is 25")
+    parser.add_argument("--inference_cfg_rate", type=float, default=0.7, help="IndexTTS2: s2mel classifier-free guidance rate, 0 disables it. Default is 0.7")
+    parser.add_argument("--cfm_solver", type=str, default="euler", choices=list(SOLVERS), help="IndexTTS2: s2mel ODE solver. Default is 'euler'")
+    parser.add_argument("--cfm_cfg_schedule", type=str, default="all", help="IndexTTS2: steps with s2mel guidance: all, first:K, every:N, range:a-b, linear:eps. Default is 'all'")
+    parser.add_argument("--prompt_max_silence", type=float, default=None, help="IndexTTS2: trim the prompt silences with a VAD, internal pauses to at most this many seconds. Default is no trimming")
+    parser.add_argument("--prompt_window", type=float, default=None, help="IndexTTS2: only keep the prompt window of this many seconds with the most speech. Default is the whole prompt")
+    parser.add_argument("--text_workers", type=int, default=0, help="IndexTTS2: worker processes normalizing long texts in parallel, 0 to disable. Default is 0")
+    parser.add_argument("--cfm_t_schedule", type=str, default="linear", choices=list(T_SCHEDULES), help="IndexTTS2: s2mel timestep schedule. Default is 'linear'")
     args = parser.parse_args()
     if len(args.text.strip()) == 0:
         print("ERROR: Text is empty.")
@@ -56,10 +66,20 @@ def main():
             args.fp16 = False # Disable FP16 on CPU
             print("WARNING: Running on CPU may be slow.")
 
-    # TODO: Add CLI support for IndexTTS2.
-    from indextts.infer import IndexTTS
-    tts = IndexTTS(cfg_path=args.config, model_dir=args.model_dir, use_fp16=args.fp16, device=args.device)
-    tts.infer(audio_prompt=args.voice, text=args.text.strip(), output_path=output_path)
+    from omegaconf import OmegaConf
+    if "s2mel" in OmegaConf.load(args.config):
+        from indextts.infer_v2 import IndexTTS2
+        tts = IndexTTS2(cfg_path=args.config, model_dir=args.model_dir, use_fp16=args.fp16, device=args.device,
+                        prompt_max_silence=args.prompt_max_silence, prompt_window_seconds=args.prompt_window,
+                        text_normalize_workers=args.text_workers)
+        tts.infer(spk_audio_prompt=args.voice, text=args.text.strip(), output_path=output_path,
+                  diffusion_steps=args.diffusion_steps, inference_cfg_rate=args.inference_cfg_rate,
+                  cfm_solver=args.cfm_solver, cfm_t_schedule=args.cfm_t_schedule,
+                  cfm_cfg_schedule=args.cfm_cfg_schedule)
+    else:
+        from indextts.infer import IndexTTS
+        tts = IndexTTS(cfg_path=args.config, model_dir=args.model_dir, use_fp16=args.fp16, device=args.device)
+        tts.infer(audio_prompt=args.voice, text=args.text.strip(), output_path=output_path)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -57,6 +57,11 @@ class GPT2InferenceModel(GPT2PreTrainedModel):
         self.model_parallel = False
         self.device_map = None
         self.cached_mel_emb = None
+        # when a list, `forward` appends the last hidden state (before `lm_head`) of every call
+        self.recorded_hidden_states = None
+        # embed the mel tokens decoded with the KV cache at the positions of `UnifiedVoice.forward`
+        # (start_mel_token at 0) instead of the released decoding positions (one further), see `inference_speech`
+        self.forward_mel_positions = False
 
     def parallelize(self, device_map=None):
         self.device_map = (
@@ -155,9 +160,12 @@ class GPT2InferenceModel(GPT2PreTrainedModel):
             emb = torch.cat([mel_emb, text_emb], dim=1)
         else:
             emb = self.embeddings(input_ids)
-            emb = emb + self.text_pos_embedding.get_fixed_embedding(
-                attention_mask.shape[1] - mel_len, attention_mask.device
-            )
+            # the mask covers [cond][text][start_mel][generated codes]
+            position = attention_mask.shape[1] - mel_len
+            if self.forward_mel_positions:
+                # the start_mel_token at position 0, like in `UnifiedVoice.forward`
+                position -= 1
+            emb = emb + self.text_pos_embedding.get_fixed_embedding(position, attention_mask.device)
         transformer_outputs = self.transformer(
             inputs_embeds=emb,
             past_key_values=past_key_values,
@@ -173,6 +181,8 @@ class GPT2InferenceModel(GPT2PreTrainedModel):
             return_dict=return_dict,
         )
         hidden_states = transformer_outputs[0]
+        if self.recorded_hidden_states is not None:
+            self.recorded_hidden_states.append(hidden_states[:, -1])
 
         # Set device for model parallelism
         if self.model_parallel:
@@ -696,7 +706,7 @@ class UnifiedVoice(nn.Module):
         return fake_inputs, batched_mel_emb, attention_mask
 
     def inference_speech(self, speech_condition, text_inputs, emo_speech_condition=None, cond_lengths=None, emo_cond_lengths=None, emo_vec=None, use_speed=False, input_tokens=None, num_return_sequences=1,
-                         max_generate_length=None, typical_sampling=False, typical_mass=.9, **hf_generate_kwargs):
+                         max_generate_length=None, typical_sampling=False, typical_mass=.9, speech_conditioning_latent=None, return_latent=False, **hf_generate_kwargs):
         """
         Args:
             speech_condition: (b, d, frames) or (d, frames)
@@ -704,6 +714,13 @@ class UnifiedVoice(nn.Module):
             cond_mel_lengths: lengths of the conditioning mel spectrograms in shape (b,) or (1,)
             input_tokens: additional tokens for generation in shape (b, s) or (s,)
             max_generate_length: limit the number of generated tokens
+            speech_conditioning_latent: (b, 32, dim) precomputed `get_conditioning(speech_condition)`, skips the conditioning encoder
+            return_latent: also return the mel latents recorded during generation, (b, s, dim) after `final_norm`;
+                with a `TokenStreamer(record_hidden_states=True)` the hidden states are also available while generating
+                (`latent[:, i]` is the state that produced code `i`), saving the `forward()` pass over the generated codes.
+                Opt-in: the mel tokens are then decoded at the positions of `forward()`, so these are the `forward()`
+                latents of the generated codes (up to the numerics of the KV cache), but the sampled codes differ from
+                the default decoding, which embeds mel token `i` one position further.
             hf_generate_kwargs: kwargs for `GPT2InferenceModel.generate(**hf_generate_kwargs)`
         """
 
@@ -716,7 +733,8 @@ class UnifiedVoice(nn.Module):
         if emo_cond_lengths is None:
             emo_cond_lengths = torch.tensor([emo_speech_condition.shape[-1]], device=speech_condition.device) 
 
-        speech_conditioning_latent = self.get_conditioning(speech_condition.transpose(1,2), cond_lengths)
+        if speech_conditioning_latent is None:
+            speech_conditioning_latent = self.get_conditioning(speech_condition.transpose(1,2), cond_lengths)
         if emo_vec is None:
             print('compute emo vec')
             emo_vec = self.get_emo_conditioning(emo_speech_condition.transpose(1,2), emo_cond_lengths)
@@ -725,7 +743,8 @@ class UnifiedVoice(nn.Module):
         else:
             print('Use the specified emotion vector')
 
-        tmp = torch.zeros(text_inputs.size(0)).to(text_inputs.device)
+        # conditioning may be shared by a batch of text inputs, see `prepare_gpt_inputs`
+        tmp = torch.zeros(speech_conditioning_latent.size(0)).to(text_inputs.device)
         duration_emb =  self.speed_emb(torch.zeros_like(tmp).long())
         duration_emb_half = self.speed_emb(torch.ones_like(tmp).long())
         conds_latent = torch.cat((speech_conditioning_latent + emo_vec.unsqueeze(1), duration_emb_half.unsqueeze(1), duration_emb.unsqueeze(1)), 1)
@@ -768,20 +787,69 @@ class UnifiedVoice(nn.Module):
                 tts_embeddings=inputs_embeds,  # [pad][cond][text] embeddings (87 tokens, NO start_mel_token)
                 tts_mel_embedding=self.inference_model.embeddings,  # mel_embedding layer
                 tts_text_pos_embedding=self.inference_model.text_pos_embedding,  # text_pos_embedding layer
+                return_hidden_states=return_latent,
+                forward_mel_positions=return_latent,
+                hidden_states_out=getattr(hf_generate_kwargs.get('streamer'), "hidden_states", None) if return_latent else None,
+                streamer=hf_generate_kwargs.get('streamer'),
             )
+            if return_latent:
+                output, hidden_states = output
+                codes = output[:, trunc_index:]
+                latent = self.final_norm(hidden_states[:, :codes.shape[1]])
+                return codes, speech_conditioning_latent, latent
         else:
-            output = self.inference_model.generate(inputs, 
-                                                bos_token_id=self.start_mel_token, pad_token_id=self.stop_mel_token,
-                                                eos_token_id=self.stop_mel_token, attention_mask=attention_mask,
-                                                max_length=max_length, logits_processor=logits_processor,
-                                                num_return_sequences=num_return_sequences,
-                                                **hf_generate_kwargs)
+            if return_latent:
+                # a streaming consumer reads the hidden states while generating, see `TokenStreamer`
+                recorded_hidden_states = getattr(hf_generate_kwargs.get("streamer"), "hidden_states", None)
+                self.inference_model.recorded_hidden_states = [] if recorded_hidden_states is None else recorded_hidden_states
+                hf_generate_kwargs["return_dict_in_generate"] = True
+                if hf_generate_kwargs.get("num_beams", 1) > 1:
+                    # `beam_indices` is only tracked together with the scores
+                    hf_generate_kwargs.setdefault("output_scores", True)
+            self.inference_model.forward_mel_positions = return_latent
+            try:
+                output = self.inference_model.generate(inputs,
+                                                    bos_token_id=self.start_mel_token, pad_token_id=self.stop_mel_token,
+                                                    eos_token_id=self.stop_mel_token, attention_mask=attention_mask,
+                                                    max_length=max_length, logits_processor=logits_processor,
+                                                    num_return_sequences=num_return_sequences,
+                                                    **hf_generate_kwargs)
+                recorded_hidden_states = self.inference_model.recorded_hidden_states
+            finally:
+                self.inference_model.recorded_hidden_states = None
+                self.inference_model.forward_mel_positions = False
+            if return_latent:
+                codes = output.sequences[:, trunc_index:]
+                latent = self.gather_generated_latent(recorded_hidden_states, codes.shape[1],
+                                                      getattr(output, "beam_indices", None))
+                return codes, speech_conditioning_latent, latent
         if isinstance(output, torch.Tensor):
             return output[:, trunc_index:], speech_conditioning_latent
         # GenerateOutput
         output.sequences = output.sequences[:, trunc_index:]
         return output, speech_conditioning_latent
 
+    def gather_generated_latent(self, step_hidden_states, length, beam_indices=None):
+        """
+        Build the mel latents of the returned sequences from the hidden states recorded at each generation step.
+        Args:
+            step_hidden_states: list of (rows, dim) last hidden states, one per generation step
+            length: number of generated tokens
+            beam_indices: (b, length) row of each step for each returned sequence (beam search), `-1` after its end;
+                None when the returned sequences are the generation rows (sampling / greedy)
+        Returns:
+            latent: (b, length, dim) after `final_norm`
+        """
+        hidden_states = torch.stack(step_hidden_states[:length], dim=1)  # (rows, steps, dim)
+        if beam_indices is not None:
+            beam_indices = beam_indices[:, :length].clamp(min=0).long()
+            steps = torch.arange(beam_indices.shape[1], device=beam_indices.device)
+            hidden_states = hidden_states[beam_indices, steps.unsqueeze(0)]
+        if hidden_states.shape[1] < length:
+            # sequences ended early are padded, their latents are never used
+            hidden_states = F.pad(hidden_states, (0, 0, 0, length - hidden_states.shape[1]))
+        return self.final_norm(hidden_states)
+
     def get_emovec(self, emo_speech_conditioning_latent, emo_cond_lengths):
         emo_vec_syn_ori = self.get_emo_conditioning(emo_speech_conditioning_latent.transpose(1,2), emo_cond_lengths)
         emo_vec_syn = self.emovec_layer(emo_vec_syn_ori)
@@ -791,6 +859,11 @@ class UnifiedVoice(nn.Module):
     def merge_emovec(self, speech_conditioning_latent, emo_speech_conditioning_latent, cond_lengths, emo_cond_lengths, alpha = 1.0):
         emo_vec = self.get_emovec(emo_speech_conditioning_latent, emo_cond_lengths)
         base_vec = self.get_emovec(speech_conditioning_latent, cond_lengths)
+        return self.mix_emovec(base_vec, emo_vec, alpha)
 
-        out = base_vec + alpha * (emo_vec - base_vec)
-        return out
+    @staticmethod
+    def mix_emovec(base_vec, emo_vec, alpha=1.0):
+        """
+        Blend precomputed `get_emovec` outputs of the speaker (`base_vec`) and emotion prompts.
+        """
+        return base_vec + alpha * (emo_vec - base_vec)
@@ -18,7 +18,9 @@ warnings.filterwarnings("ignore", category=UserWarning)
 
 from indextts.BigVGAN.models import BigVGAN as Generator
 from indextts.gpt.model import UnifiedVoice
+from indextts.utils.audio_ingest import decode_audio, resample
 from indextts.utils.checkpoint import load_checkpoint
+from indextts.utils.common import bucket_segments, pad_tokens_cat
 from indextts.utils.feature_extractors import MelSpectrogramFeatures
 
 from indextts.utils.front import TextNormalizer, TextTokenizer
@@ -188,84 +190,6 @@ class IndexTTS:
         code_lens = torch.tensor(code_lens, dtype=torch.long, device=device)
         return codes, code_lens
 
-    def bucket_segments(self, segments, bucket_max_size=4) -> List[List[Dict]]:
-        """
-        Segment data bucketing.
-        if ``bucket_max_size=1``, return all segments in one bucket.
-        """
-        outputs: List[Dict] = []
-        for idx, sent in enumerate(segments):
-            outputs.append({"idx": idx, "sent": sent, "len": len(sent)})
-
-        if len(outputs) > bucket_max_size:
-            # split segments into buckets by segment length
-            buckets: List[List[Dict]] = []
-            factor = 1.5
-            last_bucket = None
-            last_bucket_sent_len_median = 0
-
-            for sent in sorted(outputs, key=lambda x: x["len"]):
-                current_sent_len = sent["len"]
-                if current_sent_len == 0:
-                    print(">> skip empty segment")
-                    continue
-                if last_bucket is None \
-                        or current_sent_len >= int(last_bucket_sent_len_median * factor) \
-                        or len(last_bucket) >= bucket_max_size:
-                    # new bucket
-                    buckets.append([sent])
-                    last_bucket = buckets[-1]
-                    last_bucket_sent_len_median = current_sent_len
-                else:
-                    # current bucket can hold more segments
-                    last_bucket.append(sent)  # sorted
-                    mid = len(last_bucket) // 2
-                    last_bucket_sent_len_median = last_bucket[mid]["len"]
-            last_bucket = None
-            # merge all buckets with size 1
-            out_buckets: List[List[Dict]] = []
-            only_ones: List[Dict] = []
-            for b in buckets:
-                if len(b) == 1:
-                    only_ones.append(b[0])
-                else:
-                    out_buckets.append(b)
-            if len(only_ones) > 0:
-                # merge into previous buckets if possible
-                # print("only_ones:", [(o["idx"], o["len"]) for o in only_ones])
-                for i in range(len(out_buckets)):
-                    b = out_buckets[i]
-                    if len(b) < bucket_max_size:
-                        b.append(only_ones.pop(0))
-                        if len(only_ones) == 0:
-                            break
-                # combined all remaining sized 1 buckets
-                if len(only_ones) > 0:
-                    out_buckets.extend(
-                        [only_ones[i:i + bucket_max_size] for i in range(0, len(only_ones), bucket_max_size)])
-            return out_buckets
-        return [outputs]
-
-    def pad_tokens_cat(self, tokens: List[torch.Tensor]) -> torch.Tensor:
-        if self.model_version and self.model_version >= 1.5:
-            # 1.5版本以上，直接使用stop_text_token 右侧填充，填充到最大长度
-            # [1, N] -> [N,]
-            tokens = [t.squeeze(0) for t in tokens]
-            return pad_sequence(tokens, batch_first=True, padding_value=self.cfg.gpt.stop_text_token,
-                                padding_side="right")
-        max_len = max(t.size(1) for t in tokens)
-        outputs = []
-        for tensor in tokens:
-            pad_len = max_len - tensor.size(1)
-            if pad_len > 0:
-                n = min(8, pad_len)
-                tensor = torch.nn.functional.pad(tensor, (0, n), value=self.cfg.gpt.stop_text_token)
-                tensor = torch.nn.functional.pad(tensor, (0, pad_len - n), value=self.cfg.gpt.start_text_token)
-            tensor = tensor[:, :max_len]
-            outputs.append(tensor)
-        tokens = torch.cat(outputs, dim=0)
-        return tokens
-
     def torch_empty_cache(self):
         try:
             if "cuda" in str(self.device):
@@ -300,11 +224,8 @@ class IndexTTS:
 
         # 如果参考音频改变了，才需要重新生成 cond_mel, 提升速度
         if self.cache_cond_mel is None or self.cache_audio_prompt != audio_prompt:
-            audio, sr = torchaudio.load(audio_prompt)
-            audio = torch.mean(audio, dim=0, keepdim=True)
-            if audio.shape[0] > 1:
-                audio = audio[0].unsqueeze(0)
-            audio = torchaudio.transforms.Resample(sr, 24000)(audio)
+            audio, sr = decode_audio(audio_prompt)
+            audio = resample(audio, sr, 24000)
 
             max_audio_length_seconds = 50  
             max_audio_samples = int(max_audio_length_seconds * 24000)
@@ -360,7 +281,7 @@ class IndexTTS:
         all_text_tokens: List[List[torch.Tensor]] = []
         self._set_gr_progress(0.1, "text processing...")
         bucket_max_size = segments_bucket_max_size if self.device != "cpu" else 1
-        all_segments = self.bucket_segments(segments, bucket_max_size=bucket_max_size)
+        all_segments = bucket_segments(segments, bucket_max_size=bucket_max_size)
         bucket_count = len(all_segments)
         if verbose:
             print(">> segments bucket_count:", bucket_count,
@@ -388,7 +309,9 @@ class IndexTTS:
         for item_tokens in all_text_tokens:
             batch_num = len(item_tokens)
             if batch_num > 1:
-                batch_text_tokens = self.pad_tokens_cat(item_tokens)
+                legacy_start_token = None if self.model_version and self.model_version >= 1.5 \
+                    else self.cfg.gpt.start_text_token
+                batch_text_tokens = pad_tokens_cat(item_tokens, self.cfg.gpt.stop_text_token, legacy_start_token)
             else:
                 batch_text_tokens = item_tokens[0]
             processed_num += batch_num
@@ -526,11 +449,8 @@ class IndexTTS:
 
         # 如果参考音频改变了，才需要重新生成 cond_mel, 提升速度
         if self.cache_cond_mel is None or self.cache_audio_prompt != audio_prompt:
-            audio, sr = torchaudio.load(audio_prompt)
-            audio = torch.mean(audio, dim=0, keepdim=True)
-            if audio.shape[0] > 1:
-                audio = audio[0].unsqueeze(0)
-            audio = torchaudio.transforms.Resample(sr, 24000)(audio)
+            audio, sr = decode_audio(audio_prompt)
+            audio = resample(audio, sr, 24000)
             cond_mel = MelSpectrogramFeatures()(audio).to(self.device)
             cond_mel_frame = cond_mel.shape[-1]
             if verbose:
@@ -5,7 +5,6 @@ os.environ['HF_HUB_CACHE'] = './checkpoints/hf_cache'
 import json
 import re
 import time
-import librosa
 import torch
 import torchaudio
 from torch.nn.utils.rnn import pad_sequence
@@ -18,9 +17,17 @@ warnings.filterwarnings("ignore", category=UserWarning)
 from omegaconf import OmegaConf
 
 from indextts.gpt.model_v2 import UnifiedVoice
-from indextts.utils.maskgct_utils import build_semantic_model, build_semantic_codec
+from indextts.utils.maskgct_utils import W2V_BERT_MODEL, build_semantic_model, build_semantic_codec
 from indextts.utils.checkpoint import load_checkpoint
+from indextts.utils.common import bucket_segments, pad_tokens_cat
 from indextts.utils.front import TextNormalizer, TextTokenizer
+from indextts.utils.text_pool import NormalizerPool
+from indextts.utils.prompt_cache import PromptFeatureCache, PromptFeatureStore, feature_version, hash_audio
+from indextts.utils.prompt_trim import apply_spans, prompt_spans
+from indextts.utils.lazy_models import LazyModelRegistry
+from indextts.utils.audio_ingest import AudioClip, decode_audio, resample
+from indextts.utils.feature_extractors import SeamlessM4TFbankFeatures
+from indextts.utils.pipeline import BackgroundStage, CrossfadeStream, TokenStreamer, thread_local_num_threads
 
 from indextts.s2mel.modules.commons import load_checkpoint2, MyModel
 from indextts.s2mel.modules.bigvgan import bigvgan
@@ -29,16 +36,20 @@ from indextts.s2mel.modules.audio import mel_spectrogram
 
 from transformers import AutoTokenizer
 from modelscope import AutoModelForCausalLM
-from huggingface_hub import hf_hub_download
+from huggingface_hub import hf_hub_download, try_to_load_from_cache
 import safetensors
-from transformers import SeamlessM4TFeatureExtractor
 import random
+from typing import Dict, List
 import torch.nn.functional as F
 
 class IndexTTS2:
     def __init__(
             self, cfg_path="checkpoints/config.yaml", model_dir="checkpoints", use_fp16=False, device=None,
-            use_cuda_kernel=None,use_deepspeed=False, use_accel=False, use_torch_compile=False
+            use_cuda_kernel=None,use_deepspeed=False, use_accel=False, use_torch_compile=False,
+            prompt_cache_entries=32, prompt_cache_bytes=512 * 1024 * 1024, prompt_store_dir=None,
+            vocoder_max_batch_frames=0, gpt_num_threads=None, s2mel_num_threads=None,
+            prompt_max_silence=None, prompt_window_seconds=None, optional_models_idle_timeout=None,
+            text_normalize_workers=0
     ):
         """
         Args:
@@ -50,6 +61,26 @@ class IndexTTS2:
             use_deepspeed (bool): whether to use DeepSpeed or not.
             use_accel (bool): whether to use acceleration engine for GPT2 or not.
             use_torch_compile (bool): whether to use torch.compile for optimization or not.
+            prompt_cache_entries (int): max number of speaker/emotion prompts kept in the feature cache, 0 to disable.
+            prompt_cache_bytes (int): max total size in bytes of the cached prompt features.
+            prompt_store_dir (None | str): directory of the persistent prompt feature store, None to disable.
+            vocoder_max_batch_frames (None | int): max `batch_size * mel_frames` of a batched BigVGAN call, None for no limit,
+                0 (default) vocodes the segments one by one: batching only groups near-equal lengths and has not
+                been measured faster than one by one (see `tests/bigvgan_batch_test.py`).
+            gpt_num_threads (None | int): intra-op CPU threads of the GPT stage in pipelined inference.
+            s2mel_num_threads (None | int): intra-op CPU threads of the s2mel/vocoder stage in pipelined inference.
+                The stage budgets need a PyTorch build where `torch.set_num_threads` is per thread
+                (OpenMP backend, see `pipeline.thread_local_num_threads`), they are ignored otherwise.
+            prompt_max_silence (None | float): trim the silences of the reference prompts with an energy VAD:
+                leading/trailing silence to half of it and internal pauses to at most this many seconds. None to disable.
+            prompt_window_seconds (None | float): only keep the window of this length (e.g. 6-8 s) of the
+                (trimmed) reference prompts with the most speech. None to disable.
+            optional_models_idle_timeout (None | float): the optional components (QwenEmotion for `use_emo_text`,
+                the emotion/speaker matrices for emotion vectors) are loaded on first use and unloaded after
+                this many idle seconds. None keeps them loaded once used.
+            text_normalize_workers (int): worker processes normalizing long texts in parallel (Chinese texts
+                split at sentence boundaries once checked to match whole-text normalization), 0 to normalize in
+                the current process, None for one per CPU core. `close()` stops them.
         """
         if device is not None:
             self.device = device
@@ -80,7 +111,13 @@ class IndexTTS2:
         self.use_accel = use_accel
         self.use_torch_compile = use_torch_compile
 
-        self.qwen_emo = QwenEmotion(os.path.join(self.model_dir, self.cfg.qwen_emo_path))
+        # 可选组件（文本情感模型、情感/说话人矩阵）在首次使用时加载，空闲超时后卸载
+        self.optional_models = LazyModelRegistry(idle_timeout=optional_models_idle_timeout)
+        self.optional_models.register(
+            "qwen_emo", lambda: QwenEmotion(os.path.join(self.model_dir, self.cfg.qwen_emo_path)))
+        self.optional_models.register("emo_matrix", lambda: self._load_matrix(self.cfg.emo_matrix))
+        self.optional_models.register("spk_matrix", lambda: self._load_matrix(self.cfg.spk_matrix))
+        self.emo_num = list(self.cfg.emo_num)
 
         self.gpt = UnifiedVoice(**self.cfg.gpt, use_accel=self.use_accel)
         self.gpt_path = os.path.join(self.model_dir, self.cfg.gpt_checkpoint)
@@ -112,7 +149,7 @@ class IndexTTS2:
                 print(f"{e!r}")
                 self.use_cuda_kernel = False
 
-        self.extract_features = SeamlessM4TFeatureExtractor.from_pretrained("facebook/w2v-bert-2.0")
+        self.extract_features = SeamlessM4TFbankFeatures().to(self.device)
         self.semantic_model, self.semantic_mean, self.semantic_std = build_semantic_model(
             os.path.join(self.model_dir, self.cfg.w2v_stat))
         self.semantic_model = self.semantic_model.to(self.device)
@@ -164,13 +201,19 @@ class IndexTTS2:
         self.bigvgan = self.bigvgan.to(self.device)
         self.bigvgan.remove_weight_norm()
         self.bigvgan.eval()
+        self.vocoder_max_batch_frames = vocoder_max_batch_frames
+        self.gpt_num_threads = gpt_num_threads
+        self.s2mel_num_threads = s2mel_num_threads
         print(">> bigvgan weights restored from:", bigvgan_name)
 
         self.bpe_path = os.path.join(self.model_dir, self.cfg.dataset["bpe_model"])
         self.normalizer = TextNormalizer(enable_glossary=True)
         self.normalizer.load()
         print(">> TextNormalizer loaded")
-        self.tokenizer = TextTokenizer(self.bpe_path, self.normalizer)
+        self.normalizer_pool = None
+        if text_normalize_workers is None or text_normalize_workers > 1:
+            self.normalizer_pool = NormalizerPool(self.normalizer, num_workers=text_normalize_workers)
+        self.tokenizer = TextTokenizer(self.bpe_path, self.normalizer, normalizer_pool=self.normalizer_pool)
         print(">> bpe model loaded from:", self.bpe_path)
 
         # 加载术语词汇表（如果存在）
@@ -179,16 +222,6 @@ class IndexTTS2:
             self.normalizer.load_glossary_from_yaml(self.glossary_path)
             print(">> Glossary loaded from:", self.glossary_path)
 
-        emo_matrix = torch.load(os.path.join(self.model_dir, self.cfg.emo_matrix))
-        self.emo_matrix = emo_matrix.to(self.device)
-        self.emo_num = list(self.cfg.emo_num)
-
-        spk_matrix = torch.load(os.path.join(self.model_dir, self.cfg.spk_matrix))
-        self.spk_matrix = spk_matrix.to(self.device)
-
-        self.emo_matrix = torch.split(self.emo_matrix, self.emo_num)
-        self.spk_matrix = torch.split(self.spk_matrix, self.emo_num)
-
         mel_fn_args = {
             "n_fft": self.cfg.s2mel['preprocess_params']['spect_params']['n_fft'],
             "win_size": self.cfg.s2mel['preprocess_params']['spect_params']['win_length'],
@@ -201,27 +234,63 @@ class IndexTTS2:
         }
         self.mel_fn = lambda x: mel_spectrogram(x, **mel_fn_args)
 
-        # 缓存参考音频：
-        self.cache_spk_cond = None
-        self.cache_s2mel_style = None
-        self.cache_s2mel_prompt = None
-        self.cache_spk_audio_prompt = None
-        self.cache_emo_cond = None
-        self.cache_emo_audio_prompt = None
-        self.cache_mel = None
+        # 缓存参考音频特征（按音频内容哈希，说话人与情感参考共享）：
+        self.prompt_cache = PromptFeatureCache(max_entries=prompt_cache_entries, max_bytes=prompt_cache_bytes)
+        # 持久化的参考音频特征（按模型/配置版本区分），进程重启后无需重新编码
+        self.prompt_store = None
+        if prompt_store_dir:
+            # every model the prompt features depend on
+            w2v_bert_path = try_to_load_from_cache(W2V_BERT_MODEL, "model.safetensors")
+            version = feature_version(self.cfg, self.gpt_path, s2mel_path,
+                                      os.path.join(self.model_dir, self.cfg.w2v_stat),
+                                      w2v_bert_path if isinstance(w2v_bert_path, str) else None,
+                                      semantic_code_ckpt, campplus_ckpt_path)
+            self.prompt_store = PromptFeatureStore(prompt_store_dir, version)
+            print(">> prompt feature store:", self.prompt_store.directory)
+
+        # 参考音频预处理：VAD 去除静音、截取语音最密集的窗口（缩短 DiT 的 prompt 前缀）
+        self.prompt_max_silence = prompt_max_silence
+        self.prompt_window_seconds = prompt_window_seconds
 
         # 进度引用显示（可选）
         self.gr_progress = None
         self.model_version = self.cfg.version if hasattr(self.cfg, "version") else None
 
+    def close(self):
+        """
+        Stop the text normalization worker processes and unload the optional components.
+        """
+        if getattr(self, "normalizer_pool", None) is not None:
+            self.normalizer_pool.close()
+        if getattr(self, "optional_models", None) is not None:
+            self.optional_models.close()
+
+    def __del__(self):
+        self.close()
+
+    @property
+    def qwen_emo(self) -> "QwenEmotion":
+        return self.optional_models.get("qwen_emo")
+
+    @property
+    def emo_matrix(self):
+        return self.optional_models.get("emo_matrix")
+
+    @property
+    def spk_matrix(self):
+        return self.optional_models.get("spk_matrix")
+
+    def _load_matrix(self, filename):
+        matrix = torch.load(os.path.join(self.model_dir, filename)).to(self.device)
+        return torch.split(matrix, self.emo_num)
+
     @torch.no_grad()
     def get_emb(self, input_features, attention_mask):
         vq_emb = self.semantic_model(
             input_features=input_features,
             attention_mask=attention_mask,
-            output_hidden_states=True,
         )
-        feat = vq_emb.hidden_states[17]  # (B, T, C)
+        feat = vq_emb.last_hidden_state  # (B, T, C), layer 17 of the truncated model
         feat = (feat - self.semantic_mean) / self.semantic_std
         return feat
 
@@ -319,24 +388,219 @@ class IndexTTS2:
 
         return wavs_list
 
+    @torch.no_grad()
+    def s2mel_inference(self, conds: List[torch.Tensor], prompt_condition, ref_mel, style,
+                        diffusion_steps=25, inference_cfg_rate=0.7, cfm_solver="euler",
+                        cfm_t_schedule="linear", cfm_cfg_schedule="all") -> List[torch.Tensor]:
+        """
+        Run the s2mel flow matching for several segments sharing the same reference prompt in one batch.
+        The conditions are padded to a common length and masked by their lengths in the DiT.
+
+        Args:
+            conds: semantic conditions of the segments from the length regulator, each (1, T_i, 512)
+            prompt_condition: (1, P, 512) semantic condition of the reference audio
+            ref_mel: (1, 80, P) reference mel
+            style: (1, 192) reference global style
+            diffusion_steps: number of intervals of the CFM timestep schedule
+            inference_cfg_rate: classifier-free guidance rate, ``0`` disables the guidance (half the DiT batch)
+            cfm_solver: ODE solver, see `flow_matching.SOLVERS`
+            cfm_t_schedule: timestep schedule, see `flow_matching.T_SCHEDULES`
+            cfm_cfg_schedule: steps with guidance, see `flow_matching.get_cfg_schedule`
+
+        Returns:
+            list of (1, 80, T_i) mel spectrograms, without the reference frames
+        """
+        prompt_len = ref_mel.size(-1)
+        cat_conditions = [torch.cat([prompt_condition, cond], dim=1).squeeze(0) for cond in conds]
+        x_lens = torch.LongTensor([c.size(0) for c in cat_conditions]).to(prompt_condition.device)
+        cat_condition = pad_sequence(cat_conditions, batch_first=True)
+        style = style.expand(len(conds), -1)
+        vc_target = self.s2mel.models['cfm'].inference(cat_condition, x_lens,
+                                                       ref_mel, style, None, diffusion_steps,
+                                                       inference_cfg_rate=inference_cfg_rate,
+                                                       solver=cfm_solver, t_schedule=cfm_t_schedule,
+                                                       cfg_schedule=cfm_cfg_schedule)
+        return [vc_target[i:i + 1, :, prompt_len:x_lens[i]] for i in range(len(conds))]
+
     def _set_gr_progress(self, value, desc):
         if self.gr_progress is not None:
             self.gr_progress(value, desc=desc)
 
     def _load_and_cut_audio(self,audio_path,max_audio_length_seconds,verbose=False,sr=None):
-        if not sr:
-            audio, sr = librosa.load(audio_path)
+        # 只解码一次，保留原始采样率；需要的 16k/22.05k 由缓存的重采样核生成
+        audio, native_sr = decode_audio(audio_path)
+        if sr:
+            audio = resample(audio, native_sr, sr)
         else:
-            audio, _ = librosa.load(audio_path,sr=sr)
-        audio = torch.tensor(audio).unsqueeze(0)
-        max_audio_samples = int(max_audio_length_seconds * sr)
+            sr = native_sr
+        if max_audio_length_seconds is not None:
+            audio = self._cut_audio(audio, sr, max_audio_length_seconds, verbose)
+        return audio, sr
 
+    def _cut_audio(self, audio, sr, max_audio_length_seconds, verbose=False):
+        max_audio_samples = int(max_audio_length_seconds * sr)
         if audio.shape[1] > max_audio_samples:
             if verbose:
                 print(f"Audio too long ({audio.shape[1]} samples), truncating to {max_audio_samples} samples")
             audio = audio[:, :max_audio_samples]
-        return audio, sr
-    
+        return audio
+
+    @property
+    def prompt_trim(self):
+        """
+        Tag of the prompt trimming settings (part of the prompt cache keys), None when disabled.
+        """
+        if self.prompt_max_silence is None and not self.prompt_window_seconds:
+            return None
+        return f"trim-s{self.prompt_max_silence}-w{self.prompt_window_seconds}"
+
+    @torch.no_grad()
+    def get_prompt_features(self, audio_prompt, speaker=True, verbose=False):
+        """
+        Load the prompt features of a reference audio from the prompt cache (or the persistent
+        prompt store), computing the missing ones.
+
+        Args:
+            audio_prompt (str): path to the reference audio.
+            speaker (bool): also compute the speaker-only features: the GPT conditioning latent
+                `gpt_cond_latent` and the s2mel features (`S_ref`, `ref_mel`, `style`, `prompt_condition`).
+                When False, only `cond_emb` (the w2v-bert embedding) and `emovec` (its GPT emotion
+                vector) are required.
+
+        Returns:
+            dict: the cache entry, `cond_emb` and `emovec` are shared by the speaker and emotion roles.
+                With prompt trimming, `prompt_spans` holds the (start, end) sample spans of the loaded
+                audio the features were computed from.
+        """
+        return self.get_prompt_features_batch([audio_prompt], speaker=speaker, verbose=verbose)[0]
+
+    @torch.no_grad()
+    def get_prompt_features_batch(self, audio_prompts, speaker=True, verbose=False, batch_size=8):
+        """
+        Batched `get_prompt_features`: the prompts missing from the cache/store are encoded together,
+        `batch_size` prompts at a time. The w2v-bert pass, the bulk of the encoding, runs on the padded
+        batch (masked by the prompt lengths, same result as unbatched). The GPT conditioning encoders,
+        the semantic codec, the CAMPPlus fbank path and the length regulator run per prompt: their
+        convolutions, GroupNorm and statistics pooling would see the padding.
+        One call only batches its own prompts: the API server merges the prompts of concurrent
+        requests into one call (`PromptEncodeBatcher` in `api_server.py`).
+
+        Args:
+            audio_prompts (List[str]): paths to the reference audios, duplicates are encoded once.
+            speaker (bool | List[bool]): also compute the speaker-only features, for all or per prompt.
+
+        Returns:
+            List[dict]: the cache entry of every prompt.
+        """
+        speakers = list(speaker) if isinstance(speaker, (list, tuple)) else [speaker] * len(audio_prompts)
+        prompts = {}
+        keys = []
+        for audio_prompt, spk in zip(audio_prompts, speakers):
+            prompt = self._lookup_prompt(audio_prompt, spk, verbose)
+            keys.append(prompt["key"])
+            merged = prompts.get(prompt["key"])
+            if merged is not None:
+                # the same audio in several roles: encode it once, for the role requiring the most features
+                if prompt["missing"] and not merged["missing"]:
+                    merged, prompt = prompt, merged
+                merged["speaker"] = merged["speaker"] or prompt["speaker"]
+            prompts[prompt["key"] if merged is None else merged["key"]] = merged or prompt
+        pending = [prompt for prompt in prompts.values() if prompt["missing"]]
+        for i in range(0, len(pending), max(1, batch_size)):
+            self._encode_prompts(pending[i:i + batch_size], verbose)
+        for prompt in prompts.values():
+            if prompt["features"]:
+                if verbose:
+                    print(f">> prompt features computed for {prompt['path']}: {list(prompt['features'].keys())}")
+                prompt["entry"] = self.prompt_cache.update(prompt["key"], **prompt["features"])
+                if self.prompt_store is not None:
+                    self.prompt_store.save(prompt["key"], prompt["entry"])
+            elif verbose:
+                print(f">> prompt features loaded from cache for {prompt['path']}")
+        return [prompts[key]["entry"] for key in keys]
+
+    def _lookup_prompt(self, audio_prompt, speaker, verbose=False):
+        """
+        Load (and trim) a reference audio and look its features up in the cache and the store.
+        """
+        trim = self.prompt_trim
+        # with trimming, the whole audio is loaded and the 15s limit applies to the trimmed audio
+        audio, sr = self._load_and_cut_audio(audio_prompt, None if trim else 15, verbose)
+        key = hash_audio(audio, sr)
+        if trim:
+            key = f"{key}-{trim}"
+        entry = self.prompt_cache.get(key) or {}
+        required = ("cond_emb", "emovec", "gpt_cond_latent", "style") if speaker else ("cond_emb", "emovec")
+        if self.prompt_store is not None and any(name not in entry for name in required):
+            stored = self.prompt_store.load(key, device=self.device)
+            if stored:
+                entry = self.prompt_cache.update(key, **stored)
+        missing = any(name not in entry for name in required)
+        features = {}
+        if trim and missing:
+            if "prompt_spans" in entry:
+                spans = [tuple(span) for span in entry["prompt_spans"].tolist()]
+            else:
+                spans = prompt_spans(audio, sr, max_silence=self.prompt_max_silence,
+                                     window_seconds=self.prompt_window_seconds)
+                features["prompt_spans"] = torch.tensor(spans, dtype=torch.long)
+            trimmed = self._cut_audio(apply_spans(audio, spans), sr, 15, verbose)
+            if verbose:
+                print(f">> prompt trimmed from {audio.shape[1] / sr:.2f}s to {trimmed.shape[1] / sr:.2f}s")
+            audio = trimmed
+        return dict(path=audio_prompt, key=key, clip=AudioClip(audio, sr), speaker=speaker, entry=entry,
+                    features=features, missing=missing)
+
+    def _encode_prompts(self, prompts, verbose=False):
+        """
+        Compute the missing features of the looked up `prompts` into their `features`.
+        """
+        def get(prompt, name):
+            return prompt["features"].get(name, prompt["entry"].get(name))
+
+        need_emb = [prompt for prompt in prompts if get(prompt, "cond_emb") is None]
+        if need_emb:
+            input_features, attention_mask = self.extract_features([prompt["clip"].at(16000)[0] for prompt in need_emb])
+            cond_emb = self.get_emb(input_features, attention_mask)
+            for prompt, emb in zip(need_emb, cond_emb):
+                # the length of the unbatched features: fbank frames stacked by 2 (last one padded)
+                num_frames = self.extract_features.num_frames(prompt["clip"].at(16000).shape[-1])
+                prompt["features"]["cond_emb"] = emb[None, :(num_frames + 1) // 2].clone()
+        for prompt in prompts:
+            cond_emb = get(prompt, "cond_emb")
+            # the GPT conditioning encoders only depend on the prompt, run them once per prompt
+            cond_lengths = torch.tensor([cond_emb.shape[-1]], device=cond_emb.device)
+            with torch.amp.autocast(cond_emb.device.type, enabled=self.dtype is not None, dtype=self.dtype):
+                if get(prompt, "emovec") is None:
+                    prompt["features"]["emovec"] = self.gpt.get_emovec(cond_emb, cond_lengths)
+                if prompt["speaker"] and get(prompt, "gpt_cond_latent") is None:
+                    prompt["features"]["gpt_cond_latent"] = self.gpt.get_conditioning(cond_emb.transpose(1, 2),
+                                                                                      cond_lengths)
+            if prompt["speaker"] and get(prompt, "style") is None:
+                prompt["features"].update(self._speaker_features(prompt["clip"], get(prompt, "cond_emb")))
+
+    def _speaker_features(self, clip, cond_emb):
+        """
+        The s2mel speaker features of one prompt `clip`: `S_ref`, `ref_mel`, `style` and `prompt_condition`.
+        """
+        audio_16k = clip.at(16000)
+        audio_22k = clip.at(22050)
+        _, S_ref = self.semantic_codec.quantize(cond_emb)
+        ref_mel = self.mel_fn(audio_22k.to(cond_emb.device).float())
+        ref_target_lengths = torch.LongTensor([ref_mel.size(2)]).to(ref_mel.device)
+        feat = torchaudio.compliance.kaldi.fbank(audio_16k.to(ref_mel.device),
+                                                 num_mel_bins=80,
+                                                 dither=0,
+                                                 sample_frequency=16000)
+        feat = feat - feat.mean(dim=0, keepdim=True)  # feat2另外一个滤波器能量组特征[922, 80]
+        style = self.campplus_model(feat.unsqueeze(0))  # 参考音频的全局style2[1,192]
+
+        prompt_condition = self.s2mel.models['length_regulator'](S_ref,
+                                                                 ylens=ref_target_lengths,
+                                                                 n_quantizers=3,
+                                                                 f0=None)[0]
+        return dict(S_ref=S_ref, ref_mel=ref_mel, style=style, prompt_condition=prompt_condition)
+
     def normalize_emo_vec(self, emo_vector, apply_bias=True):
         # apply biased emotion factors for better user experience,
         # by de-emphasizing emotions that can cause strange results
@@ -358,14 +622,39 @@ class IndexTTS2:
               emo_audio_prompt=None, emo_alpha=1.0,
               emo_vector=None,
               use_emo_text=False, emo_text=None, use_random=False, interval_silence=200,
-              verbose=False, max_text_tokens_per_segment=120, stream_return=False, more_segment_before=0, **generation_kwargs):
+              verbose=False, max_text_tokens_per_segment=120, stream_return=False, more_segment_before=0,
+              segments_bucket_max_size=1, pipelined=False, stream_chunk_tokens=0, stream_context_tokens=25,
+              **generation_kwargs):
+        """
+        Args:
+            ``segments_bucket_max_size``: 分句分桶的最大容量，默认``1``（逐句生成），大于1时同一桶内的句子批量进行GPT生成
+                - 越大，bucket数量越少，batch越多，多句长文本的推理速度越*快*，占用内存更多
+                - 流式返回（``stream_return``）时不分桶
+            ``pipelined``: 流水线模式，GPT阶段在后台线程中生成后续句子，同时当前句进行s2mel和声码器推理，
+                输出顺序与流式返回行为不变；两个阶段的CPU线程数由 ``gpt_num_threads``/``s2mel_num_threads`` 指定（仅在 ``torch.set_num_threads`` 按线程生效时）
+            ``latent_from_generation`` (generation_kwargs): 直接使用GPT生成过程中记录的隐状态作为latent，省去对生成结果的第二次完整前向，默认 ``False``
+                - 开启后生成使用与前向相同的mel位置编码，记录的latent与前向latent一致（见 ``tests/gpt_latent_test.py``），
+                  但采样得到的语义token与默认解码不同；尚未在发布的模型上对比WER/说话人相似度，也未在accel引擎上验证
+            ``stream_chunk_tokens``: 句内低延迟流式返回（需 ``stream_return=True``），默认``0``（关闭）
+                - GPT每生成 ``stream_chunk_tokens`` 个语义token（50个/秒）即对该块进行s2mel和声码器推理并返回音频
+                - 每块带 ``stream_context_tokens`` 个token的左侧上下文，块之间交叉淡化拼接；该模式下 ``num_beams`` 固定为1
+            s2mel参数 (generation_kwargs):
+                - ``diffusion_steps``: CFM扩散步数，默认``25``
+                - ``inference_cfg_rate``: CFG强度，默认``0.7``，``0``时关闭CFG（DiT批量减半）
+                - ``cfm_solver``: ODE求解器 ``euler``/``midpoint``/``heun``/``dpm_2m``，默认``euler``；``midpoint``/``heun``每步计算两次DiT
+                - ``cfm_t_schedule``: 时间步分布 ``linear``/``cosine``，默认``linear``
+                - ``cfm_cfg_schedule``: CFG步调度，默认``all``（每步）；``first:K`` 仅前K步，``every:N`` 每N步，
+                  ``range:a-b`` 仅 a<=t<b，``linear:eps`` 强度随t线性衰减、低于eps后跳过；未使用CFG的步DiT批量减半
+        """
         if stream_return:
             return self.infer_generator(
                 spk_audio_prompt, text, output_path,
                 emo_audio_prompt, emo_alpha,
                 emo_vector,
                 use_emo_text, emo_text, use_random, interval_silence,
-                verbose, max_text_tokens_per_segment, stream_return, more_segment_before, **generation_kwargs
+                verbose, max_text_tokens_per_segment, stream_return, more_segment_before,
+                segments_bucket_max_size=segments_bucket_max_size, pipelined=pipelined,
+                stream_chunk_tokens=stream_chunk_tokens, stream_context_tokens=stream_context_tokens, **generation_kwargs
             )
         else:
             try:
@@ -374,7 +663,9 @@ class IndexTTS2:
                     emo_audio_prompt, emo_alpha,
                     emo_vector,
                     use_emo_text, emo_text, use_random, interval_silence,
-                    verbose, max_text_tokens_per_segment, stream_return, more_segment_before, **generation_kwargs
+                    verbose, max_text_tokens_per_segment, stream_return, more_segment_before,
+                segments_bucket_max_size=segments_bucket_max_size, pipelined=pipelined,
+                stream_chunk_tokens=stream_chunk_tokens, stream_context_tokens=stream_context_tokens, **generation_kwargs
                 ))[0]
             except IndexError:
                 return None
@@ -383,7 +674,9 @@ class IndexTTS2:
               emo_audio_prompt=None, emo_alpha=1.0,
               emo_vector=None,
               use_emo_text=False, emo_text=None, use_random=False, interval_silence=200,
-              verbose=False, max_text_tokens_per_segment=120, stream_return=False, quick_streaming_tokens=0, **generation_kwargs):
+              verbose=False, max_text_tokens_per_segment=120, stream_return=False, quick_streaming_tokens=0,
+              segments_bucket_max_size=1, pipelined=False, stream_chunk_tokens=0, stream_context_tokens=25,
+              **generation_kwargs):
         print(">> starting inference...")
         self._set_gr_progress(0, "starting inference...")
         if verbose:
@@ -424,50 +717,19 @@ class IndexTTS2:
             # must always use alpha=1.0 when we don't have an external reference voice
             emo_alpha = 1.0
 
-        # 如果参考音频改变了，才需要重新生成, 提升速度
-        if self.cache_spk_cond is None or self.cache_spk_audio_prompt != spk_audio_prompt:
-            if self.cache_spk_cond is not None:
-                self.cache_spk_cond = None
-                self.cache_s2mel_style = None
-                self.cache_s2mel_prompt = None
-                self.cache_mel = None
-                torch.cuda.empty_cache()
-            audio,sr = self._load_and_cut_audio(spk_audio_prompt,15,verbose)
-            audio_22k = torchaudio.transforms.Resample(sr, 22050)(audio)
-            audio_16k = torchaudio.transforms.Resample(sr, 16000)(audio)
-
-            inputs = self.extract_features(audio_16k, sampling_rate=16000, return_tensors="pt")
-            input_features = inputs["input_features"]
-            attention_mask = inputs["attention_mask"]
-            input_features = input_features.to(self.device)
-            attention_mask = attention_mask.to(self.device)
-            spk_cond_emb = self.get_emb(input_features, attention_mask)
-
-            _, S_ref = self.semantic_codec.quantize(spk_cond_emb)
-            ref_mel = self.mel_fn(audio_22k.to(spk_cond_emb.device).float())
-            ref_target_lengths = torch.LongTensor([ref_mel.size(2)]).to(ref_mel.device)
-            feat = torchaudio.compliance.kaldi.fbank(audio_16k.to(ref_mel.device),
-                                                     num_mel_bins=80,
-                                                     dither=0,
-                                                     sample_frequency=16000)
-            feat = feat - feat.mean(dim=0, keepdim=True)  # feat2另外一个滤波器能量组特征[922, 80]
-            style = self.campplus_model(feat.unsqueeze(0))  # 参考音频的全局style2[1,192]
-
-            prompt_condition = self.s2mel.models['length_regulator'](S_ref,
-                                                                     ylens=ref_target_lengths,
-                                                                     n_quantizers=3,
-                                                                     f0=None)[0]
-
-            self.cache_spk_cond = spk_cond_emb
-            self.cache_s2mel_style = style
-            self.cache_s2mel_prompt = prompt_condition
-            self.cache_spk_audio_prompt = spk_audio_prompt
-            self.cache_mel = ref_mel
+        # 参考音频特征按内容缓存，相同音频（即使路径不同）无需重新生成, 提升速度；
+        # 说话人与情感参考音频一起批量编码
+        if emo_audio_prompt == spk_audio_prompt:
+            spk_features, = self.get_prompt_features_batch([spk_audio_prompt], speaker=True, verbose=verbose)
+            # the default "emotion = speaker" case shares the speaker features
+            emo_features = spk_features
         else:
-            style = self.cache_s2mel_style
-            prompt_condition = self.cache_s2mel_prompt
-            spk_cond_emb = self.cache_spk_cond
-            ref_mel = self.cache_mel
+            spk_features, emo_features = self.get_prompt_features_batch(
+                [spk_audio_prompt, emo_audio_prompt], speaker=[True, False], verbose=verbose)
+        style = spk_features["style"]
+        prompt_condition = spk_features["prompt_condition"]
+        spk_cond_emb = spk_features["cond_emb"]
+        ref_mel = spk_features["ref_mel"]
 
         if emo_vector is not None:
             weight_vector = torch.tensor(emo_vector, device=self.device)
@@ -482,39 +744,25 @@ class IndexTTS2:
             emovec_mat = torch.sum(emovec_mat, 0)
             emovec_mat = emovec_mat.unsqueeze(0)
 
-        if self.cache_emo_cond is None or self.cache_emo_audio_prompt != emo_audio_prompt:
-            if self.cache_emo_cond is not None:
-                self.cache_emo_cond = None
-                torch.cuda.empty_cache()
-            emo_audio, _ = self._load_and_cut_audio(emo_audio_prompt,15,verbose,sr=16000)
-            emo_inputs = self.extract_features(emo_audio, sampling_rate=16000, return_tensors="pt")
-            emo_input_features = emo_inputs["input_features"]
-            emo_attention_mask = emo_inputs["attention_mask"]
-            emo_input_features = emo_input_features.to(self.device)
-            emo_attention_mask = emo_attention_mask.to(self.device)
-            emo_cond_emb = self.get_emb(emo_input_features, emo_attention_mask)
-
-            self.cache_emo_cond = emo_cond_emb
-            self.cache_emo_audio_prompt = emo_audio_prompt
-        else:
-            emo_cond_emb = self.cache_emo_cond
+        emo_cond_emb = emo_features["cond_emb"]
 
         self._set_gr_progress(0.1, "text processing...")
-        text_tokens_list = self.tokenizer.tokenize(text)
-        segments = self.tokenizer.split_segments(text_tokens_list, max_text_tokens_per_segment, quick_streaming_tokens = quick_streaming_tokens)
+        # 分句直接得到各句的 token id
+        text_token_ids, segments = self.tokenizer.encode_segments(
+            text, max_text_tokens_per_segment, quick_streaming_tokens=quick_streaming_tokens)
         segments_count = len(segments)
 
-        text_token_ids = self.tokenizer.convert_tokens_to_ids(text_tokens_list)
         if self.tokenizer.unk_token_id in text_token_ids:
+            text_tokens_list = self.tokenizer.tokenize(text)
             print(f"  >> Warning: input text contains {text_token_ids.count(self.tokenizer.unk_token_id)} unknown tokens (id={self.tokenizer.unk_token_id}):")
             print( "     Tokens which can't be encoded: ", [t for t, id in zip(text_tokens_list, text_token_ids) if id == self.tokenizer.unk_token_id])
             print(f"     Consider updating the BPE model or modifying the text to avoid unknown tokens.")
                   
         if verbose:
-            print("text_tokens_list:", text_tokens_list)
+            print("text_tokens_list:", self.tokenizer.convert_ids_to_tokens(text_token_ids))
             print("segments count:", segments_count)
             print("max_text_tokens_per_segment:", max_text_tokens_per_segment)
-            print(*segments, sep="\n")
+            print(*(self.tokenizer.convert_ids_to_tokens(sent) for sent in segments), sep="\n")
         do_sample = generation_kwargs.pop("do_sample", True)
         top_p = generation_kwargs.pop("top_p", 0.8)
         top_k = generation_kwargs.pop("top_k", 30)
@@ -524,156 +772,380 @@ class IndexTTS2:
         num_beams = generation_kwargs.pop("num_beams", 3)
         repetition_penalty = generation_kwargs.pop("repetition_penalty", 10.0)
         max_mel_tokens = generation_kwargs.pop("max_mel_tokens", 1500)
+        latent_from_generation = generation_kwargs.pop("latent_from_generation", False)
         sampling_rate = 22050
-
-        wavs = []
+        diffusion_steps = generation_kwargs.pop("diffusion_steps", 25)
+        inference_cfg_rate = generation_kwargs.pop("inference_cfg_rate", 0.7)
+        cfm_solver = generation_kwargs.pop("cfm_solver", "euler")
+        cfm_t_schedule = generation_kwargs.pop("cfm_t_schedule", "linear")
+        cfm_cfg_schedule = generation_kwargs.pop("cfm_cfg_schedule", "all")
+
+        # 流式返回时逐句生成；否则按长度分桶，同一桶内的句子批量生成
+        bucket_max_size = 1 if stream_return else max(1, segments_bucket_max_size)
+        if bucket_max_size > 1:
+            buckets = bucket_segments(segments, bucket_max_size=bucket_max_size)
+        else:
+            buckets = [[{"idx": idx, "sent": sent, "len": len(sent)}] for idx, sent in enumerate(segments)]
+        bucket_of_segment = {item["idx"]: bucket for bucket in buckets for item in bucket}
+        for idx, sent in enumerate(segments):
+            if idx not in bucket_of_segment:  # empty segments are skipped by bucket_segments
+                bucket_of_segment[idx] = [{"idx": idx, "sent": sent, "len": len(sent)}]
+        if verbose and bucket_max_size > 1:
+            print(">> segments bucket_count:", len(buckets),
+                  "bucket sizes:", [(len(b), [t["idx"] for t in b]) for b in buckets],
+                  "bucket_max_size:", bucket_max_size)
+
+        # request conditioning: the conditioning encoders ran once per prompt in `get_prompt_features`
+        gpt_cond_latent = spk_features["gpt_cond_latent"]
+        with torch.no_grad():
+            with torch.amp.autocast(spk_cond_emb.device.type, enabled=self.dtype is not None, dtype=self.dtype):
+                emovec = self.gpt.mix_emovec(spk_features["emovec"], emo_features["emovec"], alpha=emo_alpha)
+
+                if emo_vector is not None:
+                    emovec = emovec_mat + (1 - torch.sum(weight_vector)) * emovec
+                    # emovec = emovec_mat
+
+        wavs = {}  # seg_idx -> wav
         gpt_gen_time = 0
         gpt_forward_time = 0
+        s2mel_cond_time = 0
         s2mel_time = 0
         bigvgan_time = 0
         has_warned = False
         silence = None # for stream_return
-        for seg_idx, sent in enumerate(segments):
-            self._set_gr_progress(0.2 + 0.7 * seg_idx / segments_count,
-                                  f"speech synthesis {seg_idx + 1}/{segments_count}...")
+        first_chunk_time = None  # for stream_return, time to first audio chunk
+
+        def gpt_stage():
+            """
+            GPT generation and latent stage: yields `(bucket_idxs, conds)` with the s2mel semantic
+            conditions of a bucket once all its segments are processed.
+            """
+            nonlocal gpt_gen_time, gpt_forward_time, s2mel_cond_time, has_warned
+            generated = {}  # seg_idx -> (text_tokens, codes, speech_conditioning_latent, generated latent or None)
+            conditions = {}  # seg_idx -> s2mel semantic condition, waiting for the rest of its bucket
+            for seg_idx, sent in enumerate(segments):
+                self._set_gr_progress(0.2 + 0.7 * seg_idx / segments_count,
+                                      f"speech synthesis {seg_idx + 1}/{segments_count}...")
+
+                if seg_idx not in generated:
+                    # generate the whole bucket of this segment in one batch
+                    bucket = bucket_of_segment[seg_idx]
+                    bucket_tokens = [
+                        torch.tensor(item["sent"], dtype=torch.int32, device=self.device)
+                        for item in bucket
+                    ]
+                    if len(bucket_tokens) > 1:
+                        batch_text_tokens = pad_tokens_cat(bucket_tokens, self.cfg.gpt.stop_text_token)
+                    else:
+                        batch_text_tokens = bucket_tokens[0].unsqueeze(0)
+                    if verbose:
+                        print(batch_text_tokens)
+                        print(f"text_tokens shape: {batch_text_tokens.shape}, text_tokens type: {batch_text_tokens.dtype}")
+                        # debug tokenizer
+                        for item, tokens in zip(bucket, bucket_tokens):
+                            print("text_token_syms:", self.tokenizer.convert_ids_to_tokens(tokens.tolist()))
 
-            text_tokens = self.tokenizer.convert_tokens_to_ids(sent)
-            text_tokens = torch.tensor(text_tokens, dtype=torch.int32, device=self.device).unsqueeze(0)
-            if verbose:
-                print(text_tokens)
-                print(f"text_tokens shape: {text_tokens.shape}, text_tokens type: {text_tokens.dtype}")
-                # debug tokenizer
-                text_token_syms = self.tokenizer.convert_ids_to_tokens(text_tokens[0].tolist())
-                print("text_token_syms is same as segment tokens", text_token_syms == sent)
-
-            m_start_time = time.perf_counter()
-            with torch.no_grad():
-                with torch.amp.autocast(text_tokens.device.type, enabled=self.dtype is not None, dtype=self.dtype):
-                    emovec = self.gpt.merge_emovec(
-                        spk_cond_emb,
-                        emo_cond_emb,
-                        torch.tensor([spk_cond_emb.shape[-1]], device=text_tokens.device),
-                        torch.tensor([emo_cond_emb.shape[-1]], device=text_tokens.device),
-                        alpha=emo_alpha
-                    )
-
-                    if emo_vector is not None:
-                        emovec = emovec_mat + (1 - torch.sum(weight_vector)) * emovec
-                        # emovec = emovec_mat
-
-                    codes, speech_conditioning_latent = self.gpt.inference_speech(
-                        spk_cond_emb,
-                        text_tokens,
-                        emo_cond_emb,
-                        cond_lengths=torch.tensor([spk_cond_emb.shape[-1]], device=text_tokens.device),
-                        emo_cond_lengths=torch.tensor([emo_cond_emb.shape[-1]], device=text_tokens.device),
-                        emo_vec=emovec,
-                        do_sample=True,
-                        top_p=top_p,
-                        top_k=top_k,
-                        temperature=temperature,
-                        num_return_sequences=autoregressive_batch_size,
-                        length_penalty=length_penalty,
-                        num_beams=num_beams,
-                        repetition_penalty=repetition_penalty,
-                        max_generate_length=max_mel_tokens,
-                        **generation_kwargs
-                    )
-
-                gpt_gen_time += time.perf_counter() - m_start_time
-                if not has_warned and (codes[:, -1] != self.stop_mel_token).any():
-                    warnings.warn(
-                        f"WARN: generation stopped due to exceeding `max_mel_tokens` ({max_mel_tokens}). "
-                        f"Input text tokens: {text_tokens.shape[1]}. "
-                        f"Consider reducing `max_text_tokens_per_segment`({max_text_tokens_per_segment}) or increasing `max_mel_tokens`.",
-                        category=RuntimeWarning
-                    )
-                    has_warned = True
-
-                code_lens = torch.tensor([codes.shape[-1]], device=codes.device, dtype=codes.dtype)
-                #                 if verbose:
-                #                     print(codes, type(codes))
-                #                     print(f"codes shape: {codes.shape}, codes type: {codes.dtype}")
-                #                     print(f"code len: {code_lens}")
-
-                code_lens = []
-                max_code_len = 0
-                for code in codes:
-                    if self.stop_mel_token not in code:
-                        code_len = len(code)
+                    m_start_time = time.perf_counter()
+                    with torch.no_grad():
+                        with torch.amp.autocast(batch_text_tokens.device.type, enabled=self.dtype is not None, dtype=self.dtype):
+                            outputs = self.gpt.inference_speech(
+                                spk_cond_emb,
+                                batch_text_tokens,
+                                emo_cond_emb,
+                                cond_lengths=torch.tensor([spk_cond_emb.shape[-1]], device=batch_text_tokens.device),
+                                emo_cond_lengths=torch.tensor([emo_cond_emb.shape[-1]], device=batch_text_tokens.device),
+                                emo_vec=emovec,
+                                speech_conditioning_latent=gpt_cond_latent,
+                                do_sample=True,
+                                top_p=top_p,
+                                top_k=top_k,
+                                temperature=temperature,
+                                num_return_sequences=autoregressive_batch_size,
+                                length_penalty=length_penalty,
+                                num_beams=num_beams,
+                                repetition_penalty=repetition_penalty,
+                                max_generate_length=max_mel_tokens,
+                                return_latent=latent_from_generation,
+                                **generation_kwargs
+                            )
+                    gpt_gen_time += time.perf_counter() - m_start_time
+                    if latent_from_generation:
+                        batch_codes, speech_conditioning_latent, batch_latent = outputs
                     else:
-                        len_ = (code == self.stop_mel_token).nonzero(as_tuple=False)[0]
-                        code_len = len_[0].item() if len_.numel() > 0 else len(code)
-                    code_lens.append(code_len)
-                    max_code_len = max(max_code_len, code_len)
-                codes = codes[:, :max_code_len]
-                code_lens = torch.LongTensor(code_lens)
-                code_lens = code_lens.to(self.device)
-                if verbose:
-                    print(codes, type(codes))
-                    print(f"fix codes shape: {codes.shape}, codes type: {codes.dtype}")
-                    print(f"code len: {code_lens}")
+                        (batch_codes, speech_conditioning_latent), batch_latent = outputs, None
+                    for i, item in enumerate(bucket):
+                        generated[item["idx"]] = (bucket_tokens[i].unsqueeze(0), batch_codes[i:i + 1], speech_conditioning_latent,
+                                                  batch_latent[i:i + 1] if batch_latent is not None else None)
+
+                text_tokens, codes, speech_conditioning_latent, generated_latent = generated.pop(seg_idx)
+                with torch.no_grad():
+                    if not has_warned and (codes[:, -1] != self.stop_mel_token).any():
+                        warnings.warn(
+                            f"WARN: generation stopped due to exceeding `max_mel_tokens` ({max_mel_tokens}). "
+                            f"Input text tokens: {text_tokens.shape[1]}. "
+                            f"Consider reducing `max_text_tokens_per_segment`({max_text_tokens_per_segment}) or increasing `max_mel_tokens`.",
+                            category=RuntimeWarning
+                        )
+                        has_warned = True
+
+                    code_lens = []
+                    max_code_len = 0
+                    for code in codes:
+                        if self.stop_mel_token not in code:
+                            code_len = len(code)
+                        else:
+                            len_ = (code == self.stop_mel_token).nonzero(as_tuple=False)[0]
+                            code_len = len_[0].item() if len_.numel() > 0 else len(code)
+                        code_lens.append(code_len)
+                        max_code_len = max(max_code_len, code_len)
+                    codes = codes[:, :max_code_len]
+                    code_lens = torch.LongTensor(code_lens)
+                    code_lens = code_lens.to(self.device)
+                    if verbose:
+                        print(codes, type(codes))
+                        print(f"fix codes shape: {codes.shape}, codes type: {codes.dtype}")
+                        print(f"code len: {code_lens}")
 
-                m_start_time = time.perf_counter()
-                use_speed = torch.zeros(spk_cond_emb.size(0)).to(spk_cond_emb.device).long()
-                with torch.amp.autocast(text_tokens.device.type, enabled=self.dtype is not None, dtype=self.dtype):
-                    latent = self.gpt(
-                        speech_conditioning_latent,
-                        text_tokens,
-                        torch.tensor([text_tokens.shape[-1]], device=text_tokens.device),
-                        codes,
-                        torch.tensor([codes.shape[-1]], device=text_tokens.device),
-                        emo_cond_emb,
-                        cond_mel_lengths=torch.tensor([spk_cond_emb.shape[-1]], device=text_tokens.device),
-                        emo_cond_mel_lengths=torch.tensor([emo_cond_emb.shape[-1]], device=text_tokens.device),
-                        emo_vec=emovec,
-                        use_speed=use_speed,
-                    )
+                    m_start_time = time.perf_counter()
+                    use_speed = torch.zeros(spk_cond_emb.size(0)).to(spk_cond_emb.device).long()
+                    if generated_latent is not None:
+                        # the latents recorded during generation replace the second forward pass
+                        latent = generated_latent[:, :max_code_len]
+                        gpt_forward_time += time.perf_counter() - m_start_time
+                    else:
+                        with torch.amp.autocast(text_tokens.device.type, enabled=self.dtype is not None, dtype=self.dtype):
+                            latent = self.gpt(
+                                speech_conditioning_latent,
+                                text_tokens,
+                                torch.tensor([text_tokens.shape[-1]], device=text_tokens.device),
+                                codes,
+                                torch.tensor([codes.shape[-1]], device=text_tokens.device),
+                                emo_cond_emb,
+                                cond_mel_lengths=torch.tensor([spk_cond_emb.shape[-1]], device=text_tokens.device),
+                                emo_cond_mel_lengths=torch.tensor([emo_cond_emb.shape[-1]], device=text_tokens.device),
+                                emo_vec=emovec,
+                                use_speed=use_speed,
+                            )
+                            gpt_forward_time += time.perf_counter() - m_start_time
+
+                    dtype = None
+                    with torch.amp.autocast(text_tokens.device.type, enabled=dtype is not None, dtype=dtype):
+                        m_start_time = time.perf_counter()
+                        latent = self.s2mel.models['gpt_layer'](latent)
+                        S_infer = self.semantic_codec.quantizer.vq2emb(codes.unsqueeze(1))
+                        S_infer = S_infer.transpose(1, 2)
+                        S_infer = S_infer + latent
+                        target_lengths = (code_lens * 1.72).long()
+
+                        cond = self.s2mel.models['length_regulator'](S_infer,
+                                                                     ylens=target_lengths,
+                                                                     n_quantizers=3,
+                                                                     f0=None)[0]
+                        conditions[seg_idx] = cond
+                        s2mel_cond_time += time.perf_counter() - m_start_time
+
+                # hand the bucket over to the s2mel stage once every segment of it is ready
+                bucket = bucket_of_segment[seg_idx]
+                if any(item["idx"] not in conditions for item in bucket):
+                    continue
+                bucket_idxs = [item["idx"] for item in bucket]
+                yield bucket_idxs, [conditions.pop(idx) for idx in bucket_idxs]
+
+        def chunked_stage(seg_idx, sent):
+            """
+            Low-latency streaming of one segment: the GPT generates in a background thread and every
+            `stream_chunk_tokens` new codes go through s2mel and the vocoder, with `stream_context_tokens`
+            codes of left context. Yields the (1, N) wav chunks, crossfaded at the boundaries.
+            """
+            nonlocal gpt_gen_time, gpt_forward_time, s2mel_time, bigvgan_time, has_warned
+            self._set_gr_progress(0.2 + 0.7 * seg_idx / segments_count,
+                                  f"speech synthesis {seg_idx + 1}/{segments_count}...")
+            text_tokens = torch.tensor(sent, dtype=torch.int32, device=self.device).unsqueeze(0)
+            hop_size = self.bigvgan.h.hop_size
+            # the code -> mel frame mapping of the length regulator, on absolute code positions
+            frame_of = lambda n: int(n * 1.72)
+            # the crossfade must fit into the left context of the next chunk
+            crossfade = CrossfadeStream(overlap=min(4, frame_of(stream_context_tokens)) * hop_size)
+            use_speed = torch.zeros(spk_cond_emb.size(0)).to(spk_cond_emb.device).long()
+
+            def synthesize(codes, start, end, final):
+                nonlocal gpt_forward_time, s2mel_time, bigvgan_time
+                context_start = max(0, start - stream_context_tokens)
+                codes = torch.tensor([codes[:end]], dtype=torch.long, device=self.device)
+                with torch.no_grad():
+                    m_start_time = time.perf_counter()
+                    with torch.amp.autocast(text_tokens.device.type, enabled=self.dtype is not None, dtype=self.dtype):
+                        if latent_from_generation:
+                            # the hidden states recorded while generating are the `forward()` latents of the codes,
+                            # each chunk only gathers the latents of its own codes
+                            latent = self.gpt.final_norm(torch.stack(streamer.hidden_states[context_start:end], dim=1))
+                        else:
+                            # causal: the latents of a code prefix are those of the whole segment
+                            latent = self.gpt(
+                                gpt_cond_latent,
+                                text_tokens,
+                                torch.tensor([text_tokens.shape[-1]], device=text_tokens.device),
+                                codes,
+                                torch.tensor([codes.shape[-1]], device=text_tokens.device),
+                                emo_cond_emb,
+                                cond_mel_lengths=torch.tensor([spk_cond_emb.shape[-1]], device=text_tokens.device),
+                                emo_cond_mel_lengths=torch.tensor([emo_cond_emb.shape[-1]], device=text_tokens.device),
+                                emo_vec=emovec,
+                                use_speed=use_speed,
+                            )[:, context_start:]
                     gpt_forward_time += time.perf_counter() - m_start_time
 
-                dtype = None
-                with torch.amp.autocast(text_tokens.device.type, enabled=dtype is not None, dtype=dtype):
                     m_start_time = time.perf_counter()
-                    diffusion_steps = 25
-                    inference_cfg_rate = 0.7
+                    codes = codes[:, context_start:]
                     latent = self.s2mel.models['gpt_layer'](latent)
                     S_infer = self.semantic_codec.quantizer.vq2emb(codes.unsqueeze(1))
                     S_infer = S_infer.transpose(1, 2)
                     S_infer = S_infer + latent
-                    target_lengths = (code_lens * 1.72).long()
-
+                    target_lengths = torch.LongTensor([frame_of(end) - frame_of(context_start)]).to(self.device)
                     cond = self.s2mel.models['length_regulator'](S_infer,
                                                                  ylens=target_lengths,
                                                                  n_quantizers=3,
                                                                  f0=None)[0]
-                    cat_condition = torch.cat([prompt_condition, cond], dim=1)
-                    vc_target = self.s2mel.models['cfm'].inference(cat_condition,
-                                                                   torch.LongTensor([cat_condition.size(1)]).to(
-                                                                       cond.device),
-                                                                   ref_mel, style, None, diffusion_steps,
-                                                                   inference_cfg_rate=inference_cfg_rate)
-                    vc_target = vc_target[:, :, ref_mel.size(-1):]
+                    vc_target = self.s2mel_inference([cond], prompt_condition, ref_mel, style,
+                                                     diffusion_steps=diffusion_steps,
+                                                     inference_cfg_rate=inference_cfg_rate,
+                                                     cfm_solver=cfm_solver,
+                                                     cfm_t_schedule=cfm_t_schedule,
+                                                     cfm_cfg_schedule=cfm_cfg_schedule)[0]
                     s2mel_time += time.perf_counter() - m_start_time
 
                     m_start_time = time.perf_counter()
-                    wav = self.bigvgan(vc_target.float()).squeeze().unsqueeze(0)
-                    print(wav.shape)
+                    wav = self.bigvgan.decode_batch([vc_target.float()])[0]
                     bigvgan_time += time.perf_counter() - m_start_time
-                    wav = wav.squeeze(1)
-
-                wav = torch.clamp(32767 * wav, -32767.0, 32767.0)
-                if verbose:
-                    print(f"wav shape: {wav.shape}", "min:", wav.min(), "max:", wav.max())
-                # wavs.append(wav[:, :-512])
-                wavs.append(wav.cpu())  # to cpu before saving
-                if stream_return:
-                    yield wav.cpu()
-                    if silence == None:
-                        silence = self.interval_silence(wavs, sampling_rate=sampling_rate, interval_silence=interval_silence)
-                    yield silence
+                wav = crossfade.push(wav, frame_of(context_start) * hop_size, final=final)
+                return torch.clamp(32767 * wav, -32767.0, 32767.0)
+
+            def generate(*args, **kwargs):
+                # grad mode and autocast are per thread
+                with torch.no_grad(), torch.amp.autocast(text_tokens.device.type, enabled=self.dtype is not None,
+                                                         dtype=self.dtype):
+                    return self.gpt.inference_speech(*args, **kwargs)
+
+            # the streamer does not support beam search
+            streamer = TokenStreamer(record_hidden_states=latent_from_generation).start(
+                generate,
+                spk_cond_emb,
+                text_tokens,
+                emo_cond_emb,
+                cond_lengths=torch.tensor([spk_cond_emb.shape[-1]], device=text_tokens.device),
+                emo_cond_lengths=torch.tensor([emo_cond_emb.shape[-1]], device=text_tokens.device),
+                emo_vec=emovec,
+                speech_conditioning_latent=gpt_cond_latent,
+                do_sample=True,
+                top_p=top_p,
+                top_k=top_k,
+                temperature=temperature,
+                num_return_sequences=autoregressive_batch_size,
+                length_penalty=length_penalty,
+                num_beams=1,
+                repetition_penalty=repetition_penalty,
+                max_generate_length=max_mel_tokens,
+                return_latent=latent_from_generation,
+                **generation_kwargs
+            )
+            codes = []
+            start = 0
+            stopped = False
+            try:
+                m_start_time = time.perf_counter()
+                for token in streamer:
+                    gpt_gen_time += time.perf_counter() - m_start_time
+                    token = token.view(-1)[0].item()
+                    if token == self.stop_mel_token:
+                        stopped = True
+                        break
+                    codes.append(token)
+                    if len(codes) - start >= stream_chunk_tokens:
+                        yield synthesize(codes, start, len(codes), final=False)
+                        start = len(codes)
+                    m_start_time = time.perf_counter()
+            finally:
+                streamer.close()
+            if not stopped and not has_warned:
+                warnings.warn(
+                    f"WARN: generation stopped due to exceeding `max_mel_tokens` ({max_mel_tokens}). "
+                    f"Input text tokens: {text_tokens.shape[1]}. "
+                    f"Consider reducing `max_text_tokens_per_segment`({max_text_tokens_per_segment}) or increasing `max_mel_tokens`.",
+                    category=RuntimeWarning
+                )
+                has_warned = True
+            if codes:
+                yield synthesize(codes, start, len(codes), final=True)
+
+        if stream_return and stream_chunk_tokens > 0:
+            # 句内流式：GPT边生成，边按块进行s2mel和声码器推理
+            for seg_idx, sent in enumerate(segments):
+                chunks = []
+                for wav in chunked_stage(seg_idx, sent):
+                    wav = wav.cpu()
+                    if first_chunk_time is None:
+                        first_chunk_time = time.perf_counter() - start_time
+                    chunks.append(wav)
+                    yield wav
+                wavs[seg_idx] = torch.cat(chunks, dim=1) if chunks else torch.zeros(1, 0)
+                if silence == None:
+                    silence = self.interval_silence(list(wavs.values()), sampling_rate=sampling_rate, interval_silence=interval_silence)
+                yield silence
+        else:
+            # 流水线模式：GPT阶段在后台线程中运行，与当前句的s2mel/声码器阶段重叠
+            # 各阶段的线程数只在 `torch.set_num_threads` 按线程生效时设置，否则两个阶段共用进程的线程数
+            stage_threads = pipelined and bool(self.gpt_num_threads or self.s2mel_num_threads)
+            if stage_threads and not thread_local_num_threads():
+                warnings.warn("`torch.set_num_threads` is process-wide with this PyTorch build, "
+                              "ignoring `gpt_num_threads`/`s2mel_num_threads`.", category=RuntimeWarning)
+                stage_threads = False
+            num_threads = torch.get_num_threads()
+            stage = BackgroundStage(gpt_stage(), maxsize=2, num_threads=self.gpt_num_threads if stage_threads else None,
+                                    name="indextts2-gpt") if pipelined else gpt_stage()
+            if stage_threads and self.s2mel_num_threads:
+                torch.set_num_threads(self.s2mel_num_threads)
+            try:
+                for bucket_idxs, bucket_conds in stage:
+                    with torch.no_grad():
+                        dtype = None
+                        with torch.amp.autocast(spk_cond_emb.device.type, enabled=dtype is not None, dtype=dtype):
+                            m_start_time = time.perf_counter()
+                            vc_targets = self.s2mel_inference(bucket_conds, prompt_condition, ref_mel, style,
+                                                              diffusion_steps=diffusion_steps,
+                                                              inference_cfg_rate=inference_cfg_rate,
+                                                              cfm_solver=cfm_solver,
+                                                              cfm_t_schedule=cfm_t_schedule,
+                                                              cfm_cfg_schedule=cfm_cfg_schedule)
+                            s2mel_time += time.perf_counter() - m_start_time
+
+                            m_start_time = time.perf_counter()
+                            bucket_wavs = self.bigvgan.decode_batch([vc_target.float() for vc_target in vc_targets],
+                                                                    max_batch_frames=self.vocoder_max_batch_frames)
+                            bigvgan_time += time.perf_counter() - m_start_time
+
+                    for idx, wav in zip(bucket_idxs, bucket_wavs):
+                        wav = torch.clamp(32767 * wav, -32767.0, 32767.0)
+                        if verbose:
+                            print(f"wav shape: {wav.shape}", "min:", wav.min(), "max:", wav.max())
+                        # wavs.append(wav[:, :-512])
+                        wavs[idx] = wav.cpu()  # to cpu before saving
+                        if stream_return:
+                            if first_chunk_time is None:
+                                first_chunk_time = time.perf_counter() - start_time
+                            yield wav.cpu()
+                            if silence == None:
+                                silence = self.interval_silence(list(wavs.values()), sampling_rate=sampling_rate, interval_silence=interval_silence)
+                            yield silence
+            finally:
+                if pipelined:
+                    stage.close()
+                if stage_threads and self.s2mel_num_threads:
+                    torch.set_num_threads(num_threads)
+        s2mel_time += s2mel_cond_time
         end_time = time.perf_counter()
 
         self._set_gr_progress(0.9, "saving audio...")
+        wavs = [wavs[idx] for idx in sorted(wavs)]
         wavs = self.insert_interval_silence(wavs, sampling_rate=sampling_rate, interval_silence=interval_silence)
         wav = torch.cat(wavs, dim=1)
         wav_length = wav.shape[-1] / sampling_rate
@@ -682,6 +1154,8 @@ class IndexTTS2:
         print(f">> s2mel_time: {s2mel_time:.2f} seconds")
         print(f">> bigvgan_time: {bigvgan_time:.2f} seconds")
         print(f">> Total inference time: {end_time - start_time:.2f} seconds")
+        if first_chunk_time is not None:
+            print(f">> time_to_first_chunk: {first_chunk_time:.2f} seconds")
         print(f">> Generated audio length: {wav_length:.2f} seconds")
         print(f">> RTF: {(end_time - start_time) / wav_length:.4f}")
 
@@ -6,8 +6,9 @@
 
 import os
 import json
+import math
 from pathlib import Path
-from typing import Optional, Union, Dict
+from typing import Optional, Union, Dict, List
 
 import torch
 import torch.nn as nn
@@ -385,6 +386,115 @@ class BigVGAN(
 
         return x
 
+    def receptive_field_frames(self) -> int:
+        """
+        Upper bound of the number of mel frames on either side of an output sample that it depends on.
+        Output samples further than this from the end of a mel are not affected by what follows the end.
+        """
+
+        def conv_reach(conv):
+            return max(conv.padding[0], conv.dilation[0] * (conv.kernel_size[0] - 1) - conv.padding[0])
+
+        def act_reach(act):
+            # anti-aliased activation: upsampling and low-pass downsampling filters
+            return (math.ceil(act.upsample.kernel_size / (2 * act.up_ratio))
+                    + math.ceil(act.downsample.kernel_size / (2 * act.down_ratio)))
+
+        reach = conv_reach(self.conv_pre)
+        rate = 1  # samples per mel frame at the current layer
+        for i in range(self.num_upsamples):
+            for up in self.ups[i]:
+                kernel_size, stride, padding = up.kernel_size[0], up.stride[0], up.padding[0]
+                reach += (max(padding, kernel_size - 1 - padding) // stride + 1) / rate
+                rate *= stride
+            # the resblocks of a stage are summed, the conv and activation layers of a resblock are chained
+            reach += max(
+                sum(conv_reach(m) for m in block.modules() if isinstance(m, Conv1d))
+                + sum(act_reach(act) for act in block.activations)
+                for block in self.resblocks[i * self.num_kernels:(i + 1) * self.num_kernels]
+            ) / rate
+        reach += (act_reach(self.activation_post) + conv_reach(self.conv_post)) / rate
+        return math.ceil(reach)
+
+    @torch.no_grad()
+    def decode_batch(
+        self,
+        mels: List[torch.Tensor],
+        max_batch_frames: Optional[int] = None,
+        max_padding_ratio: float = 0.1,
+    ) -> List[torch.Tensor]:
+        """
+        Vocode several mels with batched forward passes, with the same output as vocoding them one by one.
+
+        The mels are grouped by near-equal length, padded to the longest mel of their batch by repeating
+        their last frame, and each waveform is trimmed back to ``hop_size * frames`` samples.
+        The last ``receptive_field_frames()`` frames of a padded mel depend on the padding, they
+        are vocoded again from a window of twice this length at the end of the mel, which has
+        the same right boundary as the unbatched forward.
+
+        Args:
+            mels: list of mels in shape (1, num_mels, T_i) or (num_mels, T_i).
+            max_batch_frames: upper bound of ``batch_size * padded_frames`` of a batch to
+                keep memory bounded, ``None`` for no limit, ``0`` vocodes the mels one by one.
+                A single mel is never split.
+            max_padding_ratio: a mel only joins a batch if it is at most this fraction shorter than
+                the longest mel of the batch: the padding and the tails vocoded again stay small.
+
+        Returns:
+            list of waveforms in shape (1, T_i * hop_size), in the order of ``mels``.
+        """
+        mels = [mel.squeeze(0) if mel.ndim == 3 else mel for mel in mels]
+        hop_size = self.h.hop_size
+        outputs: List[Optional[torch.Tensor]] = [None] * len(mels)
+        context = self.receptive_field_frames()
+        tails = {}  # mel index -> window frames at the end of the mel to vocode again
+        for batch in self._frame_batches([mel.size(-1) for mel in mels], max_batch_frames,
+                                         max_padding_ratio=max_padding_ratio):
+            max_frames = mels[batch[0]].size(-1)
+            x = torch.stack([
+                torch.nn.functional.pad(mels[i], (0, max_frames - mels[i].size(-1)), mode="replicate")
+                for i in batch
+            ])
+            wavs = self(x).squeeze(1)
+            for j, i in enumerate(batch):
+                frames = mels[i].size(-1)
+                outputs[i] = wavs[j:j + 1, :frames * hop_size]
+                if frames < max_frames:
+                    tails[i] = min(frames, 2 * context)
+
+        # 批内较短的条目：末尾 `context` 帧受填充影响，用末尾窗口（左侧有足够上下文）重新合成
+        tail_items = list(tails.items())
+        for batch in self._frame_batches([window for _, window in tail_items], max_batch_frames, max_padding_ratio=0.0):
+            indices = [tail_items[j][0] for j in batch]
+            window = tails[indices[0]]
+            wavs = self(torch.stack([mels[i][:, -window:] for i in indices])).squeeze(1)
+            for j, i in enumerate(indices):
+                if window == mels[i].size(-1):
+                    outputs[i] = wavs[j:j + 1]
+                else:
+                    keep = (mels[i].size(-1) - context) * hop_size
+                    outputs[i] = torch.cat([outputs[i][:, :keep], wavs[j:j + 1, (window - context) * hop_size:]], dim=1)
+        return outputs
+
+    @staticmethod
+    def _frame_batches(lengths: List[int], max_batch_frames: Optional[int] = None,
+                       max_padding_ratio: float = 1.0) -> List[List[int]]:
+        """
+        Group the indices of `lengths` into batches, longest first, of at most `max_batch_frames`
+        padded frames and lengths at least `(1 - max_padding_ratio)` of the longest one of the batch
+        (``0`` batches equal lengths only).
+        """
+        batches = []
+        for i in sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True):
+            # sorted by length, the first item of a batch is the longest one
+            longest = lengths[batches[-1][0]] if batches else None
+            if batches and lengths[i] >= longest * (1 - max_padding_ratio) \
+                    and (max_batch_frames is None or (len(batches[-1]) + 1) * longest <= max_batch_frames):
+                batches[-1].append(i)
+            else:
+                batches.append([i])
+        return batches
+
     def remove_weight_norm(self):
         try:
             print("Removing weight norm...")
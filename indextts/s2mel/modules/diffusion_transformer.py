@@ -182,6 +182,20 @@ class DiT(torch.nn.Module):
 
     def setup_caches(self, max_batch_size, max_seq_length):
         self.transformer.setup_caches(max_batch_size, max_seq_length, use_kv_cache=False)
+
+    def _wavenet(self, x, x_mask, x_lens, g, padded):
+        """
+        The wavenet convolutions use reflect padding at the sequence end, so for a padded batch
+        they are run on each unpadded item, to get the same result as unbatched inference.
+        """
+        T = x.size(-1)
+        if x.size(0) == 1 or not padded or torch.compiler.is_compiling():
+            return self.wavenet(x * x_mask, x_mask, g=g)
+        outputs = []
+        for i, length in enumerate(x_lens.tolist()):
+            out = self.wavenet(x[i:i + 1, :, :length], x_mask[i:i + 1, :, :length], g=g[i:i + 1])
+            outputs.append(nn.functional.pad(out, (0, T - length)))
+        return torch.cat(outputs, dim=0)
         
     def forward(self, x, prompt_x, x_lens, t, style, cond, mask_content=False):
         """
@@ -229,14 +243,62 @@ class DiT(torch.nn.Module):
             style = self.style_in(style)
             style = torch.zeros_like(style) if class_dropout else style
             x_in = torch.cat([style.unsqueeze(1), x_in], dim=1)
-            
+
+        t2 = self.t_embedder2(t) if self.final_layer_type == 'wavenet' else None
+        return self._forward_merged(x, x_in, x_lens, t1, t2)
+
+    def prepare_conditioning(self, prompt_x, style, cond):
+        """
+        Precompute the step-invariant part of `cond_x_merge_linear` for the inference of `forward`:
+        the projection of `prompt_x`, `cond` and `style` (and the bias). A solver step then only
+        projects `x`, see `forward_prepared`.
+
+        Returns:
+            cond_bias (torch.Tensor): shape: (batch_size, mel_timesteps, hidden_dim)
+        """
+        assert not self.style_as_token, "style_as_token is not supported by the prepared inference"
+        T = prompt_x.size(-1)
+        weight = self.cond_x_merge_linear.weight[:, self.in_channels:]
+        c_in = torch.cat([prompt_x.transpose(1, 2), self.cond_projection(cond)], dim=-1)
+        if self.transformer_style_condition:
+            c_in = torch.cat([c_in, style[:, None, :].expand(-1, T, -1)], dim=-1)
+        return nn.functional.linear(c_in, weight, self.cond_x_merge_linear.bias)
+
+    def embed_timesteps(self, t):
+        """
+        Timestep embeddings of `forward` for the 1-D tensor `t`, e.g. the whole `t_span` of a solve.
+
+        Returns:
+            (t1, t2): (N, hidden_dim) transformer and (N, wavenet hidden_dim) wavenet embeddings,
+                t2 is None without the wavenet final layer
+        """
+        t1 = self.t_embedder(t)
+        t2 = self.t_embedder2(t) if self.final_layer_type == 'wavenet' else None
+        return t1, t2
+
+    def forward_prepared(self, x, x_lens, cond_bias, t1, t2):
+        """
+        Inference `forward` with the conditioning from `prepare_conditioning` and the timestep
+        embeddings from `embed_timesteps` (t1, t2: (batch_size, dim)).
+        """
+        x = x.transpose(1, 2)
+        x_in = nn.functional.linear(x, self.cond_x_merge_linear.weight[:, :self.in_channels]) + cond_bias
+        return self._forward_merged(x, x_in, x_lens, t1, t2)
+
+    def _forward_merged(self, x, x_in, x_lens, t1, t2):
+        """
+        The transformer and the final layers, from the merged input `x_in` (N, T, D) and `x` (N, T, 80).
+        """
         if self.time_as_token: # False
             x_in = torch.cat([t1.unsqueeze(1), x_in], dim=1)
             
         x_mask = sequence_mask(x_lens + self.style_as_token + self.time_as_token, max_length=x_in.size(1)).to(x.device).unsqueeze(1) #torch.Size([1, 1, 1863])True
         input_pos = self.input_pos[:x_in.size(1)]  # (T,) range（0，1863）
-        x_mask_expanded = x_mask[:, None, :].repeat(1, 1, x_in.size(1), 1) if not self.is_causal else None # torch.Size([1, 1, 1863, 1863]
-        x_res = self.transformer(x_in, t1.unsqueeze(1), input_pos, x_mask_expanded) # [2, 1863, 512]
+        # a key-padding mask (N, 1, 1, T), broadcast over the queries by SDPA, only for a padded
+        # batch; a compiled graph always takes the masked path (no data-dependent branch)
+        padded = torch.compiler.is_compiling() or not bool((x_lens + self.style_as_token + self.time_as_token >= x_in.size(1)).all())
+        attn_mask = x_mask[:, None, :] if padded and not self.is_causal else None  # torch.Size([2, 1, 1, 1863])
+        x_res = self.transformer(x_in, t1.unsqueeze(1), input_pos, attn_mask, is_causal=self.is_causal) # [2, 1863, 512]
         x_res = x_res[:, 1:] if self.time_as_token else x_res
         x_res = x_res[:, 1:] if self.style_as_token else x_res
         
@@ -245,8 +307,7 @@ class DiT(torch.nn.Module):
         if self.final_layer_type == 'wavenet':
             x = self.conv1(x_res)
             x = x.transpose(1, 2)
-            t2 = self.t_embedder2(t)
-            x = self.wavenet(x, x_mask, g=t2.unsqueeze(2)).transpose(1, 2) + self.res_projection(
+            x = self._wavenet(x, x_mask, x_lens, t2.unsqueeze(2), padded).transpose(1, 2) + self.res_projection(
                 x_res)  # long residual connection
             x = self.final_layer(x, t1).transpose(1, 2)
             x = self.conv2(x)
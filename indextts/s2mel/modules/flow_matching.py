@@ -1,4 +1,5 @@
 from abc import ABC
+from bisect import bisect_right
 
 import torch
 import torch.nn.functional as F
@@ -8,6 +9,160 @@ from indextts.s2mel.modules.commons import sequence_mask
 
 from tqdm import tqdm
 
+
+def linear_t_span(n_timesteps, device=None):
+    return torch.linspace(0, 1, n_timesteps + 1, device=device)
+
+
+def cosine_t_span(n_timesteps, device=None):
+    """
+    Timesteps denser near the noise end (t=0), where the flow changes fastest: 1 - cos(pi/2 * t).
+    """
+    t_span = linear_t_span(n_timesteps, device=device)
+    return 1 - torch.cos(torch.pi / 2 * t_span)
+
+
+T_SCHEDULES = {
+    "linear": linear_t_span,
+    "cosine": cosine_t_span,
+}
+
+
+def get_t_span(n_timesteps, t_schedule="linear", device=None):
+    if t_schedule not in T_SCHEDULES:
+        raise ValueError(f"Unknown CFM timestep schedule {t_schedule!r}, available: {list(T_SCHEDULES)}")
+    return T_SCHEDULES[t_schedule](n_timesteps, device=device)
+
+
+# ODE solvers of dx/dt = velocity(x, t) over `t_span`, from the noise (t=0) to the data (t=1).
+# `velocity(x, t)` is one function evaluation (NFE) of the estimator; `NFE_PER_STEP` is its
+# number of calls per interval of `t_span`. The solvers may update `x` in place.
+
+def euler_solver(velocity, x, t_span, progress=True):
+    t = t_span[0]
+    for step in tqdm(range(1, len(t_span)), disable=not progress):
+        dt = t_span[step] - t
+        # in place: only the current state is kept alive
+        x.add_(velocity(x, t), alpha=float(dt))
+        t = t + dt
+    return x
+
+
+def midpoint_solver(velocity, x, t_span, progress=True):
+    for step in tqdm(range(1, len(t_span)), disable=not progress):
+        t, dt = t_span[step - 1], t_span[step] - t_span[step - 1]
+        x_mid = x + 0.5 * dt * velocity(x, t)
+        x = x + dt * velocity(x_mid, t + 0.5 * dt)
+    return x
+
+
+def heun_solver(velocity, x, t_span, progress=True):
+    for step in tqdm(range(1, len(t_span)), disable=not progress):
+        t, dt = t_span[step - 1], t_span[step] - t_span[step - 1]
+        v = velocity(x, t)
+        x_end = x + dt * v
+        x = x + 0.5 * dt * (v + velocity(x_end, t + dt))
+    return x
+
+
+def dpm_solver_2m(velocity, x, t_span, progress=True):
+    """
+    DPM-Solver++(2M) for the linear flow x_t = t * x_1 + (1 - t) * x_0: a second order multistep
+    method on the data prediction x_1 = x + (1 - t) * v, one function evaluation per step.
+    The steps next to t=0 and t=1 (infinite log-SNR) are first order.
+    """
+    lambdas = torch.log(t_span) - torch.log1p(-t_span)
+    data_prev = None
+    for step in tqdm(range(1, len(t_span)), disable=not progress):
+        t, t_next = t_span[step - 1], t_span[step]
+        sigma, sigma_next = 1 - t, 1 - t_next
+        data = x + sigma * velocity(x, t)
+        if data_prev is not None and t > 0 and t_next < 1 and t_span[step - 2] > 0:
+            h = lambdas[step] - lambdas[step - 1]
+            r = (lambdas[step - 1] - lambdas[step - 2]) / h
+            d = (1 + 0.5 / r) * data - (0.5 / r) * data_prev
+        else:
+            d = data
+        x = (sigma_next / sigma) * x + (t_next - t * sigma_next / sigma) * d
+        data_prev = data
+    return x
+
+
+SOLVERS = {
+    "euler": euler_solver,
+    "midpoint": midpoint_solver,
+    "heun": heun_solver,
+    "dpm_2m": dpm_solver_2m,
+}
+
+NFE_PER_STEP = {
+    "euler": 1,
+    "midpoint": 2,
+    "heun": 2,
+    "dpm_2m": 1,
+}
+
+
+# Classifier-free guidance schedules: `factory(arg, rate)` returns `weight(step, t)`, the guidance
+# rate of an evaluation at time `t` within the interval `step` of `t_span`. A zero weight skips
+# the null branch of that evaluation, i.e. the DiT runs at batch B instead of 2B.
+
+def cfg_all(arg, rate):
+    """all: guidance on every step (the default)."""
+    return lambda step, t: rate
+
+
+def cfg_first(arg, rate):
+    """first:K: guidance on the first K steps only."""
+    k = int(arg)
+    return lambda step, t: rate if step < k else 0.0
+
+
+def cfg_every(arg, rate):
+    """every:N: guidance on every N-th step, starting with the first one."""
+    n = max(1, int(arg))
+    return lambda step, t: rate if step % n == 0 else 0.0
+
+
+def cfg_range(arg, rate):
+    """range:a-b: guidance for a <= t < b."""
+    start, end = (float(v) for v in arg.split("-"))
+    return lambda step, t: rate if start <= t < end else 0.0
+
+
+def cfg_linear(arg, rate):
+    """linear:eps: guidance rate decaying linearly to 0 at t=1, skipped once below eps (default 0.05)."""
+    eps = float(arg) if arg else 0.05
+
+    def weight(step, t):
+        w = rate * (1.0 - t)
+        return w if w >= eps else 0.0
+
+    return weight
+
+
+CFG_SCHEDULES = {
+    "all": cfg_all,
+    "first": cfg_first,
+    "every": cfg_every,
+    "range": cfg_range,
+    "linear": cfg_linear,
+}
+
+
+def get_cfg_schedule(cfg_schedule, inference_cfg_rate):
+    """
+    Parse a guidance schedule spec ``"<name>[:<arg>]"`` of `CFG_SCHEDULES`, e.g. ``"first:8"``.
+    Returns `weight(step, t)`.
+    """
+    name, _, arg = (cfg_schedule or "all").partition(":")
+    if name not in CFG_SCHEDULES:
+        raise ValueError(f"Unknown CFG schedule {cfg_schedule!r}, available: {list(CFG_SCHEDULES)}")
+    try:
+        return CFG_SCHEDULES[name](arg, inference_cfg_rate)
+    except ValueError as e:
+        raise ValueError(f"Invalid CFG schedule {cfg_schedule!r}: {e}")
+
 class BASECFM(torch.nn.Module, ABC):
     def __init__(
         self,
@@ -28,7 +183,8 @@ class BASECFM(torch.nn.Module, ABC):
             self.zero_prompt_speech_token = False
 
     @torch.inference_mode()
-    def inference(self, mu, x_lens, prompt, style, f0, n_timesteps, temperature=1.0, inference_cfg_rate=0.5):
+    def inference(self, mu, x_lens, prompt, style, f0, n_timesteps, temperature=1.0, inference_cfg_rate=0.5,
+                  solver="euler", t_schedule="linear", cfg_schedule="all", progress=True):
         """Forward diffusion
 
         Args:
@@ -43,6 +199,10 @@ class BASECFM(torch.nn.Module, ABC):
             f0: None
             n_timesteps (int): number of diffusion steps
             temperature (float, optional): temperature for scaling noise. Defaults to 1.0.
+            solver (str): ODE solver, one of `SOLVERS`. Defaults to "euler".
+            t_schedule (str): timestep schedule, one of `T_SCHEDULES`. Defaults to "linear".
+            cfg_schedule (str): guidance schedule spec, see `get_cfg_schedule`. Defaults to "all".
+            progress (bool): show a progress bar of the solver steps. Defaults to True.
 
         Returns:
             sample: generated mel-spectrogram
@@ -50,13 +210,14 @@ class BASECFM(torch.nn.Module, ABC):
         """
         B, T = mu.size(0), mu.size(1)
         z = torch.randn([B, self.in_channels, T], device=mu.device) * temperature
-        t_span = torch.linspace(0, 1, n_timesteps + 1, device=mu.device)
-        # t_span = t_span + (-1) * (torch.cos(torch.pi / 2 * t_span) - 1 + t_span)
-        return self.solve_euler(z, x_lens, prompt, mu, style, f0, t_span, inference_cfg_rate)
+        t_span = get_t_span(n_timesteps, t_schedule, device=mu.device)
+        return self.solve(z, x_lens, prompt, mu, style, f0, t_span, inference_cfg_rate, solver=solver,
+                          cfg_schedule=cfg_schedule, progress=progress)
 
-    def solve_euler(self, x, x_lens, prompt, mu, style, f0, t_span, inference_cfg_rate=0.5):
+    def solve(self, x, x_lens, prompt, mu, style, f0, t_span, inference_cfg_rate=0.5, solver="euler",
+              cfg_schedule="all", progress=True):
         """
-        Fixed euler solver for ODEs.
+        Solve the flow ODE from the noise `x` with one of the registered `SOLVERS`.
         Args:
             x (torch.Tensor): random noise
             t_span (torch.Tensor): n_timesteps interpolated
@@ -69,12 +230,20 @@ class BASECFM(torch.nn.Module, ABC):
                 shape: (batch_size, 80, 795)
             style (torch.Tensor): reference global style
                 shape: (batch_size, 192)
-        """
-        t, _, _ = t_span[0], t_span[-1], t_span[1] - t_span[0]
+            solver (str): name of the solver in `SOLVERS`
+            cfg_schedule (str): guidance schedule spec, see `get_cfg_schedule`
+            progress (bool): show a progress bar of the solver steps
 
-        # I am storing this because I can later plot it by putting a debugger here and saving it to a file
-        # Or in future might add like a return_all_steps flag
-        sol = []
+        The conditional/null inputs of the guidance are stacked once into preallocated buffers
+        and `x` is updated in place (noise in, mel out).
+        """
+        if solver not in SOLVERS:
+            raise ValueError(f"Unknown CFM solver {solver!r}, available: {list(SOLVERS)}")
+        cfg_weight = get_cfg_schedule(cfg_schedule, inference_cfg_rate)
+        # the solvers run on host timesteps: the schedules and the timestep embedding lookups
+        # need no device sync, 0-dim host tensors are scalars for the device tensors
+        t_span = t_span.cpu()
+        t_values = t_span.tolist()
         # apply prompt
         prompt_len = prompt.size(-1)
         prompt_x = torch.zeros_like(x)
@@ -82,37 +251,83 @@ class BASECFM(torch.nn.Module, ABC):
         x[..., :prompt_len] = 0
         if self.zero_prompt_speech_token:
             mu[..., :prompt_len] = 0
-        for step in tqdm(range(1, len(t_span))):
-            dt = t_span[step] - t_span[step - 1]
+        # batch items share the prompt but may have different lengths (padded, masked by x_lens)
+        B = x.size(0)
+        if inference_cfg_rate > 0:
+            # Stack original and CFG (null) inputs for batched processing
+            stacked_x_lens = torch.cat([x_lens, x_lens], dim=0)
+            stacked_prompt_x = torch.cat([prompt_x, torch.zeros_like(prompt_x)], dim=0)
+            stacked_style = torch.cat([style, torch.zeros_like(style)], dim=0)
+            stacked_mu = torch.cat([mu, torch.zeros_like(mu)], dim=0)
+            # workspace of the stacked `x`, refilled on every guided evaluation
+            stacked_x = torch.empty((2 * B,) + tuple(x.shape[1:]), dtype=x.dtype, device=x.device)
+
+        # step-invariant conditioning: only `x` changes between the evaluations, the projection of
+        # the prompt/cond/style inputs and the timestep embeddings are computed once per solve
+        # (not with a compiled estimator, which only compiles `forward`)
+        prepared = hasattr(self.estimator, "prepare_conditioning") and not hasattr(self.estimator, "_orig_mod")
+        if prepared:
             if inference_cfg_rate > 0:
-                # Stack original and CFG (null) inputs for batched processing
-                stacked_prompt_x = torch.cat([prompt_x, torch.zeros_like(prompt_x)], dim=0)
-                stacked_style = torch.cat([style, torch.zeros_like(style)], dim=0)
-                stacked_mu = torch.cat([mu, torch.zeros_like(mu)], dim=0)
-                stacked_x = torch.cat([x, x], dim=0)
-                stacked_t = torch.cat([t.unsqueeze(0), t.unsqueeze(0)], dim=0)
+                stacked_cond_bias = self.estimator.prepare_conditioning(stacked_prompt_x, stacked_style, stacked_mu)
+                cond_bias = stacked_cond_bias[:B]
+            else:
+                cond_bias = self.estimator.prepare_conditioning(prompt_x, style, mu)
+            t1_span, t2_span = self.estimator.embed_timesteps(t_span.to(x.device))
+            t_embeddings = {
+                t_value: (t1_span[i:i + 1], None if t2_span is None else t2_span[i:i + 1])
+                for i, t_value in enumerate(t_values)
+            }
 
-                # Perform a single forward pass for both original and CFG inputs
-                stacked_dphi_dt = self.estimator(
-                    stacked_x, stacked_prompt_x, x_lens, stacked_t, stacked_style, stacked_mu,
-                )
+        def embed(t, t_value):
+            # intermediate evaluations (midpoint) are embedded on demand
+            if t_value not in t_embeddings:
+                t_embeddings[t_value] = self.estimator.embed_timesteps(t.to(x.device).reshape(1))
+            return t_embeddings[t_value]
+
+        def estimate(x, t, t_value, guided):
+            if not prepared:
+                t = t.to(x.device)
+                if guided:
+                    return self.estimator(x, stacked_prompt_x, stacked_x_lens, t.expand(2 * B), stacked_style, stacked_mu)
+                return self.estimator(x, prompt_x, x_lens, t.expand(B), style, mu)
+            t1, t2 = embed(t, t_value)
+            n = x.size(0)
+            return self.estimator.forward_prepared(
+                x, stacked_x_lens if guided else x_lens, stacked_cond_bias if guided else cond_bias,
+                t1.expand(n, -1), None if t2 is None else t2.expand(n, -1),
+            )
 
+        def velocity(x, t):
+            """One function evaluation of the (guided) estimator, the prompt range of `x` is zeroed."""
+            x[:, :, :prompt_len] = 0
+            t_value = float(t)
+            if cfg_schedule in (None, "all"):
+                cfg_rate = inference_cfg_rate
+            else:
+                step = min(max(bisect_right(t_values, t_value) - 1, 0), len(t_values) - 2)
+                cfg_rate = cfg_weight(step, t_value)
+            if cfg_rate > 0:
+                # Perform a single forward pass for both original and CFG inputs
+                stacked_x[:B].copy_(x)
+                stacked_x[B:].copy_(x)
+                stacked_dphi_dt = estimate(stacked_x, t, t_value, guided=True)
                 # Split the output back into the original and CFG components
                 dphi_dt, cfg_dphi_dt = stacked_dphi_dt.chunk(2, dim=0)
+                # Apply CFG formula, in place on the estimator output
+                return dphi_dt.mul_(1.0 + cfg_rate).sub_(cfg_dphi_dt, alpha=cfg_rate)
+            return estimate(x, t, t_value, guided=False)
 
-                # Apply CFG formula
-                dphi_dt = (1.0 + inference_cfg_rate) * dphi_dt - inference_cfg_rate * cfg_dphi_dt
-            else:
-                dphi_dt = self.estimator(x, prompt_x, x_lens, t.unsqueeze(0), style, mu)
+        x = SOLVERS[solver](velocity, x, t_span, progress=progress)
+        x[:, :, :prompt_len] = 0
+        return x
 
-            x = x + dt * dphi_dt
-            t = t + dt
-            sol.append(x)
-            if step < len(t_span) - 1:
-                dt = t_span[step + 1] - t
-            x[:, :, :prompt_len] = 0
+    def solve_euler(self, x, x_lens, prompt, mu, style, f0, t_span, inference_cfg_rate=0.5, progress=True):
+        """
+        Fixed euler solver for ODEs, see `solve`.
+        """
+        return self.solve(x, x_lens, prompt, mu, style, f0, t_span, inference_cfg_rate, solver="euler",
+                          progress=progress)
 
-        return sol[-1]
     def forward(self, x1, x_lens, prompt_lens, mu, style):
         """Computes diffusion loss
 
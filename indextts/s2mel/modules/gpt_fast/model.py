@@ -128,6 +128,7 @@ class Transformer(nn.Module):
 
         self.freqs_cis: Optional[Tensor] = None
         self.mask_cache: Optional[Tensor] = None
+        self.causal_mask: Optional[Tensor] = None
         self.max_batch_size = -1
         self.max_seq_length = -1
 
@@ -147,7 +148,8 @@ class Transformer(nn.Module):
 
         self.freqs_cis = precompute_freqs_cis(self.config.block_size, self.config.head_dim,
                                               self.config.rope_base, dtype).to(device)
-        self.causal_mask = torch.tril(torch.ones(self.max_seq_length, self.max_seq_length, dtype=torch.bool)).to(device)
+        # (max_seq_length, max_seq_length), allocated on first use by causal models
+        self.causal_mask = None
         self.use_kv_cache = use_kv_cache
         self.uvit_skip_connection = self.config.uvit_skip_connection
         if self.uvit_skip_connection:
@@ -157,6 +159,12 @@ class Transformer(nn.Module):
             self.layers_emit_skip = []
             self.layers_receive_skip = []
 
+    def get_causal_mask(self) -> Tensor:
+        if self.causal_mask is None:
+            self.causal_mask = torch.tril(torch.ones(self.max_seq_length, self.max_seq_length, dtype=torch.bool,
+                                                     device=self.freqs_cis.device))
+        return self.causal_mask
+
     def forward(self,
                 x: Tensor,
                 c: Tensor,
@@ -165,13 +173,19 @@ class Transformer(nn.Module):
                 context: Optional[Tensor] = None,
                 context_input_pos: Optional[Tensor] = None,
                 cross_attention_mask: Optional[Tensor] = None,
+                is_causal: bool = True,
                 ) -> Tensor:
+        """
+        `mask` is any boolean mask broadcastable to (batch, heads, query, key), e.g. a
+        (batch, 1, 1, key) key-padding mask. Without `mask`, a causal model attends causally
+        and a non-causal model (`is_causal=False`) attends to the whole sequence.
+        """
         assert self.freqs_cis is not None, "Caches must be initialized first"
-        if mask is None: # in case of non-causal model
+        if mask is None and is_causal:
             if not self.training and self.use_kv_cache:
-                mask = self.causal_mask[None, None, input_pos]
+                mask = self.get_causal_mask()[None, None, input_pos]
             else:
-                mask = self.causal_mask[None, None, input_pos]
+                mask = self.get_causal_mask()[None, None, input_pos]
                 mask = mask[..., input_pos]
         freqs_cis = self.freqs_cis[input_pos]
         if context is not None:
@@ -1,5 +1,5 @@
-from transformers import SeamlessM4TFeatureExtractor
-from transformers import Wav2Vec2BertModel
+from indextts.utils.maskgct_utils import load_truncated_w2v_bert
+from indextts.utils.feature_extractors import SeamlessM4TFbankFeatures
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -88,7 +88,7 @@ def load_config(config_fn, lowercase=False):
 class Extract_wav2vectbert:
     def __init__(self,device):
     #semantic_model = Wav2Vec2BertModel.from_pretrained("facebook/w2v-bert-2.0")
-        self.semantic_model = Wav2Vec2BertModel.from_pretrained("./MaskGCT_model/w2v_bert/")
+        self.semantic_model = load_truncated_w2v_bert("./MaskGCT_model/w2v_bert/")
         self.semantic_model.eval()
         self.semantic_model.to(device)
         self.stat_mean_var = torch.load("./MaskGCT_model/wav2vec2bert_stats.pt")
@@ -96,8 +96,7 @@ class Extract_wav2vectbert:
         self.semantic_std = torch.sqrt(self.stat_mean_var["var"])
         self.semantic_mean = self.semantic_mean.to(device)
         self.semantic_std = self.semantic_std.to(device)
-        self.processor = SeamlessM4TFeatureExtractor.from_pretrained(
-                "./MaskGCT_model/w2v_bert/")
+        self.processor = SeamlessM4TFbankFeatures().to(device)
         self.device = device
         
         cfg_maskgct = load_config('./MaskGCT_model/maskgct.json')
@@ -110,9 +109,7 @@ class Extract_wav2vectbert:
 
     @torch.no_grad()
     def extract_features(self, speech): # speech [b,T]
-        inputs = self.processor(speech, sampling_rate=16000, return_tensors="pt")
-        input_features = inputs["input_features"]
-        attention_mask = inputs["attention_mask"]
+        input_features, attention_mask = self.processor(speech)
         return input_features, attention_mask #[2, 620, 160] [2, 620]
 
     @torch.no_grad()
@@ -120,9 +117,8 @@ class Extract_wav2vectbert:
         vq_emb = self.semantic_model(           # Wav2Vec2BertModel
             input_features=input_features,
             attention_mask=attention_mask,
-            output_hidden_states=True,
         )
-        feat = vq_emb.hidden_states[17]  # (B, T, C)
+        feat = vq_emb.last_hidden_state  # (B, T, C), layer 17 of the truncated model
         feat = (feat - self.semantic_mean.to(feat)) / self.semantic_std.to(feat)
 
         semantic_code, rec_feat = self.semantic_codec.quantize(feat)  # (B, T)
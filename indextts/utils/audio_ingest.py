@@ -0,0 +1,95 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+import torch
+import torchaudio
+
+_resamplers: Dict[tuple, torchaudio.transforms.Resample] = {}
+_resamplers_lock = threading.Lock()
+
+
+def decode_audio(path: str) -> Tuple[torch.Tensor, int]:
+    """
+    Decode an audio file once at its native sampling rate, channels averaged to mono.
+
+    libsndfile (`soundfile`) decodes wav/flac/ogg directly; other formats (mp3, m4a, ...) fall
+    back to `librosa`'s decoders, still without resampling.
+
+    Returns:
+        (1, N) float32 waveform in [-1, 1] and its sampling rate.
+    """
+    try:
+        import soundfile
+
+        data, sr = soundfile.read(path, dtype="float32", always_2d=True)
+        audio = torch.from_numpy(data.T).mean(dim=0, keepdim=True)
+    except Exception:
+        import librosa
+
+        data, sr = librosa.load(path, sr=None, mono=True)
+        audio = torch.from_numpy(data).unsqueeze(0)
+    return audio.contiguous(), int(sr)
+
+
+def get_resampler(orig_freq: int, new_freq: int, device="cpu", dtype=torch.float32) -> torchaudio.transforms.Resample:
+    """
+    The shared `Resample` transform of (orig_freq, new_freq) on `device`: its sinc kernel is
+    computed once per rate pair instead of on every construction.
+    """
+    key = (int(orig_freq), int(new_freq), str(device), dtype)
+    resampler = _resamplers.get(key)
+    if resampler is None:
+        with _resamplers_lock:
+            resampler = _resamplers.get(key)
+            if resampler is None:
+                # the default kernel (computed in float64), as `Resample(orig_freq, new_freq)` builds it
+                resampler = torchaudio.transforms.Resample(int(orig_freq), int(new_freq)).to(device, dtype)
+                _resamplers[key] = resampler
+    return resampler
+
+
+def resample(audio: torch.Tensor, orig_freq: int, new_freq: int) -> torch.Tensor:
+    """
+    Resample (C, N) `audio` with the cached torchaudio sinc kernel of the rate pair, on the device
+    of `audio`: the same filter as constructing `torchaudio.transforms.Resample` for every prompt.
+    """
+    if orig_freq == new_freq:
+        return audio
+    return get_resampler(orig_freq, new_freq, audio.device, audio.dtype)(audio)
+
+
+class AudioClip:
+    """
+    Decoded audio at its native rate with cached views at other rates (e.g. the 16 kHz input of
+    w2v-bert/CAMPPlus and the 22.05 kHz input of the s2mel mel spectrogram).
+    """
+
+    def __init__(self, audio: torch.Tensor, sampling_rate: int):
+        self.audio = audio
+        self.sampling_rate = sampling_rate
+        self._views: Dict[int, torch.Tensor] = {sampling_rate: audio}
+
+    @classmethod
+    def load(cls, path: str, max_seconds: Optional[float] = None) -> "AudioClip":
+        audio, sr = decode_audio(path)
+        if max_seconds is not None:
+            audio = audio[:, :int(max_seconds * sr)]
+        return cls(audio, sr)
+
+    @property
+    def num_samples(self) -> int:
+        return self.audio.shape[-1]
+
+    @property
+    def duration(self) -> float:
+        return self.num_samples / self.sampling_rate
+
+    def at(self, sampling_rate: int) -> torch.Tensor:
+        """
+        The (1, N') waveform at `sampling_rate`, resampled once.
+        """
+        view = self._views.get(sampling_rate)
+        if view is None:
+            view = resample(self.audio, self.sampling_rate, sampling_rate)
+            self._views[sampling_rate] = view
+        return view
@@ -1,9 +1,11 @@
 import os
 import random
 import re
+from typing import Dict, List, Optional
 
 import torch
 import torchaudio
+from torch.nn.utils.rnn import pad_sequence
 
 MATPLOTLIB_FLAG = False
 
@@ -120,3 +122,89 @@ def safe_log(x: torch.Tensor, clip_val: float = 1e-7) -> torch.Tensor:
         Tensor: Element-wise logarithm of the input tensor with clipping applied.
     """
     return torch.log(torch.clip(x, min=clip_val))
+
+
+def bucket_segments(segments, bucket_max_size=4) -> List[List[Dict]]:
+    """
+    Group text segments into buckets of similar length for batched generation.
+
+    Every item is ``{"idx": index in segments, "sent": segment, "len": len(segment)}``.
+    If there are at most ``bucket_max_size`` segments, all of them are returned in one bucket;
+    otherwise empty segments are skipped and the others are bucketed by length, each bucket
+    holding at most ``bucket_max_size`` segments.
+    """
+    outputs: List[Dict] = []
+    for idx, sent in enumerate(segments):
+        outputs.append({"idx": idx, "sent": sent, "len": len(sent)})
+
+    if len(outputs) > bucket_max_size:
+        # split segments into buckets by segment length
+        buckets: List[List[Dict]] = []
+        factor = 1.5
+        last_bucket = None
+        last_bucket_sent_len_median = 0
+
+        for sent in sorted(outputs, key=lambda x: x["len"]):
+            current_sent_len = sent["len"]
+            if current_sent_len == 0:
+                print(">> skip empty segment")
+                continue
+            if last_bucket is None \
+                    or current_sent_len >= int(last_bucket_sent_len_median * factor) \
+                    or len(last_bucket) >= bucket_max_size:
+                # new bucket
+                buckets.append([sent])
+                last_bucket = buckets[-1]
+                last_bucket_sent_len_median = current_sent_len
+            else:
+                # current bucket can hold more segments
+                last_bucket.append(sent)  # sorted
+                mid = len(last_bucket) // 2
+                last_bucket_sent_len_median = last_bucket[mid]["len"]
+        last_bucket = None
+        # merge all buckets with size 1
+        out_buckets: List[List[Dict]] = []
+        only_ones: List[Dict] = []
+        for b in buckets:
+            if len(b) == 1:
+                only_ones.append(b[0])
+            else:
+                out_buckets.append(b)
+        if len(only_ones) > 0:
+            # merge into previous buckets if possible
+            for i in range(len(out_buckets)):
+                b = out_buckets[i]
+                if len(b) < bucket_max_size:
+                    b.append(only_ones.pop(0))
+                    if len(only_ones) == 0:
+                        break
+            # combined all remaining sized 1 buckets
+            if len(only_ones) > 0:
+                out_buckets.extend(
+                    [only_ones[i:i + bucket_max_size] for i in range(0, len(only_ones), bucket_max_size)])
+        return out_buckets
+    return [outputs]
+
+
+def pad_tokens_cat(tokens: List[torch.Tensor], stop_text_token: int,
+                   start_text_token: Optional[int] = None) -> torch.Tensor:
+    """
+    Concatenate text token tensors, each (N,) or (1, N), into a right-padded (b, L) batch.
+
+    The padding is `stop_text_token`, `UnifiedVoice.prepare_gpt_inputs` strips it and left-pads the inputs.
+    With `start_text_token` (IndexTTS models before 1.5), at most 8 `stop_text_token` are followed
+    by `start_text_token` padding.
+    """
+    tokens = [t.reshape(-1) for t in tokens]
+    if start_text_token is None:
+        return pad_sequence(tokens, batch_first=True, padding_value=stop_text_token, padding_side="right")
+    max_len = max(t.size(0) for t in tokens)
+    outputs = []
+    for tensor in tokens:
+        pad_len = max_len - tensor.size(0)
+        if pad_len > 0:
+            n = min(8, pad_len)
+            tensor = torch.nn.functional.pad(tensor, (0, n), value=stop_text_token)
+            tensor = torch.nn.functional.pad(tensor, (0, pad_len - n), value=start_text_token)
+        outputs.append(tensor)
+    return torch.stack(outputs, dim=0)
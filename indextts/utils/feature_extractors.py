@@ -48,3 +48,94 @@ class MelSpectrogramFeatures(FeatureExtractor):
         mel = self.mel_spec(audio)
         mel = safe_log(mel)
         return mel
+
+
+class SeamlessM4TFbankFeatures(nn.Module):
+    """
+    Torch implementation of the `SeamlessM4TFeatureExtractor` (w2v-bert 2.0 input features),
+    batched and on the device of the module:
+    kaldi fbank (25ms povey window, 10ms hop, 80 mel bins) -> per-utterance mean/variance
+    normalization of each bin -> stacking of 2 frames (160 dims) with the attention mask of the
+    stacked frames.
+
+    Padding matches the HuggingFace extractor with ``padding=True``: features are normalized before
+    padding, padded with zeros to the longest utterance rounded up to an even number of frames.
+    """
+
+    def __init__(self, sampling_rate=16000, num_mel_bins=80, frame_length=400, hop_length=160,
+                 fft_length=512, preemphasis=0.97, mel_floor=1.192092955078125e-07, stride=2):
+        super().__init__()
+        from transformers.audio_utils import mel_filter_bank, window_function
+
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self.fft_length = fft_length
+        self.preemphasis = preemphasis
+        self.mel_floor = mel_floor
+        self.stride = stride
+        mel_filters = mel_filter_bank(
+            num_frequency_bins=fft_length // 2 + 1,
+            num_mel_filters=num_mel_bins,
+            min_frequency=20,
+            max_frequency=sampling_rate // 2,
+            sampling_rate=sampling_rate,
+            norm=None,
+            mel_scale="kaldi",
+            triangularize_in_mel_space=True,
+        )
+        self.register_buffer("window", torch.from_numpy(window_function(frame_length, "povey", periodic=False)).float(),
+                             persistent=False)
+        self.register_buffer("mel_filters", torch.from_numpy(mel_filters).float(), persistent=False)
+
+    def num_frames(self, num_samples):
+        """
+        Number of fbank frames (before stacking) of `num_samples` samples.
+        """
+        return max(0, num_samples - self.frame_length) // self.hop_length + 1
+
+    @torch.no_grad()
+    def forward(self, waveforms):
+        """
+        Args:
+            waveforms: list of 1D waveforms in [-1, 1] at 16 kHz (tensors or numpy arrays).
+
+        Returns:
+            input_features: (B, T, 160) float32 tensor.
+            attention_mask: (B, T) int64 tensor.
+        """
+        device = self.window.device
+        waveforms = [torch.as_tensor(w, dtype=torch.float32).flatten() for w in waveforms]
+        lengths = torch.tensor([self.num_frames(w.numel()) for w in waveforms], device=device)
+        num_samples = max(self.frame_length, max(w.numel() for w in waveforms))
+        audio = torch.zeros(len(waveforms), num_samples, device=device)
+        for i, w in enumerate(waveforms):
+            audio[i, :w.numel()] = w.to(device)
+        audio = audio * 32768  # kaldi compliance: 16-bit signed integer range
+
+        # (B, F, frame_length) frames, dc offset removal, pre-emphasis and povey window
+        frames = audio.unfold(-1, self.frame_length, self.hop_length)
+        frames = frames - frames.mean(dim=-1, keepdim=True)
+        frames = torch.cat([frames[..., :1] * (1 - self.preemphasis),
+                            frames[..., 1:] - self.preemphasis * frames[..., :-1]], dim=-1)
+        spectrum = torch.fft.rfft(frames * self.window, n=self.fft_length)
+        power = spectrum.real.square() + spectrum.imag.square()
+        features = torch.log(torch.clamp(power @ self.mel_filters, min=self.mel_floor))  # (B, F, num_mel_bins)
+
+        # per-utterance normalization of each mel bin over the valid frames (unbiased variance)
+        num_frames = features.size(1)
+        mask = (torch.arange(num_frames, device=device)[None, :] < lengths[:, None])
+        valid = mask.unsqueeze(-1).float()
+        count = lengths[:, None, None].float()
+        mean = (features * valid).sum(dim=1, keepdim=True) / count
+        var = ((features - mean).square() * valid).sum(dim=1, keepdim=True) / (count - 1).clamp(min=1)
+        features = (features - mean) / torch.sqrt(var + 1e-7) * valid
+
+        # pad to a multiple of the stride and stack consecutive frames
+        remainder = num_frames % self.stride
+        if remainder:
+            features = torch.nn.functional.pad(features, (0, 0, 0, self.stride - remainder))
+            mask = torch.nn.functional.pad(mask, (0, self.stride - remainder))
+        batch_size, num_frames, num_channels = features.shape
+        input_features = features.reshape(batch_size, num_frames // self.stride, num_channels * self.stride)
+        attention_mask = mask[:, self.stride - 1::self.stride].long()
+        return input_features, attention_mask
@@ -1,16 +1,187 @@
 # -*- coding: utf-8 -*-
-from functools import lru_cache
 import os
+import threading
 import traceback
 import re
-from typing import List, Union, overload
+from collections import OrderedDict
+from typing import List, Tuple, Union, overload
 import warnings
 from indextts.utils.common import tokenize_by_CJK_char, de_tokenized_by_CJK_char
 from sentencepiece import SentencePieceProcessor
 
 
+def _fold_case(text: str) -> str:
+    # 逐字符转小写（保持长度不变，如 "İ" 这类小写后变长的字符保持原样），与 re.IGNORECASE 的匹配对应
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class GlossaryDict(dict):
+    """
+    术语词汇表，记录修改次数 `version`，用于判断编译好的匹配器是否过期
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+
+    def _changed(self):
+        self.version += 1
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._changed()
+        return super().setdefault(key, default)
+
+    def pop(self, key, *args):
+        self._changed()
+        return super().pop(key, *args)
+
+    def popitem(self):
+        self._changed()
+        return super().popitem()
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+
+class GlossaryMatcher:
+    """
+    编译后的术语词汇表：所有术语合并为一个前缀树形式的正则（大小写不敏感，同一位置取最长术语），
+    一次扫描完成替换；各语言的读法在编译时解析为查找表。
+    """
+
+    def __init__(self, glossary: dict, version=0, langs=("zh", "en")):
+        self.glossary = dict(glossary)
+        self.version = version
+        self.pattern = self._compile_trie([str(term) for term in glossary.keys()])
+        self._replacements = {}
+        for lang in langs:
+            self.replacements(lang)
+
+    @staticmethod
+    def _compile_trie(terms):
+        trie = {}
+        for term in terms:
+            if not term:
+                continue
+            node = trie
+            for c in _fold_case(term):
+                node = node.setdefault(c, {})
+            node[""] = True
+
+        def to_regex(node):
+            # 单一路径压缩为字面量，终止节点之后的分支设为可选（贪婪，优先匹配更长的术语）
+            literal = ""
+            while len(node) == 1 and "" not in node:
+                c, node = next(iter(node.items()))
+                literal += re.escape(c)
+            branches = [re.escape(c) + to_regex(child) for c, child in node.items() if c != ""]
+            if not branches:
+                return literal
+            group = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+            if "" in node:
+                return literal + "(?:" + group + ")?"
+            return literal + group
+
+        if not trie:
+            return None
+        return re.compile(to_regex(trie), re.IGNORECASE)
+
+    def replacements(self, lang):
+        """
+        术语（按 `_fold_case` 归一化）到 `lang` 读法的查找表；大小写不同的同一术语，较早加入的优先
+        """
+        table = self._replacements.get(lang)
+        if table is None:
+            table = {}
+            for term, value in self.glossary.items():
+                if isinstance(value, dict):
+                    replacement = value.get(lang, term)
+                else:
+                    replacement = value
+                table.setdefault(_fold_case(str(term)), str(replacement))
+            self._replacements[lang] = table
+        return table
+
+    def apply(self, text, lang="zh"):
+        if self.pattern is None:
+            return text
+        table = self.replacements(lang)
+        return self.pattern.sub(lambda m: table.get(_fold_case(m.group(0)), m.group(0)), text)
+
+
+class NormalizationCache:
+    """
+    有上限的 LRU 缓存，保存 normalize 的结果，并统计命中率（`info()`）
+
+    Args:
+        max_entries: 最多缓存的文本数，``<= 0`` 时不缓存
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return result
+
+    def put(self, key, result):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def info(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
+
 class TextNormalizer:
-    def __init__(self, enable_glossary=False):
+    def __init__(self, enable_glossary=False, cache_size=4096):
+        """
+        Args:
+            enable_glossary: 是否应用术语词汇表
+            cache_size: normalize 结果缓存的最大条数，按 (文本, 语言, 术语表版本) 缓存，0 为不缓存
+        """
         self.zh_normalizer = None
         self.en_normalizer = None
         self.char_rep_map = {
@@ -54,6 +225,9 @@ class TextNormalizer:
             "$": ".",
             **self.char_rep_map,
         }
+        self.char_rep_pattern = re.compile("|".join(re.escape(p) for p in self.char_rep_map.keys()))
+        self.zh_char_rep_pattern = re.compile("|".join(re.escape(p) for p in self.zh_char_rep_map.keys()))
+        self.cache = NormalizationCache(cache_size)
         self.enable_glossary = enable_glossary
         # 术语词汇表：用户可自定义专业术语的读法
         # 格式: {"原始术语": {"en": "英文读法", "zh": "中文读法"}}
@@ -73,10 +247,37 @@ class TextNormalizer:
         # }
         self.term_glossary = dict()
 
+    @property
+    def term_glossary(self):
+        return self._term_glossary
+
+    @term_glossary.setter
+    def term_glossary(self, glossary):
+        previous = getattr(self, "_term_glossary", None)
+        self._term_glossary = GlossaryDict(glossary)
+        if previous is not None:
+            # 版本号单调递增，替换整个词汇表后不会命中旧的缓存
+            self._term_glossary.version = previous.version + 1
+        self._glossary_matcher = None
+
+    @property
+    def glossary_version(self) -> int:
+        return self._term_glossary.version
+
+    @property
+    def glossary_matcher(self) -> GlossaryMatcher:
+        """
+        编译后的术语词汇表，词汇表被修改后重新编译
+        """
+        matcher = self._glossary_matcher
+        if matcher is None or matcher.version != self._term_glossary.version:
+            matcher = GlossaryMatcher(self._term_glossary, self._term_glossary.version)
+            self._glossary_matcher = matcher
+        return matcher
+
     def match_email(self, email):
         # 正则表达式匹配邮箱格式：数字英文@数字英文.英文
-        pattern = r"^[a-zA-Z0-9]+@[a-zA-Z0-9]+\.[a-zA-Z]+$"
-        return re.match(pattern, email) is not None
+        return TextNormalizer.EMAIL_RE.match(email) is not None
 
     PINYIN_TONE_PATTERN = r"(?<![a-z])((?:[bpmfdtnlgkhjqxzcsryw]|[zcs]h)?(?:[aeiouüv]|[ae]i|u[aio]|ao|ou|i[aue]|[uüv]e|[uvü]ang?|uai|[aeiuv]n|[aeio]ng|ia[no]|i[ao]ng)|ng|er)([1-5])"
     """
@@ -101,15 +302,26 @@ class TextNormalizer:
     # 匹配常见英语缩写 's，仅用于替换为 is，不匹配所有 's
     ENGLISH_CONTRACTION_PATTERN = r"(what|where|who|which|how|t?here|it|s?he|that|this)'s"
 
+    # 预编译的正则，避免每次调用时重新编译
+    PINYIN_TONE_RE = re.compile(PINYIN_TONE_PATTERN, re.IGNORECASE)
+    NAME_RE = re.compile(NAME_PATTERN, re.IGNORECASE)
+    TECH_TERM_RE = re.compile(TECH_TERM_PATTERN)
+    ENGLISH_CONTRACTION_RE = re.compile(ENGLISH_CONTRACTION_PATTERN, re.IGNORECASE)
+    TECH_TERM_PLACEHOLDER_RE = re.compile(r"\s*<H>\s*")
+    JQX_PINYIN_RE = re.compile(r"([jqx])[uü](n|e|an)*(\d)", re.IGNORECASE)
+    CHINESE_CHAR_RE = re.compile(r"[\u4e00-\u9fff]")
+    ALPHA_RE = re.compile(r"[a-zA-Z]")
+    EMAIL_RE = re.compile(r"^[a-zA-Z0-9]+@[a-zA-Z0-9]+\.[a-zA-Z]+$")
+
 
     def use_chinese(self, s):
-        has_chinese = bool(re.search(r"[\u4e00-\u9fff]", s))
-        has_alpha = bool(re.search(r"[a-zA-Z]", s))
+        has_chinese = bool(TextNormalizer.CHINESE_CHAR_RE.search(s))
+        has_alpha = bool(TextNormalizer.ALPHA_RE.search(s))
         is_email = self.match_email(s)
         if has_chinese or not has_alpha or is_email:
             return True
 
-        has_pinyin = bool(re.search(TextNormalizer.PINYIN_TONE_PATTERN, s, re.IGNORECASE))
+        has_pinyin = bool(TextNormalizer.PINYIN_TONE_RE.search(s))
         return has_pinyin
 
     def load(self):
@@ -137,12 +349,50 @@ class TextNormalizer:
             )
             self.en_normalizer = NormalizerEn(overwrite_cache=False)
 
-    def normalize(self, text: str) -> str:
+    def normalize(self, text: str, use_chinese: bool = None) -> str:
+        """
+        Args:
+            text: 待规范化的文本
+            use_chinese: 是否使用中文 normalizer，None 时由 `use_chinese()` 判断
+                （长文本分块并行规范化时，各分块沿用整段文本的判断）
+        """
+        return self.try_normalize(text, use_chinese)[0]
+
+    def try_normalize(self, text: str, use_chinese: bool = None) -> Tuple[str, bool]:
+        """
+        同 `normalize`，并返回 normalizer 是否成功（失败的结果不缓存，下次调用重新规范化）
+        """
         if not self.zh_normalizer or not self.en_normalizer:
             print("Error, text normalizer is not initialized !!!")
-            return ""
-        if self.use_chinese(text):
-            text = re.sub(TextNormalizer.ENGLISH_CONTRACTION_PATTERN, r"\1 is", text, flags=re.IGNORECASE)
+            return "", False
+        if use_chinese is None:
+            use_chinese = self.use_chinese(text)
+        key = self.cache_key(text, use_chinese)
+        result = self.cache.get(key)
+        if result is not None:
+            return result, True
+        result, ok = self._normalize(text, use_chinese)
+        if ok:
+            self.cache.put(key, result)
+        return result, ok
+
+    def cache_key(self, text: str, use_chinese: bool):
+        return text, "zh" if use_chinese else "en", self.glossary_version if self.enable_glossary else None
+
+    def cache_info(self) -> dict:
+        """
+        normalize 结果缓存的命中次数、未命中次数、命中率和条数，用于监控
+        """
+        return self.cache.info()
+
+    def _normalize(self, text: str, use_chinese: bool) -> Tuple[str, bool]:
+        """
+        Returns:
+            规范化结果，以及 normalizer 是否成功（失败时中文返回空字符串，英文返回未规范化的文本）
+        """
+        ok = True
+        if use_chinese:
+            text = TextNormalizer.ENGLISH_CONTRACTION_RE.sub(r"\1 is", text)
             # 应用术语词汇表（优先级最高，在所有保护之前）
             if self.enable_glossary:
                 text = self.apply_glossary_terms(text, lang="zh")
@@ -154,7 +404,7 @@ class TextNormalizer:
             try:
                 result = self.zh_normalizer.normalize(replaced_text)
             except Exception:
-                result = ""
+                result, ok = "", False
                 print(traceback.format_exc())
             # 恢复人名
             result = self.restore_names(result, original_name_list)
@@ -162,11 +412,10 @@ class TextNormalizer:
             result = self.restore_pinyin_tones(result, pinyin_list)
             # 恢复技术术语
             result = self.restore_tech_terms(result, tech_list)
-            pattern = re.compile("|".join(re.escape(p) for p in self.zh_char_rep_map.keys()))
-            result = pattern.sub(lambda x: self.zh_char_rep_map[x.group()], result)
+            result = self.zh_char_rep_pattern.sub(lambda x: self.zh_char_rep_map[x.group()], result)
         else:
             try:
-                text = re.sub(TextNormalizer.ENGLISH_CONTRACTION_PATTERN, r"\1 is", text, flags=re.IGNORECASE)
+                text = TextNormalizer.ENGLISH_CONTRACTION_RE.sub(r"\1 is", text)
                 # 应用术语词汇表（优先级最高，在所有保护之前）
                 if self.enable_glossary:
                     text = self.apply_glossary_terms(text, lang="en")
@@ -176,11 +425,10 @@ class TextNormalizer:
                 # 恢复技术术语
                 result = self.restore_tech_terms(result, tech_list)
             except Exception:
-                result = text
+                result, ok = text, False
                 print(traceback.format_exc())
-            pattern = re.compile("|".join(re.escape(p) for p in self.char_rep_map.keys()))
-            result = pattern.sub(lambda x: self.char_rep_map[x.group()], result)
-        return result
+            result = self.char_rep_pattern.sub(lambda x: self.char_rep_map[x.group()], result)
+        return result, ok
 
     def correct_pinyin(self, pinyin: str):
         """
@@ -190,9 +438,8 @@ class TextNormalizer:
         if pinyin[0] not in "jqxJQX":
             return pinyin
         # 匹配 jqx 的韵母为 u/ü 的拼音
-        pattern = r"([jqx])[uü](n|e|an)*(\d)"
         repl = r"\g<1>v\g<2>\g<3>"
-        pinyin = re.sub(pattern, repl, pinyin, flags=re.IGNORECASE)
+        pinyin = TextNormalizer.JQX_PINYIN_RE.sub(repl, pinyin)
         return pinyin.upper()
 
     def save_names(self, original_text):
@@ -201,8 +448,7 @@ class TextNormalizer:
         例如：克里斯托弗·诺兰 -> <n_a>
         """
         # 人名
-        name_pattern = re.compile(TextNormalizer.NAME_PATTERN, re.IGNORECASE)
-        original_name_list = re.findall(name_pattern, original_text)
+        original_name_list = TextNormalizer.NAME_RE.findall(original_text)
         if len(original_name_list) == 0:
             return (original_text, None)
         original_name_list = list(set("".join(n) for n in original_name_list))
@@ -236,8 +482,7 @@ class TextNormalizer:
         例如：GPT-5-nano -> GPT<H>5<H>nano，然后 5 被转换为 五
         最终恢复为：GPT-五-nano
         """
-        tech_pattern = re.compile(TextNormalizer.TECH_TERM_PATTERN)
-        original_tech_list = tech_pattern.findall(original_text)
+        original_tech_list = TextNormalizer.TECH_TERM_RE.findall(original_text)
         if len(original_tech_list) == 0:
             return (original_text, None)
 
@@ -264,7 +509,7 @@ class TextNormalizer:
 
         # 清理 <H> 周围可能的空格，然后恢复为连字符
         # 处理模式: " <H> " -> "-", " <H>" -> "-", "<H> " -> "-", "<H>" -> "-"
-        transformed_text = re.sub(r'\s*<H>\s*', '-', normalized_text)
+        transformed_text = TextNormalizer.TECH_TERM_PLACEHOLDER_RE.sub('-', normalized_text)
         return transformed_text
 
     def apply_glossary_terms(self, text, lang="zh"):
@@ -284,25 +529,8 @@ class TextNormalizer:
         """
         if not self.term_glossary:
             return text
-
-        # 按术语长度降序排列，避免短术语先匹配导致长术语无法匹配
-        # 例如："PCIe 5.0" 应该在 "PCIe" 之前匹配
-        sorted_terms = sorted(self.term_glossary.keys(), key=len, reverse=True)
-        @lru_cache(maxsize=42)
-        def get_term_pattern(term: str):
-            return re.compile(re.escape(term), re.IGNORECASE)
-        transformed_text = text
-        for term in sorted_terms:
-            term_value = self.term_glossary[term]
-            if isinstance(term_value, dict):
-                replacement = term_value.get(lang, term_value.get(lang, term))
-            else:
-                replacement = term_value
-            # 使用正则进行大小写不敏感的替换
-            pattern = get_term_pattern(term)
-            transformed_text = pattern.sub(replacement, transformed_text)
-
-        return transformed_text
+        # 所有术语编译为一个正则，同一位置优先匹配最长的术语（例如 "PCIe 5.0" 优先于 "PCIe"）
+        return self.glossary_matcher.apply(text, lang)
 
     def load_glossary(self, glossary_dict):
         """
@@ -319,6 +547,7 @@ class TextNormalizer:
         """
         if glossary_dict and isinstance(glossary_dict, dict):
             self.term_glossary.update(glossary_dict)
+            self.glossary_matcher  # 预编译
 
     def load_glossary_from_yaml(self, glossary_path):
         """
@@ -342,6 +571,7 @@ class TextNormalizer:
                 external_glossary = yaml.safe_load(f)
                 if external_glossary and isinstance(external_glossary, dict):
                     self.term_glossary = external_glossary
+                    self.glossary_matcher  # 预编译
                     return True
         return False
 
@@ -362,8 +592,7 @@ class TextNormalizer:
         例如：xuan4 -> <pinyin_a>
         """
         # 声母韵母+声调数字
-        origin_pinyin_pattern = re.compile(TextNormalizer.PINYIN_TONE_PATTERN, re.IGNORECASE)
-        original_pinyin_list = re.findall(origin_pinyin_pattern, original_text)
+        original_pinyin_list = TextNormalizer.PINYIN_TONE_RE.findall(original_text)
         if len(original_pinyin_list) == 0:
             return (original_text, None)
         original_pinyin_list = list(set("".join(p) for p in original_pinyin_list))
@@ -397,9 +626,17 @@ class TextNormalizer:
 
 
 class TextTokenizer:
-    def __init__(self, vocab_file: str, normalizer: TextNormalizer = None):
+    def __init__(self, vocab_file: str, normalizer: TextNormalizer = None, normalizer_pool=None):
+        """
+        Args:
+            vocab_file: BPE 模型路径
+            normalizer: 文本规范化器
+            normalizer_pool: 多进程规范化服务（`indextts.utils.text_pool.NormalizerPool`），
+                设置后长文本和批量文本并行规范化
+        """
         self.vocab_file = vocab_file
         self.normalizer = normalizer
+        self.normalizer_pool = normalizer_pool
 
         if self.vocab_file is None:
             raise ValueError("vocab_file is None")
@@ -409,6 +646,8 @@ class TextTokenizer:
             self.normalizer.load()
         # 加载词表
         self.sp_model = SentencePieceProcessor(model_file=self.vocab_file)
+        # 分句用的标点 token id 集合，首次分句时计算
+        self._segment_id_sets = None
 
         self.pre_tokenizers = [
             # 预处理器
@@ -487,7 +726,9 @@ class TextTokenizer:
         if len(text.strip()) == 1:
             return self.sp_model.Encode(text, out_type=kwargs.pop("out_type", int), **kwargs)
         # 预处理
-        if self.normalizer:
+        if self.normalizer_pool is not None:
+            text = self.normalizer_pool.normalize(text)
+        elif self.normalizer:
             text = self.normalizer.normalize(text)
         if len(self.pre_tokenizers) > 0:
             for pre_tokenizer in self.pre_tokenizers:
@@ -496,7 +737,9 @@ class TextTokenizer:
 
     def batch_encode(self, texts: List[str], **kwargs):
         # 预处理
-        if self.normalizer:
+        if self.normalizer_pool is not None:
+            texts = self.normalizer_pool.normalize_many(texts)
+        elif self.normalizer:
             texts = [self.normalizer.normalize(text) for text in texts]
         if len(self.pre_tokenizers) > 0:
             for pre_tokenizer in self.pre_tokenizers:
@@ -509,86 +752,6 @@ class TextTokenizer:
         decoded = self.sp_model.Decode(ids, out_type=kwargs.pop("out_type", str), **kwargs)
         return de_tokenized_by_CJK_char(decoded, do_lower_case=do_lower_case)
 
-    @staticmethod
-    def split_segments_by_token(
-        tokenized_str: List[str],
-        split_tokens: List[str],
-        max_text_tokens_per_segment: int,
-        quick_streaming_tokens: int = 0
-    ) -> List[List[str]]:
-        """
-        将tokenize后的结果按特定token进一步分割
-        """
-        # 处理特殊情况
-        if len(tokenized_str) == 0:
-            return []
-        segments: List[List[str]] = []
-        current_segment = []
-        current_segment_tokens_len = 0
-        for i in range(len(tokenized_str)):
-            token = tokenized_str[i]
-            current_segment.append(token)
-            current_segment_tokens_len += 1
-            if not  ("," in split_tokens or "▁," in split_tokens ) and ("," in current_segment or "▁," in current_segment): 
-                # 如果当前tokens中有,，则按,分割
-                sub_segments = TextTokenizer.split_segments_by_token(
-                    current_segment, [",", "▁,"], max_text_tokens_per_segment=max_text_tokens_per_segment, quick_streaming_tokens = quick_streaming_tokens
-                )
-            elif "-" not in split_tokens and "-" in current_segment:
-                # 没有,，则按-分割
-                sub_segments = TextTokenizer.split_segments_by_token(
-                    current_segment, ["-"], max_text_tokens_per_segment=max_text_tokens_per_segment, quick_streaming_tokens = quick_streaming_tokens
-                )
-            elif current_segment_tokens_len <= max_text_tokens_per_segment:
-                if token in split_tokens and current_segment_tokens_len > 2:
-                    if i < len(tokenized_str) - 1:
-                        if tokenized_str[i + 1] in ["'", "▁'"]:
-                            # 后续token是'，则不切分
-                            current_segment.append(tokenized_str[i + 1])
-                            i += 1
-                    segments.append(current_segment)
-                    current_segment = []
-                    current_segment_tokens_len = 0
-                continue
-            # 如果当前tokens的长度超过最大限制
-            else:
-                # 按照长度分割
-                sub_segments = []
-                for j in range(0, len(current_segment), max_text_tokens_per_segment):
-                    if j + max_text_tokens_per_segment < len(current_segment):
-                        sub_segments.append(current_segment[j : j + max_text_tokens_per_segment])
-                    else:
-                        sub_segments.append(current_segment[j:])
-                warnings.warn(
-                    f"The tokens length of segment exceeds limit: {max_text_tokens_per_segment}, "
-                    f"Tokens in segment: {current_segment}."
-                    "Maybe unexpected behavior",
-                    RuntimeWarning,
-                )
-            segments.extend(sub_segments)
-            current_segment = []
-            current_segment_tokens_len = 0
-        if current_segment_tokens_len > 0:
-            assert current_segment_tokens_len <= max_text_tokens_per_segment
-            segments.append(current_segment)
-        # 如果相邻的句子加起来长度小于最大限制，且此前token总数超过quick_streaming_tokens，则合并
-        merged_segments = []
-        total_token = 0
-        for segment in segments:
-            total_token += len(segment)
-            if len(segment) == 0:
-                continue
-            if len(merged_segments) == 0:
-                merged_segments.append(segment)
-            elif len(merged_segments[-1]) + len(segment) <= max_text_tokens_per_segment and total_token > quick_streaming_tokens:
-                merged_segments[-1] = merged_segments[-1] + segment
-            # 或小于最大长度限制的一半，则合并
-            elif len(merged_segments[-1]) + len(segment) <= max_text_tokens_per_segment / 2:
-                merged_segments[-1] = merged_segments[-1] + segment
-            else:
-                merged_segments.append(segment)
-        return merged_segments
-
     punctuation_marks_tokens = [
         ".",
         "!",
@@ -598,10 +761,174 @@ class TextTokenizer:
         "▁?",
         "▁...", # ellipsis
     ]
-    def split_segments(self, tokenized: List[str], max_text_tokens_per_segment=120, quick_streaming_tokens = 0) -> List[List[str]]:
-        return TextTokenizer.split_segments_by_token(
-            tokenized, self.punctuation_marks_tokens, max_text_tokens_per_segment=max_text_tokens_per_segment, quick_streaming_tokens = quick_streaming_tokens
+    comma_tokens = [",", "▁,"]
+    hyphen_tokens = ["-"]
+    apostrophe_tokens = ["'", "▁'"]
+
+    def _token_id_set(self, tokens: List[str]) -> frozenset:
+        # 不在词表中的 token 会映射为 unk，不能加入集合
+        ids = (self.sp_model.PieceToId(token) for token in tokens)
+        return frozenset(i for i in ids if self.sp_model.IdToPiece(i) in tokens)
+
+    @staticmethod
+    def split_segment_ranges(
+        token_ids: List[int],
+        sentence_end_ids,
+        comma_ids,
+        hyphen_ids,
+        apostrophe_ids,
+        max_text_tokens_per_segment: int,
+        quick_streaming_tokens: int = 0,
+    ) -> List[Tuple[int, int]]:
+        """
+        单次扫描的分句，返回各分句在 `token_ids` 中的区间 ``[start, end)``，依次首尾相接：
+        逗号、连字符处总是切分；句末标点处（分句超过 2 个 token 时）切分，紧随其后的撇号归入当前分句；
+        超过 `max_text_tokens_per_segment` 的部分按长度切分。
+        相邻分句合计不超过最大长度、且此前 token 总数超过 `quick_streaming_tokens` 时合并，
+        或合计不超过最大长度的一半时合并。
+        """
+        max_tokens = max_text_tokens_per_segment
+        ranges: List[Tuple[int, int]] = []
+        num_tokens = len(token_ids)
+        start = 0
+        i = 0
+        while i < num_tokens:
+            token = token_ids[i]
+            length = i + 1 - start
+            if token in comma_ids or token in hyphen_ids or length > max_tokens:
+                if length > max_tokens:
+                    warnings.warn(
+                        f"The tokens length of segment exceeds limit: {max_tokens}, "
+                        f"Tokens in segment: {token_ids[start:i + 1]}."
+                        "Maybe unexpected behavior",
+                        RuntimeWarning,
+                    )
+                    ranges.append((start, start + max_tokens))
+                    start += max_tokens
+                ranges.append((start, i + 1))
+                start = i + 1
+            elif token in sentence_end_ids and length > 2:
+                end = i + 1
+                if end < num_tokens and token_ids[end] in apostrophe_ids:
+                    # 后续token是'，则不切分
+                    end += 1
+                ranges.append((start, end))
+                start = end
+                i = end
+                continue
+            i += 1
+        if start < num_tokens:
+            ranges.append((start, num_tokens))
+
+        # 合并相邻的分句（区间首尾相接，合并即延长上一个区间）
+        merged: List[Tuple[int, int]] = []
+        total_tokens = 0
+        for start, end in ranges:
+            length = end - start
+            total_tokens += length
+            if length == 0:
+                continue
+            if merged:
+                merged_start, merged_end = merged[-1]
+                merged_length = merged_end - merged_start + length
+                if (merged_length <= max_tokens and total_tokens > quick_streaming_tokens) \
+                        or merged_length <= max_tokens / 2:
+                    merged[-1] = (merged_start, end)
+                    continue
+            merged.append((start, end))
+        return merged
+
+    def segment_ids(self, token_ids: List[int], max_text_tokens_per_segment=120,
+                    quick_streaming_tokens=0) -> List[List[int]]:
+        """
+        将 token id 序列分句
+        """
+        if self._segment_id_sets is None:
+            self._segment_id_sets = (
+                self._token_id_set(self.punctuation_marks_tokens),
+                self._token_id_set(self.comma_tokens),
+                self._token_id_set(self.hyphen_tokens),
+                self._token_id_set(self.apostrophe_tokens),
+            )
+        ranges = TextTokenizer.split_segment_ranges(
+            token_ids, *self._segment_id_sets, max_text_tokens_per_segment=max_text_tokens_per_segment,
+            quick_streaming_tokens=quick_streaming_tokens
         )
+        return [token_ids[start:end] for start, end in ranges]
+
+    def encode_segments(self, text: str, max_text_tokens_per_segment=120,
+                        quick_streaming_tokens=0) -> Tuple[List[int], List[List[int]]]:
+        """
+        规范化、分词并分句，返回 (token ids, 各分句的 token ids)
+        """
+        token_ids = self.encode(text, out_type=int)
+        return token_ids, self.segment_ids(token_ids, max_text_tokens_per_segment, quick_streaming_tokens)
+
+    def split_segments(self, tokenized: List[str], max_text_tokens_per_segment=120, quick_streaming_tokens = 0) -> List[List[str]]:
+        token_ids = self.convert_tokens_to_ids(tokenized)
+        segments = self.segment_ids(token_ids, max_text_tokens_per_segment, quick_streaming_tokens)
+        result, start = [], 0
+        for segment in segments:
+            result.append(tokenized[start:start + len(segment)])
+            start += len(segment)
+        return result
+
+
+# 规范化的回归用例：`__main__` 逐条打印结果，
+# `NormalizerPool` 用其校验分块规范化与整段规范化的结果一致
+REGRESSION_CASES = [
+    "IndexTTS 正式发布1.0版本了，效果666",
+    "晕XUAN4是一种GAN3觉",
+    "我爱你！",
+    "I love you!",
+    "“我爱你”的英语是“I love you”",
+    "2.5平方电线",
+    "共465篇，约315万字",
+    "2002年的第一场雪，下在了2003年",
+    "速度是10km/h",
+    "现在是北京时间2025年01月11日 20:00",
+    "他这条裤子是2012年买的，花了200块钱",
+    "电话：135-4567-8900",
+    "1键3连",
+    "他这条视频点赞3000+，评论1000+，收藏500+",
+    "这是1024元的手机，你要吗？",
+    "受不liao3你了",
+    "“衣裳”不读衣chang2，而是读衣shang5",
+    "最zhong4要的是：不要chong2蹈覆辙",
+    "不zuo1死就不会死",
+    "See you at 8:00 AM",
+    "8:00 AM 开会",
+    "Couting down 3, 2, 1, go!",
+    "数到3就开始：1、2、3",
+    "This sales for 2.5% off, only $12.5.",
+    "5G网络是4G网络的升级版，2G网络是3G网络的前身",
+    "苹果于2030/1/2发布新 iPhone 2X 系列手机，最低售价仅 ¥12999",
+    "这酒...里...有毒...",
+    # 异常case
+    "只有,,,才是最好的",
+    "babala2是什么？",  # babala二是什么?
+    "用beta1测试",  # 用beta一测试
+    "have you ever been to beta2?",  # have you ever been to beta two?
+    "where's the money?",  # where is the money?
+    "who's there?",  # who is there?
+    "which's the best?",  # which is the best?
+    "how's it going?",  # how is it going?
+    "今天是个好日子 it's a good day",  # 今天是个好日子 it is a good day
+    # 术语
+    "such as XTTS, CosyVoice2, Fish-Speech, and F5-TTS",  # such as xtts,cosyvoice two,fish-speech,and f five-tts
+    "GPT-5-Nano is the smallest and fastest variant in the GPT-5 model family.",  # GPT-five-Nano is the smallest and fastest variant in the GPT-five model family
+    "GPT-5-Nano 是 GPT-5 模型家族中最小且速度最快的变体",  # GPT-五-Nano 是 GPT-五 系统中最小且速度最快的变体
+    "2025/09/08 IndexTTS-2 全球发布",  # 二零二五年九月八日 IndexTTS-二全球发布
+    "Here are some highly-rated M.2 NVMe SSDs: Samsung 9100 PRO PCIe 5.0 SSD M.2, $139.99",  # Here are some highly-rated M dot two NVMe SSD's, Samsung nine thousand one hundred PRO PCIE five SSD M dot two . one hundred and thirty nine dollars and ninety nine cents
+    "we dive deep into the showdown between DisplayPort 1.4 and HDMI 2.1 to determine which is the best choice for gaming enthusiasts",
+    # 人名
+    "约瑟夫·高登-莱维特（Joseph Gordon-Levitt is an American actor）",
+    "蒂莫西·唐纳德·库克（英文名：Timothy Donald Cook），通称蒂姆·库克（Tim Cook），美国商业经理、工业工程师和工业开发商，现任苹果公司首席执行官。",
+    # 长句子
+    "《盗梦空间》是由美国华纳兄弟影片公司出品的电影，由克里斯托弗·诺兰执导并编剧，莱昂纳多·迪卡普里奥、玛丽昂·歌迪亚、约瑟夫·高登-莱维特、艾利奥特·佩吉、汤姆·哈迪等联袂主演，2010年7月16日在美国上映，2010年9月1日在中国内地上映，2020年8月28日在中国内地重映。影片剧情游走于梦境与现实之间，被定义为“发生在意识结构内的当代动作科幻片”，讲述了由莱昂纳多·迪卡普里奥扮演的造梦师，带领特工团队进入他人梦境，从他人的潜意识中盗取机密，并重塑他人梦境的故事。",
+    "清晨拉开窗帘，阳光洒在窗台的Bloomixy花艺礼盒上——薰衣草香薰蜡烛唤醒嗅觉，永生花束折射出晨露般光泽。设计师将“自然绽放美学”融入每个细节：手工陶瓷花瓶可作首饰收纳，香薰精油含依兰依兰舒缓配方。限量款附赠《365天插花灵感手册》，让每个平凡日子都有花开仪式感。\n宴会厅灯光暗下的刹那，Glimmeria星月系列耳坠开始发光——瑞士冷珐琅工艺让蓝宝石如银河流动，钛合金骨架仅3.2g无负重感。设计师秘密：内置微型重力感应器，随步伐产生0.01mm振幅，打造“行走的星光”。七夕限定礼盒含星座定制铭牌，让爱意如星辰永恒闪耀。",
+    "电影1：“黑暗骑士”（演员：克里斯蒂安·贝尔、希斯·莱杰；导演：克里斯托弗·诺兰）；电影2：“盗梦空间”（演员：莱昂纳多·迪卡普里奥；导演：克里斯托弗·诺兰）；电影3：“钢琴家”（演员：艾德里安·布洛迪；导演：罗曼·波兰斯基）；电影4：“泰坦尼克号”（演员：莱昂纳多·迪卡普里奥；导演：詹姆斯·卡梅隆）；电影5：“阿凡达”（演员：萨姆·沃辛顿；导演：詹姆斯·卡梅隆）；电影6：“南方公园：大电影”（演员：马特·斯通、托马斯·艾恩格瑞；导演：特雷·帕克）",
+]
 
 
 if __name__ == "__main__":
@@ -609,59 +936,7 @@ if __name__ == "__main__":
 
     text_normalizer = TextNormalizer(enable_glossary=True)
 
-    cases = [
-        "IndexTTS 正式发布1.0版本了，效果666",
-        "晕XUAN4是一种GAN3觉",
-        "我爱你！",
-        "I love you!",
-        "“我爱你”的英语是“I love you”",
-        "2.5平方电线",
-        "共465篇，约315万字",
-        "2002年的第一场雪，下在了2003年",
-        "速度是10km/h",
-        "现在是北京时间2025年01月11日 20:00",
-        "他这条裤子是2012年买的，花了200块钱",
-        "电话：135-4567-8900",
-        "1键3连",
-        "他这条视频点赞3000+，评论1000+，收藏500+",
-        "这是1024元的手机，你要吗？",
-        "受不liao3你了",
-        "“衣裳”不读衣chang2，而是读衣shang5",
-        "最zhong4要的是：不要chong2蹈覆辙",
-        "不zuo1死就不会死",
-        "See you at 8:00 AM",
-        "8:00 AM 开会",
-        "Couting down 3, 2, 1, go!",
-        "数到3就开始：1、2、3",
-        "This sales for 2.5% off, only $12.5.",
-        "5G网络是4G网络的升级版，2G网络是3G网络的前身",
-        "苹果于2030/1/2发布新 iPhone 2X 系列手机，最低售价仅 ¥12999",
-        "这酒...里...有毒...",
-        # 异常case
-        "只有,,,才是最好的",
-        "babala2是什么？",  # babala二是什么?
-        "用beta1测试",  # 用beta一测试
-        "have you ever been to beta2?",  # have you ever been to beta two?
-        "where's the money?",  # where is the money?
-        "who's there?",  # who is there?
-        "which's the best?",  # which is the best?
-        "how's it going?",  # how is it going?
-        "今天是个好日子 it's a good day",  # 今天是个好日子 it is a good day
-        # 术语
-        "such as XTTS, CosyVoice2, Fish-Speech, and F5-TTS",  # such as xtts,cosyvoice two,fish-speech,and f five-tts
-        "GPT-5-Nano is the smallest and fastest variant in the GPT-5 model family.",  # GPT-five-Nano is the smallest and fastest variant in the GPT-five model family
-        "GPT-5-Nano 是 GPT-5 模型家族中最小且速度最快的变体",  # GPT-五-Nano 是 GPT-五 系统中最小且速度最快的变体
-        "2025/09/08 IndexTTS-2 全球发布",  # 二零二五年九月八日 IndexTTS-二全球发布
-        "Here are some highly-rated M.2 NVMe SSDs: Samsung 9100 PRO PCIe 5.0 SSD M.2, $139.99",  # Here are some highly-rated M dot two NVMe SSD's, Samsung nine thousand one hundred PRO PCIE five SSD M dot two . one hundred and thirty nine dollars and ninety nine cents
-        "we dive deep into the showdown between DisplayPort 1.4 and HDMI 2.1 to determine which is the best choice for gaming enthusiasts",
-        # 人名
-        "约瑟夫·高登-莱维特（Joseph Gordon-Levitt is an American actor）",
-        "蒂莫西·唐纳德·库克（英文名：Timothy Donald Cook），通称蒂姆·库克（Tim Cook），美国商业经理、工业工程师和工业开发商，现任苹果公司首席执行官。",
-        # 长句子
-        "《盗梦空间》是由美国华纳兄弟影片公司出品的电影，由克里斯托弗·诺兰执导并编剧，莱昂纳多·迪卡普里奥、玛丽昂·歌迪亚、约瑟夫·高登-莱维特、艾利奥特·佩吉、汤姆·哈迪等联袂主演，2010年7月16日在美国上映，2010年9月1日在中国内地上映，2020年8月28日在中国内地重映。影片剧情游走于梦境与现实之间，被定义为“发生在意识结构内的当代动作科幻片”，讲述了由莱昂纳多·迪卡普里奥扮演的造梦师，带领特工团队进入他人梦境，从他人的潜意识中盗取机密，并重塑他人梦境的故事。",
-        "清晨拉开窗帘，阳光洒在窗台的Bloomixy花艺礼盒上——薰衣草香薰蜡烛唤醒嗅觉，永生花束折射出晨露般光泽。设计师将“自然绽放美学”融入每个细节：手工陶瓷花瓶可作首饰收纳，香薰精油含依兰依兰舒缓配方。限量款附赠《365天插花灵感手册》，让每个平凡日子都有花开仪式感。\n宴会厅灯光暗下的刹那，Glimmeria星月系列耳坠开始发光——瑞士冷珐琅工艺让蓝宝石如银河流动，钛合金骨架仅3.2g无负重感。设计师秘密：内置微型重力感应器，随步伐产生0.01mm振幅，打造“行走的星光”。七夕限定礼盒含星座定制铭牌，让爱意如星辰永恒闪耀。",
-        "电影1：“黑暗骑士”（演员：克里斯蒂安·贝尔、希斯·莱杰；导演：克里斯托弗·诺兰）；电影2：“盗梦空间”（演员：莱昂纳多·迪卡普里奥；导演：克里斯托弗·诺兰）；电影3：“钢琴家”（演员：艾德里安·布洛迪；导演：罗曼·波兰斯基）；电影4：“泰坦尼克号”（演员：莱昂纳多·迪卡普里奥；导演：詹姆斯·卡梅隆）；电影5：“阿凡达”（演员：萨姆·沃辛顿；导演：詹姆斯·卡梅隆）；电影6：“南方公园：大电影”（演员：马特·斯通、托马斯·艾恩格瑞；导演：特雷·帕克）",
-    ]
+    cases = REGRESSION_CASES
     # 测试分词器
     tokenizer = TextTokenizer(
         vocab_file="checkpoints/bpe.model",
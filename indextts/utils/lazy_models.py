@@ -0,0 +1,109 @@
+import gc
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import torch
+
+
+class LazyModelRegistry:
+    """
+    Registry of optional components (models, matrices) loaded on first use.
+
+    `get` loads a component under its own lock, so concurrent requests load it once. With
+    `idle_timeout`, a background thread unloads the components not used for that many
+    seconds; they are loaded again by the next `get`. A caller keeps the object it got
+    until it drops its reference, unloading only drops the registry's reference.
+
+    Args:
+        idle_timeout: seconds after the last `get` before a component is unloaded, None to keep
+            the components loaded.
+    """
+
+    def __init__(self, idle_timeout: Optional[float] = None):
+        self.idle_timeout = idle_timeout
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._objects: Dict[str, Any] = {}
+        self._last_used: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        self._stopped = threading.Event()
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks[name] = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self._loaders
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._objects
+
+    def get(self, name: str) -> Any:
+        """
+        The component `name`, loaded by its loader if needed.
+        """
+        self._last_used[name] = time.monotonic()
+        obj = self._objects.get(name)
+        if obj is not None:
+            return obj
+        with self._locks[name]:
+            obj = self._objects.get(name)
+            if obj is None:
+                start = time.perf_counter()
+                obj = self._loaders[name]()
+                self._objects[name] = obj
+                print(f">> {name} loaded on demand in {time.perf_counter() - start:.2f}s")
+            self._last_used[name] = time.monotonic()
+        self._start_reaper()
+        return obj
+
+    def unload(self, name: str, unused_since: Optional[float] = None) -> bool:
+        """
+        Unload the component `name` (only if not used since the `time.monotonic()` time
+        `unused_since`, when given). Returns whether it was unloaded.
+        """
+        with self._locks[name]:
+            if unused_since is not None and self._last_used.get(name, 0) > unused_since:
+                return False
+            obj = self._objects.pop(name, None)
+        if obj is None:
+            return False
+        del obj
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        print(f">> {name} unloaded")
+        return True
+
+    def unload_idle(self, now: Optional[float] = None) -> int:
+        """
+        Unload the components not used for `idle_timeout` seconds, returns their number.
+        """
+        if self.idle_timeout is None:
+            return 0
+        unused_since = (time.monotonic() if now is None else now) - self.idle_timeout
+        return sum(self.unload(name, unused_since) for name in list(self._objects))
+
+    def _start_reaper(self):
+        if self.idle_timeout is None or self._reaper is not None:
+            return
+        with self._lock:
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap, name="lazy-model-reaper", daemon=True)
+                self._reaper.start()
+
+    def _reap(self):
+        interval = min(max(self.idle_timeout / 4, 1.0), 60.0)
+        while not self._stopped.wait(interval):
+            self.unload_idle()
+
+    def close(self):
+        """
+        Stop the idle reaper and unload every component.
+        """
+        self._stopped.set()
+        for name in list(self._objects):
+            self.unload(name)
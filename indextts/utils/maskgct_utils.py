@@ -2,10 +2,12 @@ import torch
 import librosa
 import json5
 from huggingface_hub import hf_hub_download
-from transformers import SeamlessM4TFeatureExtractor, Wav2Vec2BertModel
+from transformers import Wav2Vec2BertModel
+from transformers.utils import logging as hf_logging
 import safetensors
 import numpy as np
 
+from indextts.utils.feature_extractors import SeamlessM4TFbankFeatures
 from indextts.utils.maskgct.models.codec.kmeans.repcodec_model import RepCodec
 from indextts.utils.maskgct.models.tts.maskgct.maskgct_s2a import MaskGCT_S2A
 from indextts.utils.maskgct.models.codec.amphion_codec.codec import CodecEncoder, CodecDecoder
@@ -84,8 +86,17 @@ class JsonHParams:
         return self.__dict__.__repr__()
 
 
-def build_semantic_model(path_='./models/tts/maskgct/ckpt/wav2vec2bert_stats.pt'):
-    semantic_model = Wav2Vec2BertModel.from_pretrained("facebook/w2v-bert-2.0")
+# w2v-bert layer of the semantic features (`hidden_states[17]` of the full 24 layer model)
+SEMANTIC_LAYER = 17
+W2V_BERT_MODEL = "facebook/w2v-bert-2.0"
+
+
+def build_semantic_model(path_='./models/tts/maskgct/ckpt/wav2vec2bert_stats.pt', output_layer=SEMANTIC_LAYER):
+    """
+    The w2v-bert encoder truncated after `output_layer` layers: its `last_hidden_state` is
+    `hidden_states[output_layer]` of the full model, the weights of the later layers are not loaded.
+    """
+    semantic_model = load_truncated_w2v_bert(W2V_BERT_MODEL, output_layer)
     semantic_model.eval()
     stat_mean_var = torch.load(path_)
     semantic_mean = stat_mean_var["mean"]
@@ -93,6 +104,21 @@ def build_semantic_model(path_='./models/tts/maskgct/ckpt/wav2vec2bert_stats.pt'
     return semantic_model, semantic_mean, semantic_std
 
 
+def load_truncated_w2v_bert(name_or_path, num_layers=SEMANTIC_LAYER):
+    verbosity = hf_logging.get_verbosity()
+    # the unused weights of the dropped layers are expected, don't list them
+    hf_logging.set_verbosity_error()
+    try:
+        return Wav2Vec2BertModel.from_pretrained(
+            name_or_path,
+            num_hidden_layers=num_layers,
+            add_adapter=False,
+            use_intermediate_ffn_before_adapter=False,
+        )
+    finally:
+        hf_logging.set_verbosity(verbosity)
+
+
 def build_semantic_codec(cfg):
     semantic_codec = RepCodec(cfg=cfg)
     semantic_codec.eval()
@@ -137,15 +163,23 @@ class Inference_Pipeline():
         self.codec_decoder = codec_decoder
         self.s2a_model_1layer = s2a_model_1layer
         self.s2a_model_full = s2a_model_full
+        self.extract_features = SeamlessM4TFbankFeatures().to(next(semantic_model.parameters()).device)
+
+    @torch.no_grad()
+    def get_speech_emb(self, speech):
+        """
+        Normalized w2v-bert features of a list of 16 kHz waveforms, padded to the longest one.
+        """
+        input_features, attention_mask = self.extract_features(speech)
+        return self.get_emb(input_features, attention_mask)
 
     @torch.no_grad()
     def get_emb(self, input_features, attention_mask):
         vq_emb = self.semantic_model(
             input_features=input_features,
             attention_mask=attention_mask,
-            output_hidden_states=True,
         )
-        feat = vq_emb.hidden_states[17]  # (B, T, C)
+        feat = vq_emb.last_hidden_state  # (B, T, C), layer 17 of the truncated model
         feat = (feat - self.semantic_mean.to(feat)) / self.semantic_std.to(feat)
         return feat
 
@@ -0,0 +1,235 @@
+import functools
+import queue
+import re
+import threading
+from typing import Iterable, Optional
+
+import torch
+
+_END = object()
+
+
+@functools.lru_cache(maxsize=None)
+def thread_local_num_threads() -> bool:
+    """
+    Whether `torch.set_num_threads` only sets the intra-op thread budget of the calling thread,
+    checked by setting it in another thread.
+
+    With ATen's OpenMP parallel backend (Linux and Windows builds) it sets the OpenMP thread count
+    of the calling thread and the thread-local MKL thread count, so threads running different
+    stages keep separate budgets for the ATen, MKL and oneDNN kernels. The native backend has one
+    process-wide pool; the pthreadpool of the XNNPACK/QNNPACK ops is process-wide in any case.
+    """
+
+    def budgets():
+        info = torch.__config__.parallel_info()
+        return torch.get_num_threads(), re.findall(r"(?:omp|mkl)_get_max_threads\(\) : (\d+)", info)
+
+    before = budgets()
+    changed, checked = threading.Event(), threading.Event()
+
+    def probe():
+        torch.set_num_threads(before[0] + 1)
+        changed.set()
+        checked.wait()
+        torch.set_num_threads(before[0])
+
+    thread = threading.Thread(target=probe, daemon=True)
+    thread.start()
+    changed.wait()
+    during = budgets()
+    checked.set()
+    thread.join()
+    return during == before
+
+
+class BackgroundStage:
+    """
+    Run a pipeline stage (an iterable) in a background thread and hand its items over
+    through a bounded queue, so the next items are produced while the consumer is
+    still processing the current one. Items are delivered in production order and
+    exceptions raised by the stage are re-raised in the consumer.
+
+    Args:
+        iterable: the stage, e.g. a generator yielding one item per unit of work.
+        maxsize: maximum number of finished items waiting in the queue.
+        num_threads: intra-op CPU thread budget of the stage thread, applied with `torch.set_num_threads`
+            from the stage thread. Only separate from the budget of the other threads with
+            `thread_local_num_threads()`. None keeps the budget of the thread creating the stage.
+    """
+
+    def __init__(self, iterable: Iterable, maxsize: int = 2, num_threads: Optional[int] = None, name: str = "stage"):
+        self._iterable = iterable
+        # 新线程按需初始化线程数，此处固定为创建线程的设置，避免受之后其他线程的修改影响
+        self._num_threads = num_threads or torch.get_num_threads()
+        self._queue = queue.Queue(maxsize=max(1, maxsize))
+        self._closed = threading.Event()
+        self._finished = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        torch.set_num_threads(self._num_threads)
+        iterator = iter(self._iterable)
+        try:
+            for item in iterator:
+                if not self._put((item, None)):
+                    break
+            else:
+                self._put((_END, None))
+        except BaseException as e:
+            self._put((_END, e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._finished:
+            raise StopIteration
+        item, error = self._queue.get()
+        if item is _END:
+            self._finished = True
+            if error is not None:
+                raise error
+            raise StopIteration
+        return item
+
+    def close(self):
+        """
+        Stop the stage: the stage thread exits after its current item.
+        """
+        self._finished = True
+        self._closed.set()
+
+
+class StreamClosed(Exception):
+    """
+    Raised inside the producer by `TokenStreamer.put` once the consumer closed the stream.
+    """
+
+
+class TokenStreamer:
+    """
+    `transformers` streamer (``generate(streamer=...)``) handing the generated tokens over to
+    the consumer thread. The first `put` (the prompt ids) is skipped, iterating yields the
+    token tensor of every generation step.
+
+    `generate()` runs in a background thread (`start`); exceptions raised there are re-raised
+    in the consumer. After `close()`, the next `put` aborts the generation.
+
+    With `record_hidden_states`, `UnifiedVoice.inference_speech(return_latent=True)` appends the
+    last hidden state of every generation step to `hidden_states` before the token is put, so
+    `hidden_states[i]` is available once the `i`-th token has been received.
+    """
+
+    def __init__(self, record_hidden_states: bool = False):
+        self.hidden_states = [] if record_hidden_states else None
+        self._queue = queue.Queue()
+        self._closed = threading.Event()
+        self._prompt_skipped = False
+        self._finished = False
+        self._thread = None
+
+    def start(self, fn, *args, **kwargs):
+        """
+        Call `fn(*args, streamer=self, **kwargs)` in a background thread.
+        """
+        def run():
+            try:
+                fn(*args, streamer=self, **kwargs)
+            except StreamClosed:
+                pass
+            except BaseException as e:
+                self.end(e)
+            else:
+                self.end()
+
+        self._thread = threading.Thread(target=run, name="indextts-token-streamer", daemon=True)
+        self._thread.start()
+        return self
+
+    def put(self, value: torch.Tensor):
+        if self._closed.is_set():
+            raise StreamClosed()
+        if not self._prompt_skipped:
+            self._prompt_skipped = True
+            return
+        self._queue.put((value, None))
+
+    def end(self, error: Optional[BaseException] = None):
+        self._queue.put((_END, error))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self._finished:
+            item, error = self._queue.get()
+            if item is _END:
+                # `generate()` calls `end()` itself, the runner ends the stream again
+                self._finished = True
+                if error is not None:
+                    raise error
+                break
+            return item
+        raise StopIteration
+
+    def close(self):
+        """
+        Stop consuming and wait for the generation thread, aborted at its next step.
+        """
+        self._finished = True
+        self._closed.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+class CrossfadeStream:
+    """
+    Join audio chunks computed with left context into a gapless stream.
+
+    Each chunk covers the samples ``[start, start + N)`` of the stream and must start at or
+    before the end of the emitted audio (its left context). The last `overlap` samples of a
+    chunk are held back and linearly crossfaded with the next chunk, which recomputes them
+    with more right context.
+    """
+
+    def __init__(self, overlap: int):
+        self.overlap = overlap
+        self.emitted = 0
+        self._tail = None
+
+    def push(self, wav: torch.Tensor, start: int, final: bool = False) -> torch.Tensor:
+        """
+        Args:
+            wav: (C, N) chunk audio.
+            start: stream position of the first sample of `wav`, ``<= self.emitted``.
+            final: emit everything, including the samples held back for the crossfade.
+
+        Returns:
+            (C, M) audio to emit, continuing the previously emitted audio.
+        """
+        assert start <= self.emitted, f"chunk starts after the emitted audio: {start} > {self.emitted}"
+        wav = wav[:, self.emitted - start:]
+        if self._tail is not None:
+            n = min(self._tail.shape[1], wav.shape[1])
+            fade_in = torch.linspace(0.0, 1.0, n + 2, device=wav.device, dtype=wav.dtype)[1:-1]
+            wav = torch.cat([self._tail[:, :n] * (1.0 - fade_in) + wav[:, :n] * fade_in, wav[:, n:]], dim=1)
+            self._tail = None
+        if not final and wav.shape[1] > self.overlap > 0:
+            wav, self._tail = wav[:, :-self.overlap], wav[:, -self.overlap:]
+        self.emitted += wav.shape[1]
+        return wav
@@ -0,0 +1,169 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import torch
+from safetensors.torch import load_file, save_file
+
+# Bump whenever the prompt feature extraction changes (audio decoding and resampling, VAD trimming,
+# fbank/mel features, the w2v-bert/semantic codec/campplus/GPT conditioning encoders), so that
+# features stored by an older pipeline are not reused.
+FEATURE_PIPELINE_VERSION = 2
+
+
+def hash_audio(audio: torch.Tensor, sampling_rate: int) -> str:
+    """
+    Hash decoded audio samples, so that the same voice uploaded under different
+    file names (e.g. API temp files) maps to the same cache entry.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(sampling_rate).encode())
+    h.update(str(tuple(audio.shape)).encode())
+    h.update(audio.detach().to("cpu", torch.float32).contiguous().numpy().tobytes())
+    return h.hexdigest()
+
+
+def tensors_nbytes(tensors: Dict[str, torch.Tensor]) -> int:
+    return sum(t.numel() * t.element_size() for t in tensors.values() if isinstance(t, torch.Tensor))
+
+
+class PromptFeatureCache:
+    """
+    Bounded LRU cache of prompt-derived tensors, keyed by `hash_audio()`.
+
+    An entry is a dict of named tensors and may be filled incrementally: an audio
+    used as emotion reference only stores `cond_emb`, and the speaker-only features
+    (`S_ref`, `style`, `prompt_condition`, `ref_mel`) are added once the same audio
+    is used as speaker prompt. Both roles share the entry.
+
+    Args:
+        max_entries: maximum number of cached prompts, ``<= 0`` disables the cache.
+        max_bytes: maximum total size of cached tensors in bytes, ``None`` for unlimited.
+    """
+
+    def __init__(self, max_entries: int = 32, max_bytes: Optional[int] = 512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Dict[str, torch.Tensor]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._nbytes = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def get(self, key: str) -> Optional[Dict[str, torch.Tensor]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def update(self, key: str, **tensors: torch.Tensor) -> Dict[str, torch.Tensor]:
+        """
+        Merge `tensors` into the entry of `key` (creating it if needed), mark it as
+        most recently used and evict least recently used entries over budget.
+        Returns the merged entry, which stays valid even if it had to be evicted.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None) or {}
+            self._nbytes -= self._sizes.pop(key, 0)
+            entry.update(tensors)
+            if self.max_entries <= 0:
+                return entry
+            size = tensors_nbytes(entry)
+            self._entries[key] = entry
+            self._sizes[key] = size
+            self._nbytes += size
+            self._evict()
+            return entry
+
+    def pop(self, key: str) -> Optional[Dict[str, torch.Tensor]]:
+        with self._lock:
+            self._nbytes -= self._sizes.pop(key, 0)
+            return self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._nbytes = 0
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self._nbytes > self.max_bytes and len(self._entries) > 1
+        ):
+            key, _ = self._entries.popitem(last=False)
+            self._nbytes -= self._sizes.pop(key, 0)
+
+
+class PromptFeatureStore:
+    """
+    Persistent prompt feature store, one safetensors file per prompt under
+    ``<root>/<version>/<key>.safetensors``.
+
+    `version` identifies the models/config the features were computed with, so
+    stale entries are never loaded after a model update. Files are written
+    atomically and can be shared between replicas (e.g. warmed offline with
+    `tools/pre_encode_voices.py`).
+    """
+
+    def __init__(self, root: str, version: str):
+        self.root = root
+        self.version = version
+        self.directory = os.path.join(root, version)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.safetensors")
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def load(self, key: str, device="cpu") -> Optional[Dict[str, torch.Tensor]]:
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            tensors = load_file(path, device="cpu")
+        except Exception as e:
+            print(f">> Failed to load prompt features from {path}: {e!r}")
+            return None
+        return {name: t.to(device) for name, t in tensors.items()}
+
+    def save(self, key: str, tensors: Dict[str, torch.Tensor]):
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        save_file({name: t.detach().to("cpu").contiguous() for name, t in tensors.items()}, tmp_path,
+                  metadata={"version": self.version})
+        os.replace(tmp_path, path)
+
+
+def feature_version(cfg, *paths: Optional[str]) -> str:
+    """
+    Version string of the prompt features: hash of `FEATURE_PIPELINE_VERSION`, the model config
+    and the path, size and modification time of every checkpoint they depend on, so that a
+    retrained checkpoint of the same size does not reuse stored features.
+    """
+    from omegaconf import OmegaConf
+
+    h = hashlib.blake2b(digest_size=8)
+    h.update(f"pipeline-{FEATURE_PIPELINE_VERSION}".encode())
+    h.update(OmegaConf.to_yaml(cfg).encode())
+    for path in paths:
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            h.update(f"{os.path.realpath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        else:
+            h.update(f"{path}:missing".encode())
+    version = str(cfg.get("version", "0"))
+    return f"v{version}-{h.hexdigest()}"
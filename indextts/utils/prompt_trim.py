@@ -0,0 +1,105 @@
+from typing import List, Optional, Tuple
+
+import torch
+import torch.nn.functional as F
+
+
+def speech_frames(audio: torch.Tensor, sampling_rate: int, frame_seconds: float = 0.025,
+                  hop_seconds: float = 0.01, threshold_db: float = -40.0, floor_db: float = -60.0) -> torch.Tensor:
+    """
+    Energy VAD: a frame is speech if its RMS level is within `threshold_db` of the loudest
+    frame and above the absolute level `floor_db` (dBFS).
+
+    Args:
+        audio: (C, N) waveform in [-1, 1], channels are averaged.
+
+    Returns:
+        (num_frames,) bool tensor, frame `i` starts at sample ``i * hop``.
+    """
+    frame = max(1, int(frame_seconds * sampling_rate))
+    hop = max(1, int(hop_seconds * sampling_rate))
+    mono = audio.float().mean(dim=0)
+    if mono.numel() < frame:
+        mono = F.pad(mono, (0, frame - mono.numel()))
+    rms = mono.unfold(0, frame, hop).pow(2).mean(dim=-1).sqrt()
+    level = 20 * torch.log10(rms.clamp(min=1e-10))
+    return (level > level.max() + threshold_db) & (level > floor_db)
+
+
+def prompt_spans(audio: torch.Tensor, sampling_rate: int, max_silence: Optional[float] = 0.3,
+                 window_seconds: Optional[float] = None, threshold_db: float = -40.0,
+                 hop_seconds: float = 0.01) -> List[Tuple[int, int]]:
+    """
+    Sample spans of a reference prompt to keep: leading/trailing silence is trimmed to
+    ``max_silence / 2`` and internal pauses longer than `max_silence` are shortened to
+    `max_silence` (None keeps the silences). With `window_seconds`, only the window of that
+    length (of the trimmed audio) with the most speech is kept.
+
+    Returns:
+        sorted, disjoint ``(start, end)`` sample spans of `audio`; the whole audio if no
+        speech is detected.
+    """
+    num_samples = audio.shape[-1]
+    hop = max(1, int(hop_seconds * sampling_rate))
+    speech = speech_frames(audio, sampling_rate, hop_seconds=hop_seconds, threshold_db=threshold_db)
+    if not bool(speech.any()):
+        return [(0, num_samples)]
+    if max_silence is None:
+        spans = [(0, num_samples)]
+    else:
+        spans = _speech_spans(speech, hop, int(max_silence / 2 * sampling_rate), num_samples)
+    if window_seconds:
+        spans = _densest_window(spans, speech, hop, int(window_seconds * sampling_rate))
+    return spans
+
+
+def _speech_spans(speech: torch.Tensor, hop: int, pad: int, num_samples: int) -> List[Tuple[int, int]]:
+    """
+    Speech regions of the frame flags `speech`, padded by `pad` samples and merged.
+    """
+    edges = torch.diff(F.pad(speech.to(torch.int8), (1, 1))).nonzero().flatten().tolist()
+    spans = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        start, end = max(0, start * hop - pad), min(num_samples, end * hop + pad)
+        if spans and start <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def _densest_window(spans: List[Tuple[int, int]], speech: torch.Tensor, hop: int,
+                    window: int) -> List[Tuple[int, int]]:
+    """
+    The `window` samples of the concatenated `spans` with the most speech frames, mapped back to
+    spans of the original audio.
+    """
+    total = sum(end - start for start, end in spans)
+    if total <= window:
+        return spans
+    # speech flag of every hop of the concatenated spans
+    flags = torch.cat([speech[start // hop:(end + hop - 1) // hop] for start, end in spans]).float()
+    frames = max(1, window // hop)
+    if flags.numel() > frames:
+        counts = F.pad(flags.cumsum(0), (1, 0))
+        density = counts[frames:] - counts[:-frames]
+        offset = min(int(density.argmax()) * hop, total - window)
+    else:
+        offset = 0
+    kept, position = [], 0
+    for start, end in spans:
+        length = end - start
+        lo, hi = max(offset, position), min(offset + window, position + length)
+        if lo < hi:
+            kept.append((start + lo - position, start + hi - position))
+        position += length
+    return kept
+
+
+def apply_spans(audio: torch.Tensor, spans: List[Tuple[int, int]]) -> torch.Tensor:
+    """
+    Concatenate the `spans` of `audio` (C, N) along the time axis.
+    """
+    if len(spans) == 1 and spans[0] == (0, audio.shape[-1]):
+        return audio
+    return torch.cat([audio[..., start:end] for start, end in spans], dim=-1)
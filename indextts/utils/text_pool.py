@@ -0,0 +1,198 @@
+import multiprocessing
+import os
+import re
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from indextts.utils.front import REGRESSION_CASES, TextNormalizer
+
+# 中文句末标点（及其后的引号、括号）作为分块边界。英文句点不作为边界（"No. 5"、"St. Louis"），
+# 后面紧跟空白的边界也不切分：分块首尾不含空白，拼接后与原文相同
+SENTENCE_END_RE = re.compile(r"[。！？!?；;…]+[”’\"')）】》]*")
+
+_worker_normalizer: Optional[TextNormalizer] = None
+
+
+def _init_worker(enable_glossary: bool, glossary: dict):
+    global _worker_normalizer
+    normalizer = TextNormalizer(enable_glossary=enable_glossary, cache_size=0)
+    normalizer.load()
+    if glossary:
+        normalizer.load_glossary(glossary)
+    _worker_normalizer = normalizer
+
+
+def _normalize_chunk(args):
+    text, use_chinese = args
+    return _worker_normalizer.try_normalize(text, use_chinese)
+
+
+def _ping(_):
+    return os.getpid()
+
+
+def split_sentences(text: str, max_chars: int = 200) -> List[str]:
+    """
+    在中文句末标点处把 `text` 切分为不超过 `max_chars` 个字符的分块（单个过长的句子不再切分），
+    各分块保留结尾的标点，拼接后与原文相同。只用于中文路由的文本。
+    """
+    if len(text) <= max_chars:
+        return [text]
+    chunks, start, chunk_start = [], 0, 0
+    for match in SENTENCE_END_RE.finditer(text):
+        end = match.end()
+        if end == len(text) or text[end].isspace():
+            continue
+        if end - chunk_start > max_chars and start > chunk_start:
+            chunks.append(text[chunk_start:start])
+            chunk_start = start
+        start = end
+    if len(text) - chunk_start > max_chars and chunk_start < start < len(text):
+        chunks.append(text[chunk_start:start])
+        chunk_start = start
+    chunks.append(text[chunk_start:])
+    return [chunk for chunk in chunks if chunk]
+
+
+class NormalizerPool:
+    """
+    多进程文本规范化服务：WeTextProcessing 的 FST normalizer 占用 CPU 且受 GIL 限制，
+    批量文本分发到多个进程并行规范化；中文长文本在句末标点处切分为分块，再按顺序拼接。
+
+    分块只用于中文路由的文本，且首次分块前用 `REGRESSION_CASES` 校验（在每个边界处切分）
+    分块规范化与整段规范化的结果逐字节一致，不一致时不分块，长文本整段规范化。
+
+    每个工作进程只加载一次 `TextNormalizer`（同步主进程的术语词汇表，词汇表修改后重启进程池）；
+    分块的语言路由沿用整段文本的判断，成功的结果写入主进程 `normalizer` 的缓存。
+    工作进程在首次并行规范化时启动（或调用 `start()`），分块数少于 `min_parallel_chunks`
+    时直接在当前进程规范化。
+
+    Args:
+        normalizer: 主进程中已加载的 `TextNormalizer`
+        num_workers: 工作进程数，None 为 CPU 核数
+        chunk_chars: 中文长文本分块的最大字符数，None 为不分块
+        min_parallel_chunks: 并行规范化的最少分块数
+    """
+
+    def __init__(self, normalizer: TextNormalizer, num_workers: Optional[int] = None,
+                 chunk_chars: Optional[int] = 200, min_parallel_chunks: int = 2):
+        self.normalizer = normalizer
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.chunk_chars = chunk_chars
+        self.min_parallel_chunks = min_parallel_chunks
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._glossary_version = None
+        self._lock = threading.Lock()
+        # 分块规范化的校验结果，None 为未校验
+        self._chunking_ok: Optional[bool] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        version = self.normalizer.glossary_version
+        with self._lock:
+            if self._executor is not None and self._glossary_version != version:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.num_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.normalizer.enable_glossary, dict(self.normalizer.term_glossary)),
+                )
+                self._glossary_version = version
+            return self._executor
+
+    def start(self):
+        """
+        启动全部工作进程并加载 normalizer，避免首个长文本请求承担启动耗时
+        """
+        if self.num_workers > 1:
+            list(self._get_executor().map(_ping, range(self.num_workers)))
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def normalize(self, text: str) -> str:
+        return self.normalize_many([text])[0]
+
+    def normalize_many(self, texts: List[str]) -> List[str]:
+        """
+        规范化 `texts`，结果与逐条调用 `normalizer.normalize` 的顺序一致
+        """
+        # (文本序号, 分块, 语言路由)
+        chunks = []
+        for i, text in enumerate(texts):
+            use_chinese = self.normalizer.use_chinese(text)
+            if use_chinese and self.chunk_chars and len(text) > self.chunk_chars and self._check_chunking():
+                chunks.extend((i, piece, use_chinese) for piece in split_sentences(text, self.chunk_chars))
+            else:
+                chunks.append((i, text, use_chinese))
+        if self.num_workers <= 1 or len(chunks) < self.min_parallel_chunks:
+            results = [self.normalizer.normalize(text, use_chinese) for _, text, use_chinese in chunks]
+        else:
+            results = self._normalize_parallel([(text, use_chinese) for _, text, use_chinese in chunks])
+        outputs = [[] for _ in texts]
+        for (i, _, _), result in zip(chunks, results):
+            outputs[i].append(result)
+        return ["".join(parts) for parts in outputs]
+
+    def _check_chunking(self) -> bool:
+        """
+        校验在每个边界处切分的 `REGRESSION_CASES` 规范化后拼接，与整段规范化的结果逐字节一致
+        """
+        if self._chunking_ok is None:
+            ok = True
+            for case in REGRESSION_CASES:
+                if not self.normalizer.use_chinese(case):
+                    continue
+                pieces = split_sentences(case, 1)
+                if len(pieces) == 1:
+                    continue
+                expected = self.normalizer.normalize(case, True)
+                actual = "".join(self.normalizer.normalize(piece, True) for piece in pieces)
+                if actual != expected:
+                    print(f">> Chunked text normalization disabled, self check failed on: {case}")
+                    ok = False
+                    break
+            self._chunking_ok = ok
+        return self._chunking_ok
+
+    def _normalize_parallel(self, jobs):
+        cache = self.normalizer.cache
+        keys = [self.normalizer.cache_key(text, use_chinese) for text, use_chinese in jobs]
+        results = [cache.get(key) for key in keys]
+        # 相同的分块只规范化一次
+        missing = {}
+        for index, (key, result) in enumerate(zip(keys, results)):
+            if result is None:
+                missing.setdefault(key, []).append(index)
+        if not missing:
+            return results
+        pending = [jobs[indices[0]] for indices in missing.values()]
+        try:
+            executor = self._get_executor()
+            chunksize = max(1, len(pending) // (self.num_workers * 4))
+            normalized = list(executor.map(_normalize_chunk, pending, chunksize=chunksize))
+        except Exception:
+            print(">> Parallel text normalization failed, falling back to the current process.")
+            print(traceback.format_exc())
+            self.close()
+            # normalize 自行缓存成功的结果
+            normalized = [(self.normalizer.normalize(text, use_chinese), False) for text, use_chinese in pending]
+        for (key, indices), (result, ok) in zip(missing.items(), normalized):
+            if ok:
+                cache.put(key, result)
+            for index in indices:
+                results[index] = result
+        return results
@@ -0,0 +1,65 @@
+import sys
+import time
+
+import torch
+
+from indextts.s2mel.modules.bigvgan.bigvgan import BigVGAN
+from indextts.s2mel.modules.bigvgan.env import AttrDict
+
+if __name__ == "__main__":
+    """
+    Check that `BigVGAN.decode_batch` gives the same waveforms as vocoding the mels one by one.
+    Without a model name, a randomly initialized vocoder with the `bigvgan_v2_22khz_80band_256x`
+    architecture (fewer channels) is used: the padding only matters through the receptive field.
+    ```
+    python tests/bigvgan_batch_test.py
+    python tests/bigvgan_batch_test.py nvidia/bigvgan_v2_22khz_80band_256x
+    ```
+    """
+    torch.manual_seed(0)
+    if len(sys.argv) > 1:
+        model = BigVGAN.from_pretrained(sys.argv[1], use_cuda_kernel=False)
+    else:
+        h = AttrDict(dict(
+            resblock="1", num_mels=80, hop_size=256, sampling_rate=22050,
+            upsample_rates=[4, 4, 2, 2, 2, 2], upsample_kernel_sizes=[8, 8, 4, 4, 4, 4], upsample_initial_channel=256,
+            resblock_kernel_sizes=[3, 7, 11], resblock_dilation_sizes=[[1, 3, 5], [1, 3, 5], [1, 3, 5]],
+            activation="snakebeta", snake_logscale=True, use_tanh_at_final=False, use_bias_at_final=False,
+        ))
+        model = BigVGAN(h, use_cuda_kernel=False)
+    model.remove_weight_norm()
+    model.eval()
+
+    context = model.receptive_field_frames()
+    # the bound must cover the frames actually affected by what follows the end of a mel
+    x = torch.randn(1, 80, 4 * context) * 2 - 5
+    y = x.clone()
+    y[..., 2 * context:] += 3
+    with torch.no_grad():
+        changed = ((model(x) - model(y)).abs()[0, 0] > 0).nonzero()[0].item()
+    reach = 2 * context - changed / model.h.hop_size
+    print(f">> receptive field bound: {context} frames, measured: {reach:.1f} frames")
+    assert reach <= context
+
+    # log mels of different lengths, including shorter ones than the re-vocoded tail window,
+    # and of near-equal lengths (the segments of a bucket)
+    tolerance = 1e-5
+    for name, lengths in [("mixed", [430, 300, 251, 250, 120, 2 * context, context + 1, 30]),
+                          ("near-equal", [430, 425, 420, 418, 410, 400, 396, 390])]:
+        mels = [torch.randn(1, 80, n) * 2 - 6 for n in lengths]
+        with torch.no_grad():
+            model(mels[-1])  # warm-up
+            start = time.perf_counter()
+            expected = [model(mel)[0] for mel in mels]
+            single_time = time.perf_counter() - start
+            for max_batch_frames in (0, None, 2048):
+                start = time.perf_counter()
+                wavs = model.decode_batch(mels, max_batch_frames=max_batch_frames)
+                batch_time = time.perf_counter() - start
+                for n, wav, ref in zip(lengths, wavs, expected):
+                    assert wav.shape == ref.shape, (n, wav.shape, ref.shape)
+                    diff = (wav - ref).abs().max().item()
+                    assert diff < tolerance, f"{n} frames: max abs diff {diff} >= {tolerance}"
+                print(f">> {name}, max_batch_frames={max_batch_frames}: "
+                      f"one by one {single_time:.2f}s, decode_batch {batch_time:.2f}s")
+    print(">> decode_batch matches the unbatched vocoder")
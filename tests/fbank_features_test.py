@@ -0,0 +1,71 @@
+import glob
+import sys
+import time
+
+import numpy as np
+import torch
+from transformers import SeamlessM4TFeatureExtractor
+
+from indextts.utils.audio_ingest import decode_audio, resample
+from indextts.utils.feature_extractors import SeamlessM4TFbankFeatures
+
+if __name__ == "__main__":
+    """
+    Check the torch w2v-bert front-end against the HuggingFace `SeamlessM4TFeatureExtractor`,
+    one utterance at a time and batched with padding.
+    ```
+    python tests/fbank_features_test.py
+    python tests/fbank_features_test.py prompt1.wav prompt2.wav --device cuda
+    ```
+    """
+    args = sys.argv[1:]
+    device = "cpu"
+    if "--device" in args:
+        device = args.pop(args.index("--device") + 1)
+        args.remove("--device")
+    paths = args or sorted(glob.glob("examples/*.wav")) + glob.glob("tests/sample_prompt.wav")
+    waveforms = []
+    for path in paths:
+        audio, sr = decode_audio(path)
+        waveforms.append(resample(audio, sr, 16000)[0].numpy())
+    if not waveforms:
+        print(">> no audio found in examples/, using synthetic speech-like signals")
+        rng = np.random.default_rng(0)
+        for seconds in (15, 7.3, 3.1, 1.0):
+            t = np.arange(int(seconds * 16000)) / 16000
+            envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)
+            waveforms.append((0.3 * envelope * np.sin(2 * np.pi * 180 * t * (1 + 0.1 * np.sin(t)))
+                              + 0.01 * rng.standard_normal(t.size)).astype(np.float32))
+
+    hf_extractor = SeamlessM4TFeatureExtractor()
+    extractor = SeamlessM4TFbankFeatures().to(device)
+    tolerance = 1e-3
+
+    def compare(batch):
+        expected = hf_extractor(batch, sampling_rate=16000, return_tensors="pt", padding=True)
+        input_features, attention_mask = extractor(batch)
+        assert input_features.shape == expected["input_features"].shape, (input_features.shape, expected["input_features"].shape)
+        assert torch.equal(attention_mask.cpu(), expected["attention_mask"]), "attention mask mismatch"
+        diff = (input_features.cpu() - expected["input_features"]).abs().max().item()
+        assert diff < tolerance, f"max abs diff {diff} >= {tolerance}"
+        return diff
+
+    for i, waveform in enumerate(waveforms):
+        print(f"utterance {i}: {waveform.size / 16000:.2f}s, max abs diff {compare([waveform]):.2e}")
+    print(f"batch of {len(waveforms)}: max abs diff {compare(waveforms):.2e}")
+
+    repeat = 10
+    start = time.perf_counter()
+    for _ in range(repeat):
+        hf_extractor(waveforms, sampling_rate=16000, return_tensors="pt", padding=True)
+    hf_time = (time.perf_counter() - start) / repeat
+    extractor(waveforms)
+    if device.startswith("cuda"):
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        extractor(waveforms)
+    if device.startswith("cuda"):
+        torch.cuda.synchronize()
+    torch_time = (time.perf_counter() - start) / repeat
+    print(f"HuggingFace: {hf_time * 1000:.1f} ms, torch ({device}): {torch_time * 1000:.1f} ms")
@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+
+import torch
+from omegaconf import OmegaConf
+
+from indextts.gpt.model_v2 import UnifiedVoice
+from indextts.utils.checkpoint import load_checkpoint
+from indextts.utils.pipeline import TokenStreamer
+
+if __name__ == "__main__":
+    """
+    Check that the GPT latents recorded during generation (`inference_speech(return_latent=True)`)
+    are the latents of the `UnifiedVoice.forward()` pass over the generated codes, which the s2mel
+    model was trained on: sampling, a left-padded batch, beam search and chunks gathered while streaming.
+    Without a model directory, a small randomly initialized GPT is used.
+    ```
+    python tests/gpt_latent_test.py
+    python tests/gpt_latent_test.py checkpoints
+    ```
+    """
+    torch.manual_seed(0)
+    if len(sys.argv) > 1:
+        cfg = OmegaConf.load(os.path.join(sys.argv[1], "config.yaml"))
+        gpt = UnifiedVoice(**cfg.gpt)
+        load_checkpoint(gpt, os.path.join(sys.argv[1], cfg.gpt_checkpoint))
+        tolerance = 1e-3
+    else:
+        module = dict(output_size=64, linear_units=128, attention_heads=4, num_blocks=1,
+                      input_layer="conv2d2", perceiver_mult=2)
+        gpt = UnifiedVoice(layers=2, model_dim=64, heads=4, max_text_tokens=60, max_mel_tokens=100,
+                           number_text_tokens=100, condition_type="conformer_perceiver",
+                           condition_module=module, emo_condition_module=module)
+        tolerance = 1e-4
+    gpt.eval()
+    gpt.post_init_gpt2_config(use_deepspeed=False, kv_cache=True, half=False)
+
+    cond = torch.randn(1, 60, 1024)
+    cond_lengths = torch.tensor([cond.shape[1]])
+    texts = [torch.randint(2, 100, (n,)) for n in (16, 9)]
+    with torch.no_grad():
+        speech_conditioning_latent = gpt.get_conditioning(cond.transpose(1, 2), cond_lengths)
+        emo_vec = gpt.emo_layer(gpt.emovec_layer(gpt.get_emo_conditioning(cond.transpose(1, 2), cond_lengths)))
+
+        def check(name, text_list, **kwargs):
+            text_inputs = torch.nn.utils.rnn.pad_sequence(text_list, batch_first=True, padding_value=gpt.stop_text_token)
+            codes, _, latent = gpt.inference_speech(cond, text_inputs, cond, cond_lengths=cond_lengths,
+                                                    emo_cond_lengths=cond_lengths, emo_vec=emo_vec,
+                                                    speech_conditioning_latent=speech_conditioning_latent,
+                                                    max_generate_length=40, return_latent=True, **kwargs)
+            diff = 0.0
+            for i, text in enumerate(text_list):
+                code = codes[i]
+                length = (code == gpt.stop_mel_token).nonzero()
+                length = length[0].item() if length.numel() else len(code)
+                expected = gpt(speech_conditioning_latent, text.unsqueeze(0), torch.tensor([len(text)]),
+                               code[:length].unsqueeze(0), torch.tensor([length]), cond,
+                               cond_mel_lengths=cond_lengths, emo_cond_mel_lengths=cond_lengths,
+                               emo_vec=emo_vec, use_speed=torch.zeros(1, dtype=torch.long))
+                diff = max(diff, (latent[i:i + 1, :length] - expected).abs().max().item())
+            print(f">> {name}: {codes.shape[1]} codes, max abs diff {diff:.2e}")
+            assert diff < tolerance, f"{name}: max abs diff {diff} >= {tolerance}"
+
+        check("sampling", texts[:1], do_sample=True, top_k=30, top_p=0.8, temperature=0.8, num_beams=1)
+        check("batch", texts, do_sample=True, top_k=30, top_p=0.8, temperature=0.8, num_beams=1)
+        check("beam search", texts[:1], do_sample=True, top_k=30, top_p=0.8, temperature=0.8, num_beams=3)
+
+        # streaming: the latents of each chunk of codes are gathered from the hidden states recorded so far
+        chunk_tokens = 8
+        text = texts[0].unsqueeze(0)
+        streamer = TokenStreamer(record_hidden_states=True).start(
+            gpt.inference_speech, cond, text, cond, cond_lengths=cond_lengths, emo_cond_lengths=cond_lengths,
+            emo_vec=emo_vec, speech_conditioning_latent=speech_conditioning_latent, max_generate_length=40,
+            return_latent=True, do_sample=True, top_k=30, top_p=0.8, temperature=0.8, num_beams=1)
+        codes, chunks, forward_time, gather_time = [], [], 0.0, 0.0
+        try:
+            for token in streamer:
+                token = token.view(-1)[0].item()
+                if token == gpt.stop_mel_token:
+                    break
+                codes.append(token)
+                if len(codes) % chunk_tokens == 0:
+                    start = time.perf_counter()
+                    chunks.append(gpt.final_norm(torch.stack(streamer.hidden_states[len(codes) - chunk_tokens:len(codes)], dim=1)))
+                    gather_time += time.perf_counter() - start
+                    # the former approach: a forward pass over the whole code prefix for every chunk
+                    start = time.perf_counter()
+                    gpt(speech_conditioning_latent, text, torch.tensor([text.shape[1]]), torch.tensor([codes]),
+                        torch.tensor([len(codes)]), cond, cond_mel_lengths=cond_lengths, emo_cond_mel_lengths=cond_lengths,
+                        emo_vec=emo_vec, use_speed=torch.zeros(1, dtype=torch.long))
+                    forward_time += time.perf_counter() - start
+        finally:
+            streamer.close()
+        length = len(chunks) * chunk_tokens
+        expected = gpt(speech_conditioning_latent, text, torch.tensor([text.shape[1]]), torch.tensor([codes[:length]]),
+                       torch.tensor([length]), cond, cond_mel_lengths=cond_lengths, emo_cond_mel_lengths=cond_lengths,
+                       emo_vec=emo_vec, use_speed=torch.zeros(1, dtype=torch.long))
+        diff = (torch.cat(chunks, dim=1) - expected).abs().max().item()
+        print(f">> streaming: {len(chunks)} chunks, max abs diff {diff:.2e}, "
+              f"gather {gather_time * 1000:.1f} ms vs forward per chunk {forward_time * 1000:.1f} ms")
+        assert diff < tolerance, f"streaming: max abs diff {diff} >= {tolerance}"
+    print(">> the generated latents match UnifiedVoice.forward()")
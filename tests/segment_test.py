@@ -0,0 +1,127 @@
+import random
+import warnings
+from typing import List
+
+from indextts.utils.front import TextTokenizer
+
+
+def legacy_split_segments_by_token(
+    tokenized_str: List[str],
+    split_tokens: List[str],
+    max_text_tokens_per_segment: int,
+    quick_streaming_tokens: int = 0
+) -> List[List[str]]:
+    """
+    The recursive segmenter replaced by `TextTokenizer.split_segment_ranges` (kept verbatim as reference).
+    """
+    if len(tokenized_str) == 0:
+        return []
+    segments: List[List[str]] = []
+    current_segment = []
+    current_segment_tokens_len = 0
+    for i in range(len(tokenized_str)):
+        token = tokenized_str[i]
+        current_segment.append(token)
+        current_segment_tokens_len += 1
+        if not  ("," in split_tokens or "▁," in split_tokens ) and ("," in current_segment or "▁," in current_segment):
+            sub_segments = legacy_split_segments_by_token(
+                current_segment, [",", "▁,"], max_text_tokens_per_segment=max_text_tokens_per_segment, quick_streaming_tokens = quick_streaming_tokens
+            )
+        elif "-" not in split_tokens and "-" in current_segment:
+            sub_segments = legacy_split_segments_by_token(
+                current_segment, ["-"], max_text_tokens_per_segment=max_text_tokens_per_segment, quick_streaming_tokens = quick_streaming_tokens
+            )
+        elif current_segment_tokens_len <= max_text_tokens_per_segment:
+            if token in split_tokens and current_segment_tokens_len > 2:
+                if i < len(tokenized_str) - 1:
+                    if tokenized_str[i + 1] in ["'", "▁'"]:
+                        current_segment.append(tokenized_str[i + 1])
+                        i += 1
+                segments.append(current_segment)
+                current_segment = []
+                current_segment_tokens_len = 0
+            continue
+        else:
+            sub_segments = []
+            for j in range(0, len(current_segment), max_text_tokens_per_segment):
+                if j + max_text_tokens_per_segment < len(current_segment):
+                    sub_segments.append(current_segment[j : j + max_text_tokens_per_segment])
+                else:
+                    sub_segments.append(current_segment[j:])
+        segments.extend(sub_segments)
+        current_segment = []
+        current_segment_tokens_len = 0
+    if current_segment_tokens_len > 0:
+        assert current_segment_tokens_len <= max_text_tokens_per_segment
+        segments.append(current_segment)
+    merged_segments = []
+    total_token = 0
+    for segment in segments:
+        total_token += len(segment)
+        if len(segment) == 0:
+            continue
+        if len(merged_segments) == 0:
+            merged_segments.append(segment)
+        elif len(merged_segments[-1]) + len(segment) <= max_text_tokens_per_segment and total_token > quick_streaming_tokens:
+            merged_segments[-1] = merged_segments[-1] + segment
+        elif len(merged_segments[-1]) + len(segment) <= max_text_tokens_per_segment / 2:
+            merged_segments[-1] = merged_segments[-1] + segment
+        else:
+            merged_segments.append(segment)
+    return merged_segments
+
+
+VOCAB = ["a", "b", "c", "▁d", *TextTokenizer.punctuation_marks_tokens, *TextTokenizer.comma_tokens,
+         *TextTokenizer.hyphen_tokens, *TextTokenizer.apostrophe_tokens]
+TOKEN_ID = {token: i for i, token in enumerate(VOCAB)}
+ID_SETS = [frozenset(TOKEN_ID[t] for t in tokens) for tokens in (
+    TextTokenizer.punctuation_marks_tokens, TextTokenizer.comma_tokens,
+    TextTokenizer.hyphen_tokens, TextTokenizer.apostrophe_tokens)]
+
+
+def segment(tokens, max_tokens, quick_tokens):
+    ids = [TOKEN_ID[t] for t in tokens]
+    ranges = TextTokenizer.split_segment_ranges(ids, *ID_SETS, max_text_tokens_per_segment=max_tokens,
+                                                quick_streaming_tokens=quick_tokens)
+    return [tokens[start:end] for start, end in ranges]
+
+
+def random_tokens(rng, length, apostrophe_after_sentence_end):
+    weights = [6 if t in ("a", "b", "c", "▁d") else 1 for t in VOCAB]
+    tokens = []
+    while len(tokens) < length:
+        token = rng.choices(VOCAB, weights)[0]
+        if not apostrophe_after_sentence_end and token in TextTokenizer.apostrophe_tokens \
+                and tokens and tokens[-1] in TextTokenizer.punctuation_marks_tokens:
+            continue
+        tokens.append(token)
+    return tokens
+
+
+if __name__ == "__main__":
+    """
+    Property test of the single-pass segmenter against the legacy recursive `split_segments_by_token`.
+    ```
+    python tests/segment_test.py
+    ```
+    """
+    rng = random.Random(0)
+    warnings.simplefilter("ignore", RuntimeWarning)
+    num_cases = 20000
+    for case in range(num_cases):
+        tokens = random_tokens(rng, rng.randint(0, 300), apostrophe_after_sentence_end=False)
+        max_tokens = rng.randint(1, 40)
+        quick_tokens = rng.choice([0, 0, rng.randint(1, 60)])
+        expected = legacy_split_segments_by_token(tokens, TextTokenizer.punctuation_marks_tokens, max_tokens,
+                                                  quick_tokens)
+        assert segment(tokens, max_tokens, quick_tokens) == expected, (tokens, max_tokens, quick_tokens)
+
+    # The legacy segmenter also appended an apostrophe following a sentence end to the next segment
+    # (its `i += 1` skip had no effect): the apostrophe now only ends the current segment.
+    for case in range(num_cases):
+        tokens = random_tokens(rng, rng.randint(0, 300), apostrophe_after_sentence_end=True)
+        max_tokens = rng.randint(1, 40)
+        segments = segment(tokens, max_tokens, 0)
+        assert [t for s in segments for t in s] == tokens, tokens
+        assert all(0 < len(s) <= max_tokens + 1 for s in segments), (tokens, max_tokens)
+    print(f">> {2 * num_cases} random cases passed")
@@ -0,0 +1,45 @@
+from indextts.utils.front import REGRESSION_CASES, TextNormalizer
+from indextts.utils.text_pool import NormalizerPool, split_sentences
+
+if __name__ == "__main__":
+    """
+    Check that the parallel text normalization (`NormalizerPool.normalize_many`) gives byte for byte
+    the same results as `TextNormalizer.normalize` on the `REGRESSION_CASES`, with the Chinese texts
+    split at every sentence boundary. Requires WeTextProcessing (or wetext).
+    ```
+    python tests/text_pool_test.py
+    ```
+    """
+    # the chunks are slices of the text: no whitespace at a boundary, English periods are not boundaries
+    for text in REGRESSION_CASES + ["第一段。\n第二段！ 第三段“引号。”结束；下一句", "No. 5 beat St. Louis vs. 3. Next sentence."]:
+        pieces = split_sentences(text, 1)
+        assert "".join(pieces) == text, pieces
+        assert all(piece == piece.strip() for piece in pieces[1:-1]), pieces
+        assert not any(piece[-1].isspace() for piece in pieces[:-1]), pieces
+    assert split_sentences("No. 5 beat St. Louis vs. 3. Next sentence.", 1) == ["No. 5 beat St. Louis vs. 3. Next sentence."]
+
+    reference = TextNormalizer(enable_glossary=True, cache_size=0)
+    reference.load()
+    expected = [reference.normalize(text) for text in REGRESSION_CASES]
+
+    # chunked normalization of every case, reported whether or not the pool enables it
+    mismatches = 0
+    for text, result in zip(REGRESSION_CASES, expected):
+        if not reference.use_chinese(text):
+            continue
+        pieces = split_sentences(text, 1)
+        chunked = "".join(reference.normalize(piece, True) for piece in pieces)
+        if len(pieces) > 1 and chunked != result:
+            mismatches += 1
+            print(f"Chunked mismatch: `{text}`\n  whole:   {result}\n  chunked: {chunked}")
+    print(f">> chunked mismatches: {mismatches}/{len(REGRESSION_CASES)}")
+
+    normalizer = TextNormalizer(enable_glossary=True)
+    normalizer.load()
+    with NormalizerPool(normalizer, num_workers=2, chunk_chars=1) as pool:
+        outputs = pool.normalize_many(REGRESSION_CASES)
+        print(">> chunking:", "enabled" if pool._chunking_ok else "disabled")
+        assert pool._chunking_ok == (mismatches == 0)
+    for text, output, result in zip(REGRESSION_CASES, outputs, expected):
+        assert output == result, f"`{text}`\n  normalize:      {result}\n  normalize_many: {output}"
+    print(">> normalize_many matches TextNormalizer.normalize")
@@ -0,0 +1,45 @@
+import re
+
+import torch
+
+from indextts.utils.pipeline import BackgroundStage, thread_local_num_threads
+
+if __name__ == "__main__":
+    """
+    Check that the intra-op thread budgets of the pipelined GPT and s2mel stages are separate:
+    the budget set in the stage thread is not changed by the consumer thread and vice versa.
+    ```
+    python tests/thread_budget_test.py
+    ```
+    """
+
+    def budgets():
+        info = torch.__config__.parallel_info()
+        return [torch.get_num_threads()] + [int(n) for n in re.findall(r"(?:omp|mkl)_get_max_threads\(\) : (\d+)", info)]
+
+    print(torch.__config__.parallel_info())
+    if not thread_local_num_threads():
+        print(">> torch.set_num_threads is process-wide with this build, the stage budgets are ignored")
+        raise SystemExit(0)
+
+    torch.set_num_threads(3)
+
+    def stage():
+        for _ in range(3):
+            torch.mm(torch.randn(256, 256), torch.randn(256, 256))
+            yield budgets()
+
+    observed = []
+    consumer = []
+    for item in BackgroundStage(stage(), maxsize=1, num_threads=2):
+        observed.append(item)
+        # the consumer changes its own budget while the stage is running
+        torch.set_num_threads(5)
+        consumer.append(budgets())
+    print("stage budgets (ATen, OpenMP, MKL):", observed)
+    print("consumer budgets (ATen, OpenMP, MKL):", consumer)
+    assert all(b == [2] * len(b) for b in observed), observed
+    assert all(b == [5] * len(b) for b in consumer), consumer
+    # without a budget, the stage keeps the budget of the thread creating it
+    assert all(b == [5] * len(b) for b in BackgroundStage(stage(), maxsize=1)), "stage budget changed"
+    print(">> the stage budgets are per thread")
@@ -0,0 +1,80 @@
+"""
+Benchmark the per-prompt audio ingest of IndexTTS2: the previous path (`librosa.load` resampling to
+22.05 kHz, then freshly constructed `Resample` transforms for the 16 kHz and 22.05 kHz views)
+against `indextts.utils.audio_ingest` (one native-rate decode, cached resampling kernels).
+
+Without audio files, synthetic 15 s wav files are written for a few common sampling rates.
+
+    uv run tools/benchmark_audio_ingest.py examples/voice_01.wav examples/voice_02.wav
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+
+def legacy_ingest(path):
+    import librosa
+    import torch
+    import torchaudio
+
+    audio, sr = librosa.load(path)
+    audio = torch.tensor(audio).unsqueeze(0)
+    audio_16k = torchaudio.transforms.Resample(sr, 16000)(audio)
+    audio_22k = torchaudio.transforms.Resample(sr, 22050)(audio)
+    return audio_16k, audio_22k
+
+
+def cached_ingest(path):
+    from indextts.utils.audio_ingest import AudioClip
+
+    clip = AudioClip.load(path)
+    return clip.at(16000), clip.at(22050)
+
+
+def synthetic_prompts(directory, seconds=15):
+    import numpy as np
+    import soundfile
+
+    paths = []
+    rng = np.random.default_rng(0)
+    for sr in (16000, 24000, 44100, 48000):
+        t = np.arange(int(seconds * sr)) / sr
+        audio = 0.3 * np.sin(2 * np.pi * 220 * t) * (1 + np.sin(2 * np.pi * 3 * t)) / 2
+        audio = (audio + 0.01 * rng.standard_normal(t.shape)).astype(np.float32)
+        path = os.path.join(directory, f"prompt_{sr}.wav")
+        soundfile.write(path, audio, sr)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the per-prompt audio ingest",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("prompts", type=str, nargs="*", help="Reference audio files, default: synthetic wav files")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per prompt and path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        prompts = args.prompts or synthetic_prompts(directory)
+        print(f"{'prompt':<32}{'legacy(ms)':>12}{'cached(ms)':>12}{'speedup':>10}")
+        for path in prompts:
+            times = {}
+            for name, ingest in (("legacy", legacy_ingest), ("cached", cached_ingest)):
+                ingest(path)  # warm up (file cache, kernels of the cached path)
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    ingest(path)
+                times[name] = (time.perf_counter() - start) / args.repeat
+            print(f"{os.path.basename(path)[-32:]:<32}{times['legacy'] * 1000:>12.1f}{times['cached'] * 1000:>12.1f}"
+                  f"{times['legacy'] / times['cached']:>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Microbenchmark of the s2mel CFM Euler loop: the workspace implementation of `BASECFM.solve`
+against the previous loop, which stacked fresh conditional/null copies on every step and kept
+every intermediate state in a `sol` list.
+
+Each variant runs in its own process and reports the time per step and the peak memory
+(CUDA: `max_memory_allocated`, CPU: peak RSS growth during the solves, sampled every ms).
+The DiT is randomly initialized from the config, `--null_estimator` replaces it by a zero-cost
+estimator to expose the loop overhead itself.
+
+    uv run tools/benchmark_cfm_loop.py --seconds 30 --device cuda
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+MEL_FRAMES_PER_SECOND = 22050 / 256
+
+
+def current_rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class PeakRSSSampler:
+    """Peak RSS growth of the process while in the context (Linux)."""
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.peak = 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss() - self.base)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.base = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def legacy_solve_euler(cfm, x, x_lens, prompt, mu, style, t_span, inference_cfg_rate):
+    """The Euler loop before the workspace implementation."""
+    import torch
+
+    t = t_span[0]
+    sol = []
+    prompt_len = prompt.size(-1)
+    prompt_x = torch.zeros_like(x)
+    prompt_x[..., :prompt_len] = prompt[..., :prompt_len]
+    x[..., :prompt_len] = 0
+    B = x.size(0)
+    stacked_x_lens = torch.cat([x_lens, x_lens], dim=0)
+    for step in range(1, len(t_span)):
+        dt = t_span[step] - t_span[step - 1]
+        stacked_prompt_x = torch.cat([prompt_x, torch.zeros_like(prompt_x)], dim=0)
+        stacked_style = torch.cat([style, torch.zeros_like(style)], dim=0)
+        stacked_mu = torch.cat([mu, torch.zeros_like(mu)], dim=0)
+        stacked_x = torch.cat([x, x], dim=0)
+        stacked_dphi_dt = cfm.estimator(stacked_x, stacked_prompt_x, stacked_x_lens, t.expand(2 * B),
+                                        stacked_style, stacked_mu)
+        dphi_dt, cfg_dphi_dt = stacked_dphi_dt.chunk(2, dim=0)
+        dphi_dt = (1.0 + inference_cfg_rate) * dphi_dt - inference_cfg_rate * cfg_dphi_dt
+        x = x + dt * dphi_dt
+        t = t + dt
+        sol.append(x)
+        x[:, :, :prompt_len] = 0
+    return sol[-1]
+
+
+def run_variant(variant, args, queue):
+    import torch
+    from omegaconf import OmegaConf
+    from indextts.s2mel.modules.flow_matching import CFM
+
+    torch.manual_seed(0)
+    device = torch.device(args.device)
+    cfg = OmegaConf.load(args.config)
+    cfm = CFM(cfg.s2mel).eval().to(device)
+    cfm.estimator.setup_caches(max_batch_size=1, max_seq_length=8192)
+    if args.null_estimator:
+        class NullEstimator(torch.nn.Module):
+            def forward(self, x, *args, **kwargs):
+                return x.clone()
+
+        cfm.estimator = NullEstimator()
+
+    prompt_frames = int(args.prompt_seconds * MEL_FRAMES_PER_SECOND)
+    T = prompt_frames + int(args.seconds * MEL_FRAMES_PER_SECOND)
+    prompt = torch.randn(1, 80, prompt_frames, device=device)
+    style = torch.randn(1, 192, device=device)
+    mu = torch.randn(1, T, cfg.s2mel.DiT.content_dim, device=device)
+    x_lens = torch.tensor([T], device=device)
+    t_span = torch.linspace(0, 1, args.steps + 1, device=device)
+
+    def solve():
+        x = torch.randn(1, 80, T, device=device)
+        with torch.inference_mode():
+            if variant == "legacy":
+                return legacy_solve_euler(cfm, x, x_lens, prompt, mu.clone(), style, t_span, args.inference_cfg_rate)
+            return cfm.solve(x, x_lens, prompt, mu.clone(), style, None, t_span, args.inference_cfg_rate,
+                             progress=False)
+
+    solve()  # warm up
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+    with PeakRSSSampler() as sampler:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            solve()
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        elapsed = time.perf_counter() - start
+    if device.type == "cuda":
+        peak = torch.cuda.max_memory_allocated() / 2 ** 20
+    else:
+        peak = sampler.peak / 2 ** 20
+    per_step = elapsed / args.repeat / args.steps
+    queue.put((variant, T, per_step, peak))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Microbenchmark of the s2mel CFM Euler loop",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--config", type=str, default="checkpoints/config.yaml", help="Model config")
+    parser.add_argument("--device", type=str, default="cpu", help="Device (cpu, cuda)")
+    parser.add_argument("--seconds", type=float, default=30, help="Segment length in seconds")
+    parser.add_argument("--prompt_seconds", type=float, default=10, help="Reference prompt length in seconds")
+    parser.add_argument("--steps", type=int, default=25, help="Euler steps")
+    parser.add_argument("--inference_cfg_rate", type=float, default=0.7, help="CFG rate")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed solves per variant")
+    parser.add_argument("--null_estimator", action="store_true", default=False, help="Measure the loop overhead only")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    unit = "MiB (CUDA allocated)" if args.device.startswith("cuda") else "MiB (RSS growth)"
+    print(f"{'variant':<10}{'frames':>8}{'ms/step':>12}{'peak':>10}  {unit}")
+    for variant in ("legacy", "workspace"):
+        process = ctx.Process(target=run_variant, args=(variant, args, queue))
+        process.start()
+        variant, T, per_step, peak = queue.get()
+        process.join()
+        print(f"{variant:<10}{T:>8}{per_step * 1000:>12.2f}{peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
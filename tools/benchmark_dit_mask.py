@@ -0,0 +1,112 @@
+"""
+Benchmark the attention mask of the s2mel DiT: the dense (N, 1, T, T) mask and the eagerly
+allocated causal mask of `setup_caches`, against the key-padding mask (N, 1, 1, T), which is
+dropped altogether for an unpadded batch.
+
+Each variant runs in its own process on a randomly initialized DiT with the guided batch of a
+solver step (conditional + null rows) and reports the time per DiT evaluation and the peak memory
+of `setup_caches` plus the evaluations (CUDA: `max_memory_allocated`, CPU: peak RSS growth,
+sampled every ms). `--padded` halves the last segment of the batch, as in a batch of segments of different lengths.
+
+    uv run tools/benchmark_dit_mask.py --seconds 30 --device cuda
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+sys.path.append(os.path.dirname(current_dir))
+
+from benchmark_cfm_loop import MEL_FRAMES_PER_SECOND, PeakRSSSampler
+
+
+def run_variant(variant, args, queue):
+    import torch
+    from omegaconf import OmegaConf
+    from indextts.s2mel.modules.commons import sequence_mask
+    from indextts.s2mel.modules.flow_matching import CFM
+
+    torch.manual_seed(0)
+    device = torch.device(args.device)
+    cfg = OmegaConf.load(args.config)
+    estimator = CFM(cfg.s2mel).estimator.eval().to(device)
+    transformer = estimator.transformer
+    T = int((args.prompt_seconds + args.seconds) * MEL_FRAMES_PER_SECOND)
+    B = 2 * args.batch_size
+    x = torch.randn(B, 80, T, device=device)
+    prompt_x = torch.randn(B, 80, T, device=device)
+    style = torch.randn(B, 192, device=device)
+    mu = torch.randn(B, T, cfg.s2mel.DiT.content_dim, device=device)
+    t = torch.rand(B, device=device)
+    x_lens = torch.full((B,), T, device=device)
+    if args.padded:
+        x_lens[B // 2 - 1] = x_lens[-1] = T // 2
+
+    if variant == "dense":
+        forward = transformer.forward
+
+        def dense_forward(x, c, input_pos=None, mask=None, *rest, **kwargs):
+            # the previous mask: the key-padding mask repeated over every query
+            mask = sequence_mask(x_lens, max_length=T).unsqueeze(1)[:, None, :].repeat(1, 1, T, 1)
+            return forward(x, c, input_pos, mask, *rest, **kwargs)
+
+        transformer.forward = dense_forward
+
+    def evaluate():
+        with torch.inference_mode():
+            return estimator(x, prompt_x, x_lens, t, style, mu)
+
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+    with PeakRSSSampler() as sampler:
+        estimator.setup_caches(max_batch_size=1, max_seq_length=8192)
+        if variant == "dense":
+            transformer.get_causal_mask()  # allocated by `setup_caches` before
+        evaluate()  # warm up
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            evaluate()
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        elapsed = time.perf_counter() - start
+    if device.type == "cuda":
+        peak = torch.cuda.max_memory_allocated() / 2 ** 20
+    else:
+        peak = sampler.peak / 2 ** 20
+    queue.put((variant, T, elapsed / args.repeat, peak))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the attention mask of the s2mel DiT",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--config", type=str, default="checkpoints/config.yaml", help="Model config")
+    parser.add_argument("--device", type=str, default="cpu", help="Device (cpu, cuda)")
+    parser.add_argument("--seconds", type=float, default=30, help="Segment length in seconds")
+    parser.add_argument("--prompt_seconds", type=float, default=15, help="Reference prompt length in seconds")
+    parser.add_argument("--batch_size", type=int, default=1, help="Segments per batch (x2 with guidance)")
+    parser.add_argument("--padded", action="store_true", default=False, help="Pad the last segment of the batch")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed DiT evaluations per variant")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    unit = "MiB (CUDA allocated)" if args.device.startswith("cuda") else "MiB (RSS growth)"
+    print(f"{'variant':<12}{'frames':>8}{'ms/eval':>12}{'peak':>10}  {unit}")
+    for variant in ("dense", "key_padding"):
+        process = ctx.Process(target=run_variant, args=(variant, args, queue))
+        process.start()
+        variant, T, per_eval, peak = queue.get()
+        process.join()
+        print(f"{variant:<12}{T:>8}{per_eval * 1000:>12.1f}{peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
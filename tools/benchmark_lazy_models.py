@@ -0,0 +1,82 @@
+"""
+Report the init time and the resident memory of IndexTTS2 with the optional components
+(QwenEmotion, emotion/speaker matrices) loaded on demand, with and without text-emotion traffic.
+
+Each mode runs in its own process:
+    lazy:  the components are loaded by the first request needing them
+    eager: the components are loaded right after init (the previous behaviour)
+and reports the memory after init, after a plain request, after a `use_emo_text` request and,
+with `--idle_timeout`, after the components were unloaded (RSS, and CUDA allocated on GPU).
+
+    uv run tools/benchmark_lazy_models.py --voice examples/voice_01.wav --idle_timeout 5
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+sys.path.append(os.path.dirname(current_dir))
+
+from benchmark_cfm_loop import current_rss
+
+
+def memory():
+    import torch
+
+    rss = current_rss() / 2 ** 20
+    if torch.cuda.is_available():
+        return f"rss {rss:8.1f} MiB, cuda {torch.cuda.memory_allocated() / 2 ** 20:8.1f} MiB"
+    return f"rss {rss:8.1f} MiB"
+
+
+def run_mode(mode, args, queue):
+    from indextts.infer_v2 import IndexTTS2
+
+    rows = []
+    start = time.perf_counter()
+    tts = IndexTTS2(cfg_path=os.path.join(args.model_dir, "config.yaml"), model_dir=args.model_dir,
+                    use_fp16=args.fp16, device=args.device, optional_models_idle_timeout=args.idle_timeout)
+    if mode == "eager":
+        for name in ("qwen_emo", "emo_matrix", "spk_matrix"):
+            tts.optional_models.get(name)
+    rows.append((f"init ({time.perf_counter() - start:.1f}s)", memory()))
+    tts.infer(spk_audio_prompt=args.voice, text=args.text, output_path=None)
+    rows.append(("plain request", memory()))
+    start = time.perf_counter()
+    tts.infer(spk_audio_prompt=args.voice, text=args.text, output_path=None, use_emo_text=True)
+    rows.append((f"emo text request ({time.perf_counter() - start:.1f}s)", memory()))
+    if args.idle_timeout is not None:
+        time.sleep(args.idle_timeout + max(args.idle_timeout / 4, 1.0) + 1)
+        rows.append(("after idle timeout", memory()))
+    queue.put((mode, rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Report the IndexTTS2 memory with on-demand optional components",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--voice", type=str, required=True, help="Speaker reference audio")
+    parser.add_argument("--text", type=str, default="今天的天气真好，我们一起去公园散步吧！", help="Text to synthesize")
+    parser.add_argument("--model_dir", type=str, default="checkpoints", help="Model checkpoints directory")
+    parser.add_argument("--device", type=str, default=None, help="Device to run the model on (cpu, cuda, mps, xpu)")
+    parser.add_argument("--fp16", action="store_true", default=False, help="Use FP16 if available")
+    parser.add_argument("--idle_timeout", type=float, default=None, help="Idle seconds before unloading")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    for mode in ("eager", "lazy"):
+        process = ctx.Process(target=run_mode, args=(mode, args, queue))
+        process.start()
+        mode, rows = queue.get()
+        process.join()
+        for stage, mem in rows:
+            print(f"{mode:<6}{stage:<32}{mem}")
+
+
+if __name__ == "__main__":
+    main()
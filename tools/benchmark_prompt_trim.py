@@ -0,0 +1,100 @@
+"""
+Report the effect of the IndexTTS2 reference prompt trimming (VAD silence trimming and the most
+speech-dense window) on the s2mel time and on the speaker similarity.
+
+For every trimming setting and prompt, the text is synthesized with the same seed and reported:
+    prompt(s): prompt length after trimming (the DiT prefix of every segment)
+    s2mel(s):  total time of `s2mel_inference`
+    spk_sim:   cosine similarity of the CAM++ speaker embeddings of the output and of the
+               whole (untrimmed) prompt
+
+Settings are `none` or `<max_silence>[:<window_seconds>]`, e.g. `0.3` or `0.3:8`.
+
+    uv run tools/benchmark_prompt_trim.py examples/voice_01.wav examples/voice_02.wav \
+        --settings none,0.3,0.3:8,0.3:6
+"""
+import argparse
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+DEFAULT_TEXT = "大家好，我现在正在测试参考音频的预处理，这段话用来比较说话人相似度和合成速度。"
+
+
+def parse_setting(value):
+    if value == "none":
+        return None, None
+    max_silence, _, window = value.partition(":")
+    return float(max_silence), float(window) if window else None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Report the effect of the IndexTTS2 prompt trimming",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("prompts", type=str, nargs="+", help="Speaker reference audios")
+    parser.add_argument("--text", type=str, default=DEFAULT_TEXT, help="Text to synthesize")
+    parser.add_argument("--settings", type=str, default="none,0.3,0.3:8,0.3:6", help="Comma separated trimming settings")
+    parser.add_argument("--model_dir", type=str, default="checkpoints", help="Model checkpoints directory")
+    parser.add_argument("--device", type=str, default=None, help="Device to run the model on (cpu, cuda, mps, xpu)")
+    parser.add_argument("--fp16", action="store_true", default=False, help="Use FP16 if available")
+    parser.add_argument("--seed", type=int, default=1234, help="Seed shared by all runs")
+    args = parser.parse_args()
+
+    import librosa
+    import torch
+    import torchaudio
+    from indextts.infer_v2 import IndexTTS2
+
+    tts = IndexTTS2(cfg_path=os.path.join(args.model_dir, "config.yaml"), model_dir=args.model_dir,
+                    use_fp16=args.fp16, device=args.device)
+
+    s2mel_time = [0.0]
+    s2mel_inference = tts.s2mel_inference
+
+    def timed_s2mel_inference(*a, **kw):
+        if tts.device.startswith("cuda"):
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        out = s2mel_inference(*a, **kw)
+        if tts.device.startswith("cuda"):
+            torch.cuda.synchronize()
+        s2mel_time[0] += time.perf_counter() - start
+        return out
+
+    tts.s2mel_inference = timed_s2mel_inference
+
+    @torch.no_grad()
+    def speaker_embedding(audio, sr):
+        audio_16k = torchaudio.functional.resample(audio.float(), sr, 16000)
+        feat = torchaudio.compliance.kaldi.fbank(audio_16k.to(tts.device), num_mel_bins=80, dither=0,
+                                                 sample_frequency=16000)
+        feat = feat - feat.mean(dim=0, keepdim=True)
+        return tts.campplus_model(feat.unsqueeze(0)).flatten()
+
+    references = {}
+    for path in args.prompts:
+        audio, sr = librosa.load(path, sr=16000)
+        references[path] = speaker_embedding(torch.tensor(audio).unsqueeze(0), sr)
+
+    print(f"{'setting':<10}{'prompt':<32}{'prompt(s)':>10}{'s2mel(s)':>10}{'spk_sim':>10}")
+    for setting in args.settings.split(","):
+        tts.prompt_max_silence, tts.prompt_window_seconds = parse_setting(setting.strip())
+        for path in args.prompts:
+            prompt = tts.get_prompt_features(path, speaker=True)
+            prompt_seconds = prompt["ref_mel"].size(-1) * 256 / 22050
+            torch.manual_seed(args.seed)
+            s2mel_time[0] = 0.0
+            sr, wav = tts.infer(spk_audio_prompt=path, text=args.text, output_path=None)
+            wav = torch.from_numpy(wav.T).float() / 32767
+            similarity = torch.nn.functional.cosine_similarity(speaker_embedding(wav, sr), references[path], dim=0)
+            print(f"{setting:<10}{os.path.basename(path)[-32:]:<32}{prompt_seconds:>10.2f}{s2mel_time[0]:>10.3f}"
+                  f"{similarity.item():>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
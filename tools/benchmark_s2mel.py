@@ -0,0 +1,106 @@
+"""
+Benchmark the IndexTTS2 s2mel flow matching (CFM) solvers against their number of function
+evaluations (NFE, DiT forward passes), and the classifier-free guidance schedules against full guidance.
+
+The semantic condition of `--target` is re-synthesized with the voice of `--prompt`, so the
+result can be compared with the target's real mel. Every configuration starts from the same
+noise. Quality proxies (mean L1 distance, log-mel domain):
+    ref_l1: to the mel of the reference configuration (`--ref_solver` with `--ref_steps`)
+    gt_l1:  to the real mel of the target audio
+    cfg_l1: to the same solver/schedule/NFE with guidance on every step (A/B of `--cfg_schedules`)
+`rows` is the number of DiT batch rows evaluated, relative to full guidance.
+
+    uv run tools/benchmark_s2mel.py --prompt examples/voice_01.wav --target examples/voice_02.wav
+    uv run tools/benchmark_s2mel.py --prompt examples/voice_01.wav --solvers euler --nfe 25 \
+        --cfg_schedules all,first:8,first:12,every:2,range:0-0.5,linear:0.1
+"""
+import argparse
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+
+def parse_list(value, type_=str):
+    return [type_(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark IndexTTS2 s2mel CFM solvers against NFE",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--prompt", type=str, required=True, help="Speaker reference audio")
+    parser.add_argument("--target", type=str, default=None, help="Audio to re-synthesize, default: the prompt itself")
+    parser.add_argument("--model_dir", type=str, default="checkpoints", help="Model checkpoints directory")
+    parser.add_argument("--device", type=str, default=None, help="Device to run the model on (cpu, cuda, mps, xpu)")
+    parser.add_argument("--fp16", action="store_true", default=False, help="Use FP16 if available")
+    parser.add_argument("--solvers", type=str, default="euler,midpoint,heun,dpm_2m", help="Comma separated solvers")
+    parser.add_argument("--t_schedules", type=str, default="linear,cosine", help="Comma separated timestep schedules")
+    parser.add_argument("--nfe", type=str, default="8,10,12,16,25", help="Comma separated NFE budgets")
+    parser.add_argument("--inference_cfg_rate", type=float, default=0.7, help="CFG rate")
+    parser.add_argument("--cfg_schedules", type=str, default="all", help="Comma separated CFG schedules")
+    parser.add_argument("--ref_solver", type=str, default="euler", help="Solver of the reference mel")
+    parser.add_argument("--ref_steps", type=int, default=64, help="Steps of the reference mel")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per configuration")
+    parser.add_argument("--seed", type=int, default=1234, help="Noise seed shared by all configurations")
+    args = parser.parse_args()
+
+    import torch
+    from indextts.infer_v2 import IndexTTS2
+    from indextts.s2mel.modules.flow_matching import NFE_PER_STEP
+
+    tts = IndexTTS2(cfg_path=os.path.join(args.model_dir, "config.yaml"), model_dir=args.model_dir,
+                    use_fp16=args.fp16, device=args.device)
+    prompt = tts.get_prompt_features(args.prompt, speaker=True)
+    target = tts.get_prompt_features(args.target or args.prompt, speaker=True)
+    cond = target["prompt_condition"]
+    gt_mel = target["ref_mel"]
+
+    rows = [0]
+
+    def count_rows(module, inputs):
+        rows[0] += inputs[0].size(0)
+
+    tts.s2mel.models['cfm'].estimator.transformer.register_forward_pre_hook(count_rows)
+
+    def run(solver, steps, t_schedule, cfg_schedule="all"):
+        torch.manual_seed(args.seed)
+        with torch.no_grad():
+            mel = tts.s2mel_inference([cond], prompt["prompt_condition"], prompt["ref_mel"], prompt["style"],
+                                      diffusion_steps=steps, inference_cfg_rate=args.inference_cfg_rate,
+                                      cfm_solver=solver, cfm_t_schedule=t_schedule, cfm_cfg_schedule=cfg_schedule)[0]
+        return mel.float()
+
+    def synchronize():
+        if tts.device.startswith("cuda"):
+            torch.cuda.synchronize()
+
+    ref_mel = run(args.ref_solver, args.ref_steps, "linear")
+    print(f">> reference: {args.ref_solver} x {args.ref_steps} steps, gt_l1: {(ref_mel - gt_mel).abs().mean().item():.4f}")
+    print(f"{'solver':<10}{'schedule':<10}{'cfg':<14}{'steps':>6}{'NFE':>6}{'rows':>6}{'time(s)':>10}"
+          f"{'ref_l1':>10}{'gt_l1':>10}{'cfg_l1':>10}")
+    for solver in parse_list(args.solvers):
+        for t_schedule in parse_list(args.t_schedules):
+            for nfe in parse_list(args.nfe, int):
+                steps = max(1, nfe // NFE_PER_STEP[solver])
+                rows[0] = 0
+                full_cfg_mel = run(solver, steps, t_schedule)  # also warms up
+                full_rows = rows[0]
+                for cfg_schedule in parse_list(args.cfg_schedules):
+                    synchronize()
+                    start = time.perf_counter()
+                    for _ in range(args.repeat):
+                        rows[0] = 0
+                        mel = run(solver, steps, t_schedule, cfg_schedule)
+                    synchronize()
+                    elapsed = (time.perf_counter() - start) / args.repeat
+                    print(f"{solver:<10}{t_schedule:<10}{cfg_schedule:<14}{steps:>6}{steps * NFE_PER_STEP[solver]:>6}"
+                          f"{rows[0] / full_rows:>6.2f}{elapsed:>10.3f}{(mel - ref_mel).abs().mean().item():>10.4f}"
+                          f"{(mel - gt_mel).abs().mean().item():>10.4f}{(mel - full_cfg_mel).abs().mean().item():>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark the parallel text normalization (`NormalizerPool`) against the number of worker processes.
+
+The texts of a `tests/cases.jsonl`-style file are normalized as a batch (`batch_encode`) and
+concatenated into long documents (long-form inference). Every run uses a fresh, uncached
+normalizer, outputs are checked to be the same for every worker count.
+
+    uv run tools/benchmark_text_normalize.py --cases tests/cases.jsonl --workers 1,2,4,8 --repeat 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the parallel text normalization",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--cases", type=str, default="tests/cases.jsonl", help="JSONL file with a `text` field per line")
+    parser.add_argument("--workers", type=str, default=None, help="Comma separated worker counts, default 1,2,4,... up to the CPU count")
+    parser.add_argument("--repeat", type=int, default=20, help="Cases repeated into each long document")
+    parser.add_argument("--documents", type=int, default=4, help="Number of long documents")
+    parser.add_argument("--chunk_chars", type=int, default=200, help="Max characters of a document chunk")
+    args = parser.parse_args()
+
+    from indextts.utils.front import TextNormalizer
+    from indextts.utils.text_pool import NormalizerPool
+
+    with open(args.cases, encoding="utf-8") as f:
+        cases = [json.loads(line)["text"] for line in f if line.strip()]
+    # 句子带编号，避免重复的分块只规范化一次
+    documents = ["\n".join(f"{d}-{i}: {cases[i % len(cases)]}" for i in range(args.repeat * len(cases)))
+                 for d in range(args.documents)]
+    batch = [f"{i}: {text}" for i in range(args.repeat) for text in cases]
+    if args.workers:
+        worker_counts = [int(w) for w in args.workers.split(",")]
+    else:
+        worker_counts, count = [], 1
+        while count < (os.cpu_count() or 1):
+            worker_counts.append(count)
+            count *= 2
+        worker_counts.append(os.cpu_count() or 1)
+    print(f"{len(batch)} batch texts, {len(documents)} documents of {len(documents[0])} chars, "
+          f"{os.cpu_count()} CPUs")
+
+    print(f"{'workers':>8}{'batch(s)':>12}{'speedup':>10}{'documents(s)':>14}{'speedup':>10}")
+    reference = baseline = None
+    for workers in worker_counts:
+        normalizer = TextNormalizer(cache_size=0)
+        normalizer.load()
+        with NormalizerPool(normalizer, num_workers=workers, chunk_chars=args.chunk_chars) as pool:
+            pool.start()
+            start = time.perf_counter()
+            batch_out = pool.normalize_many(batch)
+            batch_time = time.perf_counter() - start
+            start = time.perf_counter()
+            documents_out = pool.normalize_many(documents)
+            documents_time = time.perf_counter() - start
+        if reference is None:
+            reference, baseline = (batch_out, documents_out), (batch_time, documents_time)
+        elif (batch_out, documents_out) != reference:
+            print(f">> WARNING: outputs with {workers} workers differ from the outputs with {worker_counts[0]}")
+        print(f"{workers:>8}{batch_time:>12.2f}{baseline[0] / batch_time:>9.2f}x"
+              f"{documents_time:>14.2f}{baseline[1] / documents_time:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
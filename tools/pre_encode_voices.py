@@ -0,0 +1,99 @@
+"""
+Pre-encode a directory of reference voices into the persistent prompt feature store,
+so that new IndexTTS2 replicas start with a warm cache.
+
+    uv run tools/pre_encode_voices.py voices/ --store prompt_store
+
+Start the API server / IndexTTS2 with the same store directory
+(`INDEXTTS_PROMPT_STORE=prompt_store` or `prompt_store_dir="prompt_store"`). With prompt trimming,
+pass the same `--prompt_max_silence` / `--prompt_window` as the server
+(`INDEXTTS_PROMPT_MAX_SILENCE`, `INDEXTTS_PROMPT_WINDOW`): they are part of the cache keys.
+"""
+import argparse
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".ogg", ".m4a", ".opus")
+
+
+def find_audio_files(directory: str, recursive: bool = True) -> list:
+    files = []
+    for root, dirs, names in os.walk(directory):
+        for name in sorted(names):
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                files.append(os.path.join(root, name))
+        if not recursive:
+            break
+    return sorted(files)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pre-encode reference voices into the IndexTTS2 prompt feature store",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("voices", type=str, help="Directory of reference audio files")
+    parser.add_argument("--store", type=str, default="prompt_store", help="Prompt feature store directory")
+    parser.add_argument("--model_dir", type=str, default="checkpoints", help="Model checkpoints directory")
+    parser.add_argument("--config", type=str, default=None, help="Path to the config file, default: <model_dir>/config.yaml")
+    parser.add_argument("--device", type=str, default=None, help="Device to run the encoders on (cpu, cuda, mps, xpu)")
+    parser.add_argument("--fp16", action="store_true", default=False, help="Use FP16 if available")
+    parser.add_argument("--prompt_max_silence", type=float, default=None,
+                        help="Prompt trimming of the server: VAD silence trimming, max pause in seconds")
+    parser.add_argument("--prompt_window", type=float, default=None,
+                        help="Prompt trimming of the server: seconds of the most speech-dense window")
+    parser.add_argument("--batch_size", type=int, default=8, help="Voices encoded per w2v-bert batch")
+    parser.add_argument("--no_recursive", action="store_true", default=False, help="Do not descend into sub-directories")
+    parser.add_argument("--verbose", action="store_true", default=False, help="Enable verbose mode")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.voices):
+        print(f"Voice directory {args.voices} does not exist.")
+        sys.exit(1)
+    files = find_audio_files(args.voices, recursive=not args.no_recursive)
+    if not files:
+        print(f"No audio files found in {args.voices}.")
+        sys.exit(1)
+
+    from indextts.infer_v2 import IndexTTS2
+
+    tts = IndexTTS2(
+        cfg_path=args.config or os.path.join(args.model_dir, "config.yaml"),
+        model_dir=args.model_dir,
+        use_fp16=args.fp16,
+        device=args.device,
+        prompt_cache_entries=0,
+        prompt_store_dir=args.store,
+        prompt_max_silence=args.prompt_max_silence,
+        prompt_window_seconds=args.prompt_window,
+    )
+    start = time.perf_counter()
+    failed = []
+    batch_size = max(1, args.batch_size)
+    for i in range(0, len(files), batch_size):
+        batch = files[i:i + batch_size]
+        try:
+            tts.get_prompt_features_batch(batch, speaker=True, verbose=args.verbose, batch_size=batch_size)
+            for j, path in enumerate(batch, i + 1):
+                print(f"[{j}/{len(files)}] {path}")
+        except Exception:
+            # retry one by one, to only report the failing voices
+            for j, path in enumerate(batch, i + 1):
+                try:
+                    tts.get_prompt_features(path, speaker=True, verbose=args.verbose)
+                    print(f"[{j}/{len(files)}] {path}")
+                except Exception as e:
+                    failed.append(path)
+                    print(f"[{j}/{len(files)}] {path} failed: {e!r}")
+    elapsed = time.perf_counter() - start
+    print(f">> Encoded {len(files) - len(failed)}/{len(files)} voices in {elapsed:.2f}s into {tts.prompt_store.directory}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()